@@ -3,17 +3,30 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 # import des modeles
 from src.models.user import db
 from src.models.metrics import SystemMetrics, Volunteer, Task, PerformanceHistory
 from src.models.badge import Badge, VolunteerBadge
+from src.models.alert import AlertRule, AlertIncident
+from src.models.report import ReportJob
+from src.services.migrations import run_migrations
+from src.services.writer import WriterBusy, writer
+from src.services.retention import retention_scheduler
+from src.services.cache import CacheWaitTimeout, response_cache
+from src.services.streaming import metrics_broadcaster
+from src.services.archive import metrics_archive
+from src.services.reports import report_worker
+from src.services.leaderboard import volunteer_leaderboard
 
 #import des routes
 from src.routes.user import user_bp
 from src.routes.metrics import metrics_bp
 from src.routes.badges import badges_bp
+from src.routes.admin import admin_bp
+from src.routes.alerts import alerts_bp
+from src.routes.exports import exports_bp
 
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -25,15 +38,47 @@ CORS(app)
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(metrics_bp, url_prefix='/api')
 app.register_blueprint(badges_bp, url_prefix='/api') 
+app.register_blueprint(admin_bp, url_prefix='/api')
+app.register_blueprint(alerts_bp, url_prefix='/api')
+app.register_blueprint(exports_bp, url_prefix='/api')
 # Configuration de la base de données avec chemin relatif
 db_path = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
 os.makedirs(os.path.dirname(db_path), exist_ok=True)  # Créer le répertoire si nécessaire
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
+# Cache des réponses des routes analytiques
+response_cache.init_app(app)
+# Répertoire de l'archive en colonnes de l'historique froid
+metrics_archive.init_app(app)
 
 with app.app_context():
     db.create_all()
+    # Appliquer les migrations (index, backfills) aux bases existantes
+    run_migrations()
+
+# Index du score composite du classement (poids propres au déploiement)
+volunteer_leaderboard.init_app(app)
+
+# Thread unique d'écriture en base (commits groupés)
+writer.start(app)
+# Suppression périodique des données brutes expirées
+retention_scheduler.start(app)
+# Diffusion des nouvelles métriques aux clients du flux SSE
+metrics_broadcaster.start()
+# Calcul des rapports demandés par POST /performance/reports
+report_worker.start(app)
+
+@app.errorhandler(WriterBusy)
+@app.errorhandler(CacheWaitTimeout)
+def handle_busy(e):
+    response = jsonify({
+        'success': False,
+        'error': str(e)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -41,7 +86,7 @@ def serve(path):
     static_folder_path = app.static_folder
     if static_folder_path is None:
             return "Static folder not configured", 404
-
+    
     if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
         return send_from_directory(static_folder_path, path)
     else:
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Modèles de données pour les règles d'alerte et leurs incidents
+"""
+from datetime import datetime
+from src.models.metrics import db
+
+class AlertRule(db.Model):
+    """
+    Règle d'alerte définie par l'utilisateur sur un champ de SystemMetrics
+    
+    Les colonnes pending_* et open_incident_id conservent l'état de
+    l'évaluation incrémentale entre deux insertions de métriques.
+    """
+    __tablename__ = 'alert_rules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    metric = db.Column(db.String(50), nullable=False, index=True)  # champ de SystemMetrics
+    comparison = db.Column(db.String(10), nullable=False, default='above')  # above, below
+    threshold = db.Column(db.Float, nullable=False)
+    critical_threshold = db.Column(db.Float, nullable=True)  # au-delà, l'incident devient critique
+    duration_seconds = db.Column(db.Integer, nullable=False, default=0)  # durée minimale du dépassement
+    hysteresis = db.Column(db.Float, nullable=False, default=0.0)  # marge de retour sous le seuil
+    severity = db.Column(db.String(20), nullable=False, default='warning')  # warning, critical
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # État de l'évaluation incrémentale
+    last_evaluated_at = db.Column(db.DateTime)
+    pending_since = db.Column(db.DateTime)  # premier échantillon du dépassement en cours
+    pending_peak = db.Column(db.Float)
+    pending_peak_at = db.Column(db.DateTime)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    open_incident_id = db.Column(db.Integer, nullable=True)
+    
+    def to_dict(self):
+        """Convertir en dictionnaire pour JSON"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'metric': self.metric,
+            'comparison': self.comparison,
+            'threshold': self.threshold,
+            'critical_threshold': self.critical_threshold,
+            'duration_seconds': self.duration_seconds,
+            'hysteresis': self.hysteresis,
+            'severity': self.severity,
+            'enabled': self.enabled,
+            'open_incident_id': self.open_incident_id,
+            'last_evaluated_at': self.last_evaluated_at.isoformat() if self.last_evaluated_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class AlertIncident(db.Model):
+    """
+    Dépassements consécutifs d'une règle fusionnés en un incident
+    (ended_at est nul tant que l'incident est en cours)
+    """
+    __tablename__ = 'alert_incidents'
+    __table_args__ = (
+        db.Index('ix_alert_incidents_rule_started_at', 'rule_id', 'started_at'),
+        db.Index('ix_alert_incidents_metric_started_at', 'metric', 'started_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    rule_id = db.Column(db.Integer, db.ForeignKey('alert_rules.id'), nullable=False)
+    metric = db.Column(db.String(50), nullable=False)
+    severity = db.Column(db.String(20), nullable=False)
+    threshold = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_breach_at = db.Column(db.DateTime, nullable=False)
+    peak_value = db.Column(db.Float, nullable=False)
+    peak_at = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        """Convertir en dictionnaire pour JSON"""
+        return {
+            'id': self.id,
+            'rule_id': self.rule_id,
+            'metric': self.metric,
+            'severity': self.severity,
+            'threshold': self.threshold,
+            'started_at': self.started_at.isoformat(),
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'last_breach_at': self.last_breach_at.isoformat(),
+            'peak_value': self.peak_value,
+            'peak_at': self.peak_at.isoformat(),
+            'sample_count': self.sample_count,
+            'ongoing': self.ended_at is None
+        }
@@ -3,7 +3,7 @@
 Modèles de données pour le système de badges
 """
 from datetime import datetime
-from src.models.metrics import db
+from src.models.metrics import db, serialize_fields
 
 class Badge(db.Model):
     """
@@ -23,8 +23,10 @@ class Badge(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        """Convertir en dictionnaire pour JSON"""
+    def to_dict(self, fields=None):
+        """Convertir en dictionnaire pour JSON (fields : champs à émettre)"""
+        if fields is not None:
+            return serialize_fields(self, fields)
         return {
             'id': self.id,
             'badge_id': self.badge_id,
@@ -46,6 +48,9 @@ class VolunteerBadge(db.Model):
     Enregistre l'attribution des badges
     """
     __tablename__ = 'volunteer_badges'
+    __table_args__ = (
+        db.Index('ix_volunteer_badges_revoked_earned_date', 'revoked', 'earned_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     volunteer_id = db.Column(db.String(100), nullable=False, index=True)
@@ -66,8 +71,19 @@ class VolunteerBadge(db.Model):
     # Relations
     badge = db.relationship('Badge', backref='attributions', lazy='joined')
     
-    def to_dict(self, include_badge=True):
-        """Convertir en dictionnaire pour JSON"""
+    def to_dict(self, include_badge=True, fields=None):
+        """
+        Convertir en dictionnaire pour JSON
+        
+        fields : champs à émettre ; fields['badge'] est None pour le badge
+        complet ou les champs du badge à émettre
+        """
+        if fields is not None:
+            result = serialize_fields(self, [name for name in fields if name != 'badge'])
+            if include_badge and 'badge' in fields and self.badge:
+                result['badge'] = self.badge.to_dict(fields=fields['badge'])
+            return result
+        
         result = {
             'id': self.id,
             'volunteer_id': self.volunteer_id,
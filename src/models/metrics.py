@@ -1,11 +1,19 @@
 from src.models.user import db
 from datetime import datetime
 
+def serialize_fields(obj, fields):
+    """Champs demandés d'un objet, au format de to_dict (dates en ISO 8601)"""
+    values = {}
+    for name in fields:
+        value = getattr(obj, name)
+        values[name] = value.isoformat() if isinstance(value, datetime) else value
+    return values
+
 class SystemMetrics(db.Model):
     __tablename__ = 'system_metrics'
     
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     total_volunteers = db.Column(db.Integer, default=0)
     active_volunteers = db.Column(db.Integer, default=0)
     total_tasks = db.Column(db.Integer, default=0)
@@ -16,7 +24,9 @@ class SystemMetrics(db.Model):
     network_throughput = db.Column(db.Float, default=0.0)
     cost_savings = db.Column(db.Float, default=0.0)
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return serialize_fields(self, fields)
         return {
             'id': self.id,
             'timestamp': self.timestamp.isoformat(),
@@ -31,22 +41,118 @@ class SystemMetrics(db.Model):
             'cost_savings': self.cost_savings
         }
 
+# Champs de SystemMetrics pré-agrégés dans les rollups
+ROLLUP_FIELDS = {
+    'total_volunteers': db.Integer,
+    'active_volunteers': db.Integer,
+    'total_tasks': db.Integer,
+    'completed_tasks': db.Integer,
+    'pending_tasks': db.Integer,
+    'cpu_usage': db.Float,
+    'memory_usage': db.Float,
+    'network_throughput': db.Float,
+    'cost_savings': db.Float
+}
+
+# Résolutions disponibles (largeur d'un bucket en secondes)
+ROLLUP_RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+def _rollup_field_columns():
+    for field, column_type in ROLLUP_FIELDS.items():
+        # Nombre de valeurs non NULL du champ (diviseur de sa moyenne)
+        yield db.Column(f'{field}_count', db.Integer, nullable=False, default=0)
+        for suffix in ('sum', 'min', 'max', 'first', 'last'):
+            yield db.Column(f'{field}_{suffix}', column_type)
+
+# Rollups de system_metrics : count, sum, min, max, première et dernière
+# valeur de chaque champ par bucket (minute, heure, jour)
+system_metrics_rollups = db.Table(
+    'system_metrics_rollups',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('resolution', db.String(10), nullable=False),
+    db.Column('bucket_start', db.DateTime, nullable=False),
+    db.Column('sample_count', db.Integer, nullable=False, default=0),
+    db.Column('first_timestamp', db.DateTime),
+    db.Column('last_timestamp', db.DateTime),
+    *_rollup_field_columns(),
+    db.UniqueConstraint('resolution', 'bucket_start', name='uq_system_metrics_rollups_bucket')
+)
+
+# Résolutions des sketches de quantiles (secondes)
+SKETCH_RESOLUTIONS = {
+    'hour': 3600,
+    'day': 86400
+}
+
+# Sketches de quantiles mergeables (style DDSketch) par bucket et par groupe
+# (workflow_id, volunteer_id ou '' pour les métriques système)
+quantile_sketches = db.Table(
+    'quantile_sketches',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('metric', db.String(50), nullable=False),
+    db.Column('resolution', db.String(10), nullable=False),
+    db.Column('bucket_start', db.DateTime, nullable=False),
+    db.Column('group_key', db.String(100), nullable=False, default=''),
+    db.Column('count', db.Integer, nullable=False, default=0),
+    db.Column('zero_count', db.Integer, nullable=False, default=0),
+    db.Column('total', db.Float, nullable=False, default=0.0),
+    db.Column('minimum', db.Float),
+    db.Column('maximum', db.Float),
+    db.Column('bins', db.Text, nullable=False, default='{}'),  # JSON {index: effectif}
+    db.UniqueConstraint(
+        'metric', 'resolution', 'bucket_start', 'group_key',
+        name='uq_quantile_sketches_bucket'
+    )
+)
+
+# Périodes calendaires des classements (semaine ISO, mois, année)
+LEADERBOARD_PERIODS = ('week', 'month', 'year')
+
+# Activité de chaque volontaire par période et par bucket, agrégée depuis
+# performance_history : tâches, tâches réussies, heures de calcul
+volunteer_period_stats = db.Table(
+    'volunteer_period_stats',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('period', db.String(10), nullable=False),
+    db.Column('bucket_start', db.DateTime, nullable=False),
+    db.Column('volunteer_id', db.String(100), nullable=False),
+    db.Column('tasks_done', db.Integer, nullable=False, default=0),
+    db.Column('tasks_succeeded', db.Integer, nullable=False, default=0),
+    db.Column('success_rate', db.Float, nullable=False, default=0.0),  # en %
+    db.Column('compute_hours', db.Float, nullable=False, default=0.0),
+    db.Column('last_timestamp', db.DateTime),
+    db.UniqueConstraint('period', 'bucket_start', 'volunteer_id', name='uq_volunteer_period_stats_bucket'),
+    # Classements d'un bucket lus dans l'ordre de l'index
+    db.Index('ix_volunteer_period_stats_tasks', 'period', 'bucket_start', 'tasks_done', 'compute_hours'),
+    db.Index('ix_volunteer_period_stats_rate', 'period', 'bucket_start', 'success_rate', 'tasks_done'),
+    db.Index('ix_volunteer_period_stats_hours', 'period', 'bucket_start', 'compute_hours')
+)
+
 class Volunteer(db.Model):
     __tablename__ = 'volunteers'
+    __table_args__ = (
+        db.Index('ix_volunteers_status_last_seen', 'status', 'last_seen'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     volunteer_id = db.Column(db.String(100), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    status = db.Column(db.String(20), default='inactive')  # active, inactive, busy
-    joined_date = db.Column(db.DateTime, default=datetime.utcnow)
-    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default='inactive', index=True)  # active, inactive, busy
+    joined_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     tasks_completed = db.Column(db.Integer, default=0)
     total_computation_time = db.Column(db.Float, default=0.0)  # en heures
     cpu_cores = db.Column(db.Integer, default=1)
     memory_gb = db.Column(db.Float, default=1.0)
     performance_score = db.Column(db.Float, default=0.0)
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return serialize_fields(self, fields)
         return {
             'id': self.id,
             'volunteer_id': self.volunteer_id,
@@ -63,20 +169,30 @@ class Volunteer(db.Model):
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # Index couvrant pour les distributions par statut sur une plage
+        db.Index('ix_tasks_created_date_status', 'created_date', 'status'),
+        db.Index('ix_tasks_status_completed_date', 'status', 'completed_date'),
+        db.Index('ix_tasks_status_execution_time', 'status', 'execution_time'),
+        # Pages de /tasks filtrées par statut (created_date DESC, id DESC)
+        db.Index('ix_tasks_status_created_date', 'status', 'created_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.String(100), unique=True, nullable=False)
     workflow_id = db.Column(db.String(100), nullable=False)
-    status = db.Column(db.String(20), default='pending')  # pending, running, completed, failed
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, running, completed, failed
     assigned_volunteer = db.Column(db.String(100), nullable=True)
-    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     started_date = db.Column(db.DateTime, nullable=True)
     completed_date = db.Column(db.DateTime, nullable=True)
     execution_time = db.Column(db.Float, default=0.0)  # en secondes
     cpu_usage = db.Column(db.Float, default=0.0)
     memory_usage = db.Column(db.Float, default=0.0)
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return serialize_fields(self, fields)
         return {
             'id': self.id,
             'task_id': self.task_id,
@@ -93,9 +209,12 @@ class Task(db.Model):
 
 class PerformanceHistory(db.Model):
     __tablename__ = 'performance_history'
+    __table_args__ = (
+        db.Index('ix_performance_history_volunteer_timestamp', 'volunteer_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     volunteer_id = db.Column(db.String(100), nullable=False)
     task_id = db.Column(db.String(100), nullable=False)
     execution_time = db.Column(db.Float, nullable=False)
@@ -103,7 +222,9 @@ class PerformanceHistory(db.Model):
     memory_usage = db.Column(db.Float, default=0.0)
     success = db.Column(db.Boolean, default=True)
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return serialize_fields(self, fields)
         return {
             'id': self.id,
             'timestamp': self.timestamp.isoformat(),
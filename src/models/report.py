@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Modèle de données des rapports calculés en arrière-plan
+"""
+import json
+from datetime import datetime
+from src.models.metrics import db
+
+class ReportJob(db.Model):
+    """
+    Calcul d'un rapport confié au thread des rapports (services.reports)
+    
+    params_key identifie des paramètres normalisés identiques (plage de
+    dates résolue et filigrane des tables lues) : un rapport terminé est
+    réutilisé tant que cette clé ne change pas. content_hash est l'empreinte
+    SHA-256 du résultat sérialisé.
+    """
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        db.Index('ix_report_jobs_params_key_created_at', 'params_key', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # performance
+    params = db.Column(db.Text, nullable=False)  # JSON des paramètres normalisés
+    params_key = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, running, done, failed
+    result = db.Column(db.Text, nullable=True)  # JSON du rapport
+    content_hash = db.Column(db.String(64), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Convertir en dictionnaire pour JSON (sans le résultat)"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': json.loads(self.params),
+            'status': self.status,
+            'content_hash': self.content_hash,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
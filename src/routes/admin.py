@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+from flask import Blueprint, current_app, jsonify
+from src.models.metrics import db
+from src.services.archive import archive_after_days, metrics_archive
+from src.services.migrations import migration_status
+from src.services.partitions import partition_status
+from src.services.query_plans import query_plan_report
+from src.services.reports import report_worker
+from src.services.retention import retention_scheduler
+from src.services.cache import response_cache
+from src.services.streaming import metrics_broadcaster
+from src.services.writer import writer
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/admin/migrations', methods=['GET'])
+def get_migrations():
+    """Liste les migrations de schéma appliquées et en attente"""
+    try:
+        with db.engine.connect() as connection:
+            migrations = migration_status(connection)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'migrations': migrations,
+                'pending': sum(1 for m in migrations if not m['applied'])
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/query-plans', methods=['GET'])
+def get_query_plans():
+    """
+    Vérifie avec EXPLAIN QUERY PLAN que les requêtes de chaque route
+    utilisent un index
+    """
+    try:
+        report = query_plan_report()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'routes': report,
+                'full_scans': sorted(route for route, entry in report.items() if not entry['uses_index'])
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+
+@admin_bp.route('/admin/writer', methods=['GET'])
+def get_writer_status():
+    """État de la file d'écriture (travaux, transactions, rejets)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': writer.status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/retention', methods=['GET'])
+def get_retention_status():
+    """Politique de rétention par table et dernier nettoyage"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': retention_scheduler.status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/retention', methods=['POST'])
+def run_retention():
+    """Déclenche immédiatement la suppression des données expirées"""
+    try:
+        report = retention_scheduler.run_now(current_app._get_current_object())
+        
+        return jsonify({
+            'success': True,
+            'data': report
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/partitions', methods=['GET'])
+def get_partitions():
+    """Partitions mensuelles des séries temporelles brutes"""
+    try:
+        with db.engine.connect() as connection:
+            partitions = partition_status(connection)
+        
+        return jsonify({
+            'success': True,
+            'data': partitions
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/archive', methods=['GET'])
+def get_archive():
+    """Mois archivés en colonnes, taille des fichiers et octets par ligne"""
+    try:
+        with db.engine.connect() as connection:
+            archive = metrics_archive.status(connection)
+        
+        return jsonify({
+            'success': True,
+            'data': dict(archive, archive_after_days=archive_after_days(current_app.config))
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/cache', methods=['GET'])
+def get_cache_status():
+    """Occupation du cache de réponses (entrées, octets, hits, invalidations)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': response_cache.status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/cache', methods=['DELETE'])
+def clear_cache():
+    """Vide le cache de réponses"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {'cleared': response_cache.clear()}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/stream', methods=['GET'])
+def get_stream_status():
+    """Abonnés du flux SSE des métriques et messages perdus"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': metrics_broadcaster.status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@admin_bp.route('/admin/reports', methods=['GET'])
+def get_report_worker_status():
+    """État du thread des rapports calculés en arrière-plan"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': report_worker.status()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
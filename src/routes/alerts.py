@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+from sqlalchemy import delete
+from src.models.alert import AlertRule, AlertIncident
+from src.services.alerts import validate_rule, replay_rule
+from src.services.events import mark_changed
+from src.services.writer import WriterBusy, writer
+
+alerts_bp = Blueprint('alerts', __name__)
+
+
+@alerts_bp.route('/alerts/rules', methods=['GET'])
+def get_alert_rules():
+    """Liste les règles d'alerte"""
+    try:
+        rules = AlertRule.query.order_by(AlertRule.id).all()
+        
+        return jsonify({
+            'success': True,
+            'data': [rule.to_dict() for rule in rules]
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@alerts_bp.route('/alerts/rules', methods=['POST'])
+def create_alert_rule():
+    """
+    Crée une règle d'alerte (metric, threshold, comparison, duration_seconds,
+    hysteresis, critical_threshold, severity) et l'évalue sur les métriques
+    brutes conservées
+    """
+    try:
+        values = validate_rule(request.get_json(silent=True))
+        
+        def job(session):
+            rule = AlertRule(**values)
+            session.add(rule)
+            session.flush()
+            replay_rule(session.connection(), rule.id)
+            mark_changed(session, AlertIncident.__tablename__)
+            session.refresh(rule)
+            return rule.to_dict()
+        
+        return jsonify({
+            'success': True,
+            'data': writer.run(job)
+        }), 201
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        # File d'écriture pleine : réponse 503 du gestionnaire de l'application
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@alerts_bp.route('/alerts/rules/<int:rule_id>', methods=['PUT'])
+def update_alert_rule(rule_id):
+    """Modifie une règle d'alerte ; ses incidents sont recalculés"""
+    try:
+        values = validate_rule(request.get_json(silent=True), partial=True)
+        
+        def job(session):
+            rule = session.get(AlertRule, rule_id)
+            if rule is None:
+                return None
+            for field, value in values.items():
+                setattr(rule, field, value)
+            session.flush()
+            replay_rule(session.connection(), rule.id)
+            mark_changed(session, AlertIncident.__tablename__)
+            session.refresh(rule)
+            return rule.to_dict()
+        
+        rule = writer.run(job)
+        if rule is None:
+            return jsonify({
+                'success': False,
+                'error': 'Règle non trouvée'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': rule
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@alerts_bp.route('/alerts/rules/<int:rule_id>', methods=['DELETE'])
+def delete_alert_rule(rule_id):
+    """Supprime une règle d'alerte et ses incidents"""
+    def job(session):
+        rule = session.get(AlertRule, rule_id)
+        if rule is None:
+            return False
+        session.execute(delete(AlertIncident).where(AlertIncident.rule_id == rule_id))
+        session.delete(rule)
+        return True
+    
+    try:
+        if not writer.run(job):
+            return jsonify({
+                'success': False,
+                'error': 'Règle non trouvée'
+            }), 404
+        return '', 204
+    except WriterBusy:
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@alerts_bp.route('/alerts/incidents', methods=['GET'])
+def get_alert_incidents():
+    """
+    Incidents d'alerte, les plus récents d'abord
+    
+    Paramètres : status (open, closed, all), metric, rule_id, hours, limit
+    """
+    try:
+        status = request.args.get('status', 'all')
+        metric = request.args.get('metric')
+        rule_id = request.args.get('rule_id', type=int)
+        hours = request.args.get('hours', 24, type=int)
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        
+        if status not in ('open', 'closed', 'all'):
+            raise ValueError('status doit valoir open, closed ou all')
+        
+        query = AlertIncident.query
+        if status == 'open':
+            query = query.filter(AlertIncident.ended_at.is_(None))
+        elif status == 'closed':
+            query = query.filter(AlertIncident.ended_at.isnot(None))
+        if metric:
+            query = query.filter(AlertIncident.metric == metric)
+        if rule_id is not None:
+            query = query.filter(AlertIncident.rule_id == rule_id)
+        if hours:
+            # Incidents encore ouverts ou terminés pendant la période
+            date_start = datetime.utcnow() - timedelta(hours=hours)
+            query = query.filter(
+                (AlertIncident.ended_at.is_(None)) | (AlertIncident.ended_at >= date_start)
+            )
+        
+        incidents = query.order_by(AlertIncident.started_at.desc()).limit(limit).all()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'incidents': [incident.to_dict() for incident in incidents],
+                'count': len(incidents),
+                'open_count': sum(1 for incident in incidents if incident.ended_at is None)
+            }
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -1,41 +1,64 @@
 # -*- coding: utf-8 -*-
 from flask import Blueprint, jsonify, request
-from src.models.metrics import db, Volunteer
+from src.models.metrics import db, Volunteer, LEADERBOARD_PERIODS, volunteer_period_stats
+from src.services.cache import cached
+from src.services.etags import conditional
+from src.services.leaderboard import volunteer_leaderboard
+from src.services.pagination import count_rows, keyset_page, page_size_argument, total_mode_argument
+from src.services.fieldsets import apply_fieldset, fields_argument
+from src.services.period_stats import next_bucket, period_count, period_ranking, resolve_bucket
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 badges_bp = Blueprint('badges', __name__)
 
+# Tâches minimales pour concourir au meilleur taux de réussite du mois
+MIN_RATED_TASKS = 5
+
 
 @badges_bp.route('/badges/volunteer-of-week', methods=['GET'])
+@cached(ttl=300, tables=['volunteers', 'performance_history'], snap=300)
 def get_volunteer_of_week():
-    """Volontaire de la semaine - Le plus actif des 7 derniers jours"""
+    """
+    Volontaire de la semaine - Le plus de tâches traitées dans la semaine
+    
+    Query params:
+    - bucket: current|previous|date ISO de la semaine (défaut: current)
+    """
     try:
-        week_ago = datetime.utcnow() - timedelta(days=7)
+        bucket_start = resolve_bucket('week', request.args.get('bucket'))
+        stats = volunteer_period_stats
         
-        # Volontaire avec le plus de tâches complétées cette semaine
-        top_volunteer = Volunteer.query.filter(
-            Volunteer.last_seen >= week_ago
-        ).order_by(
-            Volunteer.tasks_completed.desc()
-        ).first()
+        # Volontaire avec le plus de tâches traitées cette semaine
+        ranking = period_ranking(
+            'week', bucket_start, [stats.c.tasks_done.desc(), stats.c.compute_hours.desc()], 1
+        )
         
-        if not top_volunteer:
+        if not ranking:
             return jsonify({
                 'success': False,
                 'message': 'Aucun volontaire actif cette semaine'
             }), 404
         
+        top_volunteer, period_stats = ranking[0]
         return jsonify({
             'success': True,
             'data': {
                 'badge': 'Volontaire de la Semaine',
                 'period': 'weekly',
+                'bucket_start': bucket_start.isoformat(),
+                'bucket_end': next_bucket('week', bucket_start).isoformat(),
                 'volunteer': top_volunteer.to_dict(),
-                'reason': f"{top_volunteer.tasks_completed} tâches complétées",
+                'period_stats': period_stats,
+                'reason': f"{period_stats['tasks_done']} tâches complétées",
                 'awarded_date': datetime.utcnow().isoformat()
             }
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -44,34 +67,51 @@ def get_volunteer_of_week():
 
 
 @badges_bp.route('/badges/volunteer-of-month', methods=['GET'])
+@cached(ttl=300, tables=['volunteers', 'performance_history'], snap=300)
 def get_volunteer_of_month():
-    """Volontaire du mois - Le plus performant des 30 derniers jours"""
+    """
+    Volontaire du mois - Le meilleur taux de réussite du mois, parmi les
+    volontaires d'au moins MIN_RATED_TASKS tâches
+    
+    Query params:
+    - bucket: current|previous|date ISO du mois (défaut: current)
+    """
     try:
-        month_ago = datetime.utcnow() - timedelta(days=30)
+        bucket_start = resolve_bucket('month', request.args.get('bucket'))
+        stats = volunteer_period_stats
         
-        # Volontaire avec le meilleur score de performance
-        top_volunteer = Volunteer.query.filter(
-            Volunteer.last_seen >= month_ago
-        ).order_by(
-            Volunteer.performance_score.desc()
-        ).first()
+        # Volontaire avec le meilleur taux de réussite ce mois ; en début de
+        # mois, si personne n'a encore MIN_RATED_TASKS tâches, tous concourent
+        order_by = [stats.c.success_rate.desc(), stats.c.tasks_done.desc()]
+        ranking = period_ranking(
+            'month', bucket_start, order_by, 1, stats.c.tasks_done >= MIN_RATED_TASKS
+        ) or period_ranking('month', bucket_start, order_by, 1)
         
-        if not top_volunteer:
+        if not ranking:
             return jsonify({
                 'success': False,
                 'message': 'Aucun volontaire actif ce mois'
             }), 404
         
+        top_volunteer, period_stats = ranking[0]
         return jsonify({
             'success': True,
             'data': {
                 'badge': 'Volontaire du Mois',
                 'period': 'monthly',
+                'bucket_start': bucket_start.isoformat(),
+                'bucket_end': next_bucket('month', bucket_start).isoformat(),
                 'volunteer': top_volunteer.to_dict(),
-                'reason': f"Score de performance: {top_volunteer.performance_score:.1f}%",
+                'period_stats': period_stats,
+                'reason': f"Taux de réussite: {period_stats['success_rate']:.1f}% sur {period_stats['tasks_done']} tâches",
                 'awarded_date': datetime.utcnow().isoformat()
             }
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -80,34 +120,46 @@ def get_volunteer_of_month():
 
 
 @badges_bp.route('/badges/volunteer-of-year', methods=['GET'])
+@cached(ttl=300, tables=['volunteers', 'performance_history'], snap=300)
 def get_volunteer_of_year():
-    """Volontaire de l'année - Le plus de temps de calcul total"""
+    """
+    Volontaire de l'année - Le plus de temps de calcul dans l'année
+    
+    Query params:
+    - bucket: current|previous|date ISO de l'année (défaut: current)
+    """
     try:
-        year_ago = datetime.utcnow() - timedelta(days=365)
+        bucket_start = resolve_bucket('year', request.args.get('bucket'))
+        stats = volunteer_period_stats
         
-        # Volontaire avec le plus de temps de calcul
-        top_volunteer = Volunteer.query.filter(
-            Volunteer.joined_date >= year_ago
-        ).order_by(
-            Volunteer.total_computation_time.desc()
-        ).first()
+        # Volontaire avec le plus de temps de calcul cette année
+        ranking = period_ranking('year', bucket_start, [stats.c.compute_hours.desc()], 1)
         
-        if not top_volunteer:
+        if not ranking:
             return jsonify({
                 'success': False,
                 'message': 'Aucun volontaire actif cette année'
             }), 404
         
+        top_volunteer, period_stats = ranking[0]
         return jsonify({
             'success': True,
             'data': {
                 'badge': 'Volontaire de l\'Année',
                 'period': 'yearly',
+                'bucket_start': bucket_start.isoformat(),
+                'bucket_end': next_bucket('year', bucket_start).isoformat(),
                 'volunteer': top_volunteer.to_dict(),
-                'reason': f"{top_volunteer.total_computation_time:.1f} heures de calcul",
+                'period_stats': period_stats,
+                'reason': f"{period_stats['compute_hours']:.1f} heures de calcul",
                 'awarded_date': datetime.utcnow().isoformat()
             }
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -116,6 +168,7 @@ def get_volunteer_of_year():
 
 
 @badges_bp.route('/badges/top-performers', methods=['GET'])
+@cached(ttl=300, tables=['volunteers'])
 def get_top_performers():
     """Top 10 des volontaires par catégorie"""
     try:
@@ -176,6 +229,57 @@ def get_top_performers():
         }), 500
 
 
+@badges_bp.route('/badges/speedster', methods=['GET'])
+@cached(ttl=300, tables=['badges', 'volunteers', 'performance_history', 'quantile_sketches'], snap=300)
+def get_speedsters():
+    """
+    Candidats au badge speedster - Temps d'exécution moyen parmi les plus rapides
+    
+    Le percentile vient du critère avg_execution_time du badge (défaut: 90) ;
+    les moyennes sont lues dans les sketches de l'historique de performance.
+    """
+    try:
+        from src.models.badge import Badge
+        from src.services.sketches import speedster_volunteers
+        
+        days = int(request.args.get('days', 30))
+        badge = Badge.query.filter_by(badge_id='speedster').first()
+        criteria = (badge.criteria if badge else None) or {}
+        percentile = float(request.args.get('percentile', criteria.get('percentile', 90)))
+        
+        date_start = datetime.utcnow() - timedelta(days=days)
+        threshold, averages = speedster_volunteers(percentile, date_start)
+        
+        volunteers = Volunteer.query.filter(
+            Volunteer.volunteer_id.in_(list(averages))
+        ).all() if averages else []
+        
+        candidates = sorted(
+            [
+                dict(v.to_dict(), average_execution_time=round(averages[v.volunteer_id], 2))
+                for v in volunteers
+            ],
+            key=lambda entry: entry['average_execution_time']
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'badge': badge.to_dict() if badge else None,
+                'percentile': percentile,
+                'threshold_execution_time': round(threshold, 2) if threshold is not None else None,
+                'period_days': days,
+                'volunteers': candidates
+            },
+            'generated_at': datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @badges_bp.route('/badges/volunteer/<volunteer_id>/badges', methods=['GET'])
 def get_volunteer_badges(volunteer_id):
     """Récupère tous les badges d'un volontaire spécifique"""
@@ -246,55 +350,76 @@ def get_volunteer_badges(volunteer_id):
 
 
 @badges_bp.route('/badges/leaderboard', methods=['GET'])
+@cached(ttl=120, tables=['volunteers', 'performance_history'], snap=60)
 def get_leaderboard():
-    """Tableau des leaders global"""
+    """
+    Tableau des leaders global
+    
+    Query params:
+    - period: all|week|month|year (défaut: all) ; hors all, classement sur
+      l'activité de la période calendaire
+    - bucket: current|previous|date ISO de la période (défaut: current)
+    """
     try:
         period = request.args.get('period', 'all')  # all, week, month, year
-        
-        query = Volunteer.query
-        
-        if period == 'week':
-            week_ago = datetime.utcnow() - timedelta(days=7)
-            query = query.filter(Volunteer.last_seen >= week_ago)
-        elif period == 'month':
-            month_ago = datetime.utcnow() - timedelta(days=30)
-            query = query.filter(Volunteer.last_seen >= month_ago)
-        elif period == 'year':
-            year_ago = datetime.utcnow() - timedelta(days=365)
-            query = query.filter(Volunteer.joined_date >= year_ago)
-        
-        # Classement par score composite
-        volunteers = query.all()
-        
-        # Calculer un score composite pour le classement
-        leaderboard = []
-        for v in volunteers:
-            composite_score = (
-                (v.tasks_completed * 0.4) + 
-                (v.performance_score * 0.3) + 
-                (v.total_computation_time * 0.3)
+        bucket_start = None
+        
+        if period in LEADERBOARD_PERIODS:
+            # Score composite sur l'activité de la période (tâches, taux de
+            # réussite, heures de calcul), lu dans l'ordre de l'index du bucket
+            bucket_start = resolve_bucket(period, request.args.get('bucket'))
+            score = volunteer_leaderboard.period_score
+            ranking = period_ranking(
+                period, bucket_start,
+                [score.desc(), volunteer_period_stats.c.volunteer_id], 50
             )
-            leaderboard.append({
-                'volunteer': v.to_dict(),
-                'composite_score': round(composite_score, 2)
-            })
-        
-        # Trier par score composite
-        leaderboard.sort(key=lambda x: x['composite_score'], reverse=True)
-        
-        # Ajouter les rangs
-        for i, entry in enumerate(leaderboard[:50], 1):
-            entry['rank'] = i
+            total_volunteers = period_count(period, bucket_start)
+            
+            leaderboard = [
+                {
+                    'volunteer': volunteer.to_dict(),
+                    'composite_score': period_stats['composite_score'],
+                    'period_stats': period_stats,
+                    'rank': rank
+                } for rank, (volunteer, period_stats) in enumerate(ranking, 1)
+            ]
+        else:
+            # Classement par score composite, trié et limité par SQLite (index
+            # sur l'expression du score) : seule la page retournée est sérialisée
+            score = volunteer_leaderboard.score
+            rows = db.session.execute(
+                select(Volunteer, score.label('composite_score'))
+                .order_by(score.desc(), Volunteer.id)
+                .limit(50)
+            ).all()
+            total_volunteers = db.session.execute(
+                select(func.count()).select_from(Volunteer)
+            ).scalar()
+            
+            leaderboard = [
+                {
+                    'volunteer': volunteer.to_dict(),
+                    'composite_score': round(composite_score, 2),
+                    'rank': rank
+                } for rank, (volunteer, composite_score) in enumerate(rows, 1)
+            ]
         
         return jsonify({
             'success': True,
             'data': {
                 'period': period,
-                'leaderboard': leaderboard[:50],
-                'total_volunteers': len(volunteers),
+                'bucket_start': bucket_start.isoformat() if bucket_start else None,
+                'leaderboard': leaderboard,
+                'weights': volunteer_leaderboard.weights,
+                'total_volunteers': total_volunteers,
                 'generated_at': datetime.utcnow().isoformat()
             }
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -308,6 +433,7 @@ def get_leaderboard():
 # NOUVEAUX ENDPOINTS POUR AFFICHER LES BADGES ATTRIBUÉS
 
 @badges_bp.route('/badges/attributed', methods=['GET'])
+@conditional(tables=['volunteer_badges', 'badges', 'volunteers'], max_age=60, stale_while_revalidate=300)
 def get_all_attributed_badges():
     """
     Récupère tous les badges attribués (avec filtres optionnels)
@@ -317,7 +443,10 @@ def get_all_attributed_badges():
     - volunteer_id: filtrer par volontaire
     - badge_id: filtrer par type de badge
     - limit: nombre de résultats (défaut: 50)
-    - offset: pagination
+    - cursor: curseur de la page suivante (next_cursor)
+    - total: none, exact ou estimate (défaut: none, exact avec offset)
+    - offset: pagination par décalage (obsolète, préférer cursor)
+    - fields: champs à retourner, badge.<champ> pour le badge (ex: id,earned_date,badge.name)
     """
     try:
         from src.models.badge import VolunteerBadge, Badge
@@ -326,38 +455,63 @@ def get_all_attributed_badges():
         period = request.args.get('period')
         volunteer_id = request.args.get('volunteer_id')
         badge_id = request.args.get('badge_id')
-        limit = int(request.args.get('limit', 50))
-        offset = int(request.args.get('offset', 0))
+        limit = page_size_argument(request.args, default=50)
+        cursor = request.args.get('cursor')
+        offset = request.args.get('offset')
+        total = total_mode_argument(request.args, default='exact' if offset is not None else 'none')
+        fieldset = fields_argument(request.args, VolunteerBadge, {'badge': Badge})
         
         # Construire la requête
-        query = VolunteerBadge.query.filter_by(revoked=False)
+        query = apply_fieldset(VolunteerBadge.query, fieldset, VolunteerBadge.earned_date).filter_by(revoked=False)
+        filters = {}
         
         if period:
             query = query.filter_by(period=period)
+            filters['period'] = period
         
         if volunteer_id:
             query = query.filter_by(volunteer_id=volunteer_id)
+            filters['volunteer_id'] = volunteer_id
         
         if badge_id:
             query = query.filter_by(badge_id=int(badge_id))
+            filters['badge_id'] = int(badge_id)
+        
+        if offset is not None and not cursor:
+            # Ancienne pagination par décalage, conservée pour les clients existants
+            offset = int(offset)
+            total_count, estimated = count_rows(query, total, VolunteerBadge.__table__, filters)
+            attributed_badges = query.order_by(
+                VolunteerBadge.earned_date.desc(), VolunteerBadge.id.desc()
+            ).limit(limit).offset(offset).all()
+            result = {
+                'badges': [badge.to_dict(fields=fieldset) for badge in attributed_badges],
+                'limit': limit,
+                'offset': offset,
+                'has_more': len(attributed_badges) == limit and (total_count is None or offset + limit < total_count)
+            }
+            if total_count is not None:
+                result.update(total=total_count, total_estimated=estimated)
+            return jsonify({'success': True, 'data': result})
         
-        # Trier par date (plus récents d'abord)
-        query = query.order_by(VolunteerBadge.earned_date.desc())
-        
-        # Pagination
-        total_count = query.count()
-        attributed_badges = query.limit(limit).offset(offset).all()
+        # Plus récents d'abord, page lue à partir du curseur
+        page = keyset_page(
+            query, 'badges_attributed', VolunteerBadge.id, sort_column=VolunteerBadge.earned_date,
+            cursor=cursor, limit=limit, filters=filters, total=total
+        )
         
         return jsonify({
             'success': True,
             'data': {
-                'badges': [badge.to_dict() for badge in attributed_badges],
-                'total': total_count,
-                'limit': limit,
-                'offset': offset,
-                'has_more': (offset + limit) < total_count
+                'badges': [badge.to_dict(fields=fieldset) for badge in page.items],
+                **page.to_dict()
             }
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -465,6 +619,7 @@ def get_attributed_badge_details(attribution_id):
 
 
 @badges_bp.route('/badges/attributed/recent', methods=['GET'])
+@cached(ttl=60, tables=['volunteer_badges', 'badges', 'volunteers'], snap=60)
 def get_recent_attributed_badges():
     """
     Récupère les badges récemment attribués (dernières 24h par défaut)
@@ -472,29 +627,48 @@ def get_recent_attributed_badges():
     Query params:
     - hours: nombre d'heures (défaut: 24)
     - limit: nombre de résultats (défaut: 20)
+    - cursor: curseur de la page suivante (next_cursor)
+    - total: none, exact ou estimate (défaut: none)
+    - fields: champs à retourner, badge.<champ> pour le badge
     """
     try:
-        from src.models.badge import VolunteerBadge
+        from src.models.badge import VolunteerBadge, Badge
         from datetime import timedelta
         
         hours = int(request.args.get('hours', 24))
-        limit = int(request.args.get('limit', 20))
+        limit = page_size_argument(request.args, default=20)
+        cursor = request.args.get('cursor')
+        total = total_mode_argument(request.args)
+        fieldset = fields_argument(request.args, VolunteerBadge, {'badge': Badge})
         
         cutoff_date = datetime.utcnow() - timedelta(hours=hours)
         
-        recent_badges = VolunteerBadge.query.filter(
+        query = apply_fieldset(VolunteerBadge.query, fieldset, VolunteerBadge.earned_date).filter(
             VolunteerBadge.earned_date >= cutoff_date,
             VolunteerBadge.revoked == False
-        ).order_by(VolunteerBadge.earned_date.desc()).limit(limit).all()
+        )
+        
+        # La fenêtre glisse entre deux pages : le curseur porte sur hours,
+        # pas sur la date limite
+        page = keyset_page(
+            query, 'badges_recent', VolunteerBadge.id, sort_column=VolunteerBadge.earned_date,
+            cursor=cursor, limit=limit, filters={'hours': hours}, total=total
+        )
         
         return jsonify({
             'success': True,
             'data': {
-                'badges': [badge.to_dict() for badge in recent_badges],
+                'badges': [badge.to_dict(fields=fieldset) for badge in page.items],
                 'period': f'last_{hours}_hours',
-                'count': len(recent_badges)
+                'count': len(page.items),
+                **page.to_dict()
             }
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -503,6 +677,7 @@ def get_recent_attributed_badges():
 # badges attribues
 
 @badges_bp.route('/badges/attributed/statistics', methods=['GET'])
+@cached(ttl=300, tables=['volunteer_badges', 'badges', 'volunteers'])
 def get_attribution_statistics():
     """
     Récupère les statistiques globales sur les attributions de badges
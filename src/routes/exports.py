@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request
+from src.models.metrics import db, SystemMetrics, Task, PerformanceHistory
+from src.services.exports import EXPORT_FORMATS, export_chunks
+from src.services.fieldsets import fields_argument
+
+exports_bp = Blueprint('exports', __name__)
+
+EXPORT_MODELS = {model.__tablename__: model for model in (SystemMetrics, Task, PerformanceHistory)}
+
+
+def export_response(table_name, where=None):
+    """
+    Réponse en flux de l'export d'une table
+    
+    Paramètres : format (ndjson, csv), start_date, end_date (ISO 8601),
+    fields (colonnes exportées, toutes par défaut)
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError('format doit valoir ndjson ou csv')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    date_start = datetime.fromisoformat(start_date) if start_date else None
+    date_end = datetime.fromisoformat(end_date) if end_date else None
+    if date_start and date_end and date_end < date_start:
+        raise ValueError('end_date doit être postérieure à start_date')
+    fieldset = fields_argument(request.args, EXPORT_MODELS[table_name])
+    columns = fieldset.columns if fieldset is not None else None
+    
+    # La connexion reste ouverte pendant l'envoi, hors du contexte de requête
+    connection = db.engine.connect()
+    try:
+        chunks = export_chunks(connection, table_name, export_format, date_start, date_end, where, columns)
+    except Exception:
+        connection.close()
+        raise
+    response = Response(chunks, mimetype=EXPORT_FORMATS[export_format])
+    response.call_on_close(connection.close)
+    response.headers['Content-Disposition'] = f'attachment; filename={table_name}.{export_format}'
+    return response
+
+
+@exports_bp.route('/export/system-metrics', methods=['GET'])
+def export_system_metrics():
+    """Exporte les métriques système d'une plage (mois archivés compris)"""
+    try:
+        return export_response(SystemMetrics.__tablename__)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@exports_bp.route('/export/tasks', methods=['GET'])
+def export_tasks():
+    """
+    Exporte les tâches créées sur une plage
+    
+    Filtres optionnels : status, workflow_id, assigned_volunteer
+    """
+    try:
+        filters = {
+            name: request.args.get(name)
+            for name in ('status', 'workflow_id', 'assigned_volunteer')
+            if request.args.get(name)
+        }
+        
+        return export_response(
+            Task.__tablename__,
+            lambda table: [table.c[name] == value for name, value in filters.items()]
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@exports_bp.route('/export/performance-history', methods=['GET'])
+def export_performance_history():
+    """
+    Exporte l'historique de performance d'une plage
+    
+    Filtres optionnels : volunteer_id, task_id
+    """
+    try:
+        filters = {
+            name: request.args.get(name)
+            for name in ('volunteer_id', 'task_id')
+            if request.args.get(name)
+        }
+        
+        return export_response(
+            PerformanceHistory.__tablename__,
+            lambda table: [table.c[name] == value for name, value in filters.items()]
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -1,37 +1,190 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from src.models.metrics import db, SystemMetrics, Volunteer, Task, PerformanceHistory
+from src.services.aggregations import format_aggregation, merge_stats
+from src.services.analytics import (
+    grouped_aggregates, histogram, threshold_counts, top_k, window_aggregates,
+    hours_since, regression_sums, regression_from_points, merge_regression, least_squares_trend
+)
+from src.services.rollups import (
+    ROLLUP_PERIODS, select_resolution, rollup_windows, rollup_series, threshold_ranges
+)
+from src.services.downsampling import choose_step, grid_series
+from src.services.ring_buffer import metrics_buffer
+from src.services.archive import metrics_archive
+from src.services.ingestion import DEFAULT_CHUNK_SIZE, insert_chunk, iter_payload, ingest_samples
+from src.services.writer import WriterBusy, add_objects, writer
+from src.services.partitions import newest_rows, partitioned_source
+from src.services.exports import iter_rows, json_list_chunks
+from src.services.pagination import DEFAULT_PAGE_SIZE, keyset_page, page_size_argument, total_mode_argument
+from src.services.fieldsets import apply_fieldset, fields_argument
+from src.services.retention import retention_days
+from src.services.sketches import RELATIVE_ACCURACY, merged_sketch
+from src.services.cache import cached
+from src.services.etags import conditional
+from src.services.alerts import threshold_incidents
+from src.services.reports import ReportUnavailable, report_worker
+from src.services.rank_index import RANK_METRICS, volunteer_ranks
+from src.services.streaming import (
+    HEARTBEAT_SECONDS, RECONNECT_MILLISECONDS, format_event, health_state, metrics_broadcaster,
+    sample_dict
+)
+from collections import namedtuple
 from datetime import datetime, timedelta
+from itertools import chain
+from operator import itemgetter
+from sqlalchemy import and_, func, or_, select
+import heapq
+import json
 import random
 
 metrics_bp = Blueprint('metrics', __name__)
 
+# Statuts de tâche présents dans les distributions
+TASK_STATUSES = ['pending', 'running', 'completed', 'failed']
+
+# Échantillon (timestamp, valeur) d'un champ de system_metrics
+Sample = namedtuple('Sample', ['timestamp', 'value'])
+
+# Tables lues par le rapport de performance
+PERFORMANCE_REPORT_TABLES = ['system_metrics', 'volunteers', 'tasks']
+
+# Arrondi (secondes) de l'instant courant des rapports en arrière-plan
+REPORT_SNAP_SECONDS = 60
+
+NO_REPORT_DATA = 'Aucune donnée pour générer le rapport'
+
+# Voisins retournés au plus de chaque côté d'un rang
+MAX_RANK_WINDOW = 100
+
 @metrics_bp.route('/system-metrics', methods=['GET'])
+@conditional(tables=['system_metrics'], max_age=5, stale_while_revalidate=30)
 def get_system_metrics():
-    """Récupère les métriques système en temps réel"""
+    """
+    Récupère les métriques système en temps réel
+    
+    Query params:
+    - fields: champs à retourner (tous par défaut)
+    """
     try:
+        fieldset = fields_argument(request.args, SystemMetrics)
+        
         # Récupérer les dernières métriques ou générer des données de démonstration
-        latest_metrics = SystemMetrics.query.order_by(SystemMetrics.timestamp.desc()).first()
+        latest_metrics = latest_metrics_dict()
         
         if not latest_metrics:
             # Générer des données de démonstration
-            demo_metrics = SystemMetrics(
-                total_volunteers=random.randint(50, 150),
-                active_volunteers=random.randint(20, 80),
-                total_tasks=random.randint(1000, 5000),
-                completed_tasks=random.randint(800, 4500),
-                pending_tasks=random.randint(50, 500),
-                cpu_usage=random.uniform(30.0, 85.0),
-                memory_usage=random.uniform(40.0, 90.0),
-                network_throughput=random.uniform(100.0, 1000.0),
-                cost_savings=random.uniform(10000.0, 50000.0)
-            )
-            db.session.add(demo_metrics)
-            db.session.commit()
-            latest_metrics = demo_metrics
+            demo_metrics = demo_metrics_row(datetime.utcnow())
+            insert_chunk([demo_metrics])
+            latest_metrics = sample_dict(demo_metrics)
+        
+        if fieldset is not None:
+            latest_metrics = {name: latest_metrics.get(name) for name in fieldset.columns}
         
         return jsonify({
             'success': True,
-            'data': latest_metrics.to_dict()
+            'data': latest_metrics
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        # File d'écriture pleine : réponse 503 du gestionnaire de l'application
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/system-metrics', methods=['POST'])
+def ingest_system_metrics():
+    """
+    Ingestion en masse de métriques système
+    
+    Corps : tableau JSON d'échantillons, objet unique ou flux NDJSON
+    (Content-Type: application/x-ndjson). Paramètre chunk_size optionnel.
+    Les échantillons invalides sont rejetés individuellement ; les autres
+    sont insérés par lots, chacun dans sa propre transaction.
+    """
+    try:
+        chunk_size = int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        if chunk_size <= 0:
+            raise ValueError('chunk_size doit être positif')
+        
+        samples = iter_payload(request.mimetype, request.stream, request.get_json)
+        report = ingest_samples(samples, chunk_size=min(chunk_size, DEFAULT_CHUNK_SIZE))
+        
+        failed = any(chunk['status'] == 'failed' for chunk in report['chunks'])
+        busy = any(chunk['status'] == 'busy' for chunk in report['chunks'])
+        if not report['inserted'] and busy:
+            status_code = 503
+        elif not report['inserted'] and (failed or report['received']):
+            status_code = 500 if failed else 400
+        else:
+            status_code = 201 if report['inserted'] else 200
+        
+        response = jsonify({
+            'success': status_code < 400 and not failed and not busy,
+            'data': report
+        })
+        response.status_code = status_code
+        if busy:
+            response.headers['Retry-After'] = '1'
+        return response
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/system-metrics/stream', methods=['GET'])
+def stream_system_metrics():
+    """
+    Flux Server-Sent Events des nouvelles métriques système
+    
+    Remplace l'interrogation périodique de GET /system-metrics : la dernière
+    métrique est envoyée à la connexion, puis chaque nouvel échantillon
+    (événement metrics) et chaque changement d'état de santé (événement
+    health). Un commentaire keep-alive est envoyé en l'absence de données.
+    
+    Query params:
+    - health: true|false (défaut: true) - inclure les événements health
+    """
+    try:
+        include_health = request.args.get('health', 'true').lower() == 'true'
+        current = latest_metrics_dict()
+        
+        def generate():
+            # Abonnement pris au premier chunk : une réponse jamais lue
+            # (client parti, HEAD, erreur) ne laisse pas d'abonné actif
+            subscriber = None
+            try:
+                subscriber = metrics_broadcaster.subscribe(include_health)
+                yield f'retry: {RECONNECT_MILLISECONDS}\n\n'
+                if current:
+                    yield format_event('metrics', current, current['id'])
+                    if include_health:
+                        yield format_event('health', dict(health_state(current), timestamp=current['timestamp']))
+                while True:
+                    messages = subscriber.wait(HEARTBEAT_SECONDS)
+                    if not messages:
+                        yield ': keep-alive\n\n'
+                    for message in messages:
+                        yield message
+            finally:
+                if subscriber is not None:
+                    metrics_broadcaster.unsubscribe(subscriber)
+        
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
         })
     except Exception as e:
         return jsonify({
@@ -40,13 +193,33 @@ def get_system_metrics():
         }), 500
 
 @metrics_bp.route('/volunteers', methods=['GET'])
+@conditional(tables=['volunteers'], max_age=30, stale_while_revalidate=120)
 def get_volunteers():
-    """Récupère la liste des volontaires et leurs performances"""
+    """
+    Récupère la liste des volontaires et leurs performances
+    
+    Query params:
+    - limit: taille de page (défaut: toute la liste, ou 50 avec un curseur)
+    - cursor: curseur de la page suivante (pagination.next_cursor)
+    - total: none, exact ou estimate (défaut: none)
+    - fields: champs à retourner (ex: volunteer_id,name,tasks_completed)
+    """
     try:
-        volunteers = Volunteer.query.all()
+        cursor = request.args.get('cursor')
+        limit = page_size_argument(request.args, default=DEFAULT_PAGE_SIZE if cursor else None)
+        total = total_mode_argument(request.args)
+        fieldset = fields_argument(request.args, Volunteer)
+        
+        def volunteers_page():
+            return keyset_page(
+                apply_fieldset(Volunteer.query, fieldset), 'volunteers', Volunteer.id, descending=False,
+                cursor=cursor, limit=limit, total=total
+            )
+        
+        page = volunteers_page()
         
         # Si aucun volontaire, générer des données de démonstration
-        if not volunteers:
+        if not page.items and not cursor:
             demo_volunteers = [
                 Volunteer(
                     volunteer_id=f"vol_{i:03d}",
@@ -59,16 +232,21 @@ def get_volunteers():
                     performance_score=random.uniform(70.0, 95.0)
                 ) for i in range(1, 21)
             ]
-            
-            for vol in demo_volunteers:
-                db.session.add(vol)
-            db.session.commit()
-            volunteers = demo_volunteers
+            writer.run(add_objects(demo_volunteers))
+            page = volunteers_page()
         
         return jsonify({
             'success': True,
-            'data': [vol.to_dict() for vol in volunteers]
+            'data': [vol.to_dict(fields=fieldset) for vol in page.items],
+            'pagination': page.to_dict()
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
@@ -87,16 +265,17 @@ def get_volunteer_details(volunteer_id):
                 'error': 'Volontaire non trouvé'
             }), 404
         
-        # Récupérer l'historique des performances
-        performance_history = PerformanceHistory.query.filter_by(
-            volunteer_id=volunteer_id
-        ).order_by(PerformanceHistory.timestamp.desc()).limit(50).all()
+        # Récupérer l'historique des performances (partitions les plus récentes d'abord)
+        performance_history = newest_rows(
+            PerformanceHistory.__tablename__, 50,
+            where=lambda history: [history.c.volunteer_id == volunteer_id]
+        )
         
         return jsonify({
             'success': True,
             'data': {
                 'volunteer': volunteer.to_dict(),
-                'performance_history': [perf.to_dict() for perf in performance_history]
+                'performance_history': [PerformanceHistory(**perf).to_dict() for perf in performance_history]
             }
         })
     except Exception as e:
@@ -106,20 +285,42 @@ def get_volunteer_details(volunteer_id):
         }), 500
 
 @metrics_bp.route('/tasks', methods=['GET'])
+@conditional(tables=['tasks'], max_age=15, stale_while_revalidate=60)
 def get_tasks():
-    """Récupère la liste des tâches"""
+    """
+    Récupère la liste des tâches (plus récentes d'abord)
+    
+    Query params:
+    - status: filtrer par statut
+    - limit: taille de page (défaut: 100)
+    - cursor: curseur de la page suivante (pagination.next_cursor)
+    - total: none, exact ou estimate (défaut: none)
+    - fields: champs à retourner (ex: task_id,status,execution_time)
+    """
     try:
         status_filter = request.args.get('status')
-        limit = int(request.args.get('limit', 100))
-        
-        query = Task.query
+        limit = page_size_argument(request.args, default=100)
+        cursor = request.args.get('cursor')
+        total = total_mode_argument(request.args)
+        fieldset = fields_argument(request.args, Task)
+        
+        # La date de création sert à construire le curseur
+        query = apply_fieldset(Task.query, fieldset, Task.created_date)
+        filters = {}
         if status_filter:
             query = query.filter_by(status=status_filter)
+            filters['status'] = status_filter
+        
+        def tasks_page():
+            return keyset_page(
+                query, 'tasks', Task.id, sort_column=Task.created_date,
+                cursor=cursor, limit=limit, filters=filters, total=total
+            )
         
-        tasks = query.order_by(Task.created_date.desc()).limit(limit).all()
+        page = tasks_page()
         
         # Si aucune tâche, générer des données de démonstration
-        if not tasks:
+        if not page.items and not cursor:
             demo_tasks = [
                 Task(
                     task_id=f"task_{i:04d}",
@@ -131,16 +332,21 @@ def get_tasks():
                     memory_usage=random.uniform(30.0, 80.0)
                 ) for i in range(1, 101)
             ]
-            
-            for task in demo_tasks:
-                db.session.add(task)
-            db.session.commit()
-            tasks = demo_tasks[:limit]
+            writer.run(add_objects(demo_tasks))
+            page = tasks_page()
         
         return jsonify({
             'success': True,
-            'data': [task.to_dict() for task in tasks]
+            'data': [task.to_dict(fields=fieldset) for task in page.items],
+            'pagination': page.to_dict()
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
@@ -149,43 +355,63 @@ def get_tasks():
 
 @metrics_bp.route('/analytics/performance-history', methods=['GET'])
 def get_performance_analytics():
-    """Récupère l'historique des performances pour les analyses"""
+    """
+    Récupère l'historique des performances pour les analyses
+    
+    Query params:
+    - days: nombre de jours d'historique (défaut: 7)
+    - fields: champs à retourner ; seules ces colonnes sont lues
+    """
     try:
         days = int(request.args.get('days', 7))
         start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Récupérer les métriques système historiques
-        metrics_history = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= start_date
-        ).order_by(SystemMetrics.timestamp.asc()).all()
+        fieldset = fields_argument(request.args, SystemMetrics)
+        columns = fieldset.columns if fieldset is not None else None
+        
+        # Métriques système historiques (partitions et mois archivés), lues
+        # par lots et envoyées en flux sans construire la liste complète
+        connection = db.engine.connect()
+        try:
+            metrics_history = iter_rows(
+                connection, SystemMetrics.__tablename__, start_date, columns=columns
+            )
+            first = next(metrics_history, None)
+        except Exception:
+            connection.close()
+            raise
         
         # Si pas d'historique, générer des données de démonstration
-        if not metrics_history:
+        if first is None:
+            connection.close()
             demo_history = []
-            for i in range(days * 24):  # Une entrée par heure
-                timestamp = start_date + timedelta(hours=i)
-                demo_metrics = SystemMetrics(
-                    timestamp=timestamp,
-                    total_volunteers=random.randint(50, 150),
-                    active_volunteers=random.randint(20, 80),
-                    total_tasks=random.randint(1000, 5000),
-                    completed_tasks=random.randint(800, 4500),
-                    pending_tasks=random.randint(50, 500),
-                    cpu_usage=random.uniform(30.0, 85.0),
-                    memory_usage=random.uniform(40.0, 90.0),
-                    network_throughput=random.uniform(100.0, 1000.0),
-                    cost_savings=random.uniform(10000.0, 50000.0)
-                )
-                demo_history.append(demo_metrics)
-                db.session.add(demo_metrics)
+            # Ne pas générer de lignes que la rétention supprimerait aussitôt
+            demo_days = min(days, retention_days(current_app.config, 'system_metrics') or days)
+            demo_start = datetime.utcnow() - timedelta(days=demo_days)
+            for i in range(demo_days * 24):  # Une entrée par heure
+                timestamp = demo_start + timedelta(hours=i)
+                demo_history.append(demo_metrics_row(timestamp))
+            insert_chunk(demo_history)
             
-            db.session.commit()
-            metrics_history = demo_history
+            return jsonify({
+                'success': True,
+                'data': [sample_dict(metrics, columns) for metrics in demo_history]
+            })
         
+        response = Response(
+            json_list_chunks(
+                sample_dict(metrics, columns) for metrics in chain([first], metrics_history)
+            ),
+            mimetype='application/json'
+        )
+        response.call_on_close(connection.close)
+        return response
+    except ValueError as e:
         return jsonify({
-            'success': True,
-            'data': [metrics.to_dict() for metrics in metrics_history]
-        })
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
@@ -193,6 +419,7 @@ def get_performance_analytics():
         }), 500
 
 @metrics_bp.route('/analytics/cost-savings', methods=['GET'])
+@cached(ttl=300, tables=['tasks'])
 def get_cost_savings_analytics():
     """Récupère les analyses d'économies de coûts"""
     try:
@@ -227,6 +454,7 @@ def get_cost_savings_analytics():
         }), 500
 
 @metrics_bp.route('/analytics/volunteer-performance', methods=['GET'])
+@cached(ttl=300, tables=['volunteers'])
 def get_volunteer_performance_analytics():
     """Récupère les analyses de performance des volontaires"""
     try:
@@ -278,6 +506,21 @@ def get_date_range(period, start_date=None, end_date=None):
     else:
         return now - timedelta(days=1), now
 
+def demo_metrics_row(timestamp):
+    """Échantillon de démonstration de métriques système"""
+    return {
+        'timestamp': timestamp,
+        'total_volunteers': random.randint(50, 150),
+        'active_volunteers': random.randint(20, 80),
+        'total_tasks': random.randint(1000, 5000),
+        'completed_tasks': random.randint(800, 4500),
+        'pending_tasks': random.randint(50, 500),
+        'cpu_usage': random.uniform(30.0, 85.0),
+        'memory_usage': random.uniform(40.0, 90.0),
+        'network_throughput': random.uniform(100.0, 1000.0),
+        'cost_savings': random.uniform(10000.0, 50000.0)
+    }
+
 def calculate_aggregations(metrics_list, field_name):
     """Calcule les agrégations pour un champ donné"""
     if not metrics_list:
@@ -300,35 +543,365 @@ def calculate_aggregations(metrics_list, field_name):
     }
 
 def calculate_trend(metrics_list, field_name):
-    """Calcule la tendance (croissance/décroissance) d'un champ"""
+    """
+    Calcule la tendance (croissance/décroissance) d'un champ par moindres
+    carrés sur des éléments ordonnés ayant un attribut timestamp
+    """
     if len(metrics_list) < 2:
         return {'trend': 'stable', 'percentage': 0}
     
-    first_value = getattr(metrics_list[0], field_name, 0)
-    last_value = getattr(metrics_list[-1], field_name, 0)
+    origin = metrics_list[0].timestamp
+    return least_squares_trend(regression_from_points(
+        ((m.timestamp - origin).total_seconds() / 3600, getattr(m, field_name, 0))
+        for m in metrics_list
+    ))
+
+def summarize_metrics(date_start, date_end, fields, trend_fields=(), period=None):
+    """
+    Agrège les métriques système d'une plage directement en SQL
     
-    if first_value == 0:
-        return {'trend': 'stable', 'percentage': 0}
+    Retourne (nombre de points, agrégations par champ, tendances par champ)
+    sans construire d'objets ORM.
+    """
+    return summarize_windows([(date_start, date_end)], fields, trend_fields, period)[0]
+
+def summarize_windows(windows, fields, trend_fields=(), period=None):
+    """
+    Agrège plusieurs plages [(début, fin), ...] en un minimum de lectures
     
-    percentage_change = ((last_value - first_value) / first_value) * 100
+    Les plages contenues dans le tampon mémoire sont calculées sans SQL ;
+    pour les périodes longues (week, month, year, custom), les plages qui
+    contiennent des buckets complets sont lues ensemble depuis les rollups ;
+    les autres sont agrégées ensemble par une seule requête sur la table
+    brute (une colonne CASE par plage), complétée par l'archive pour les
+    mois archivés.
     
-    if percentage_change > 5:
-        trend = 'increasing'
-    elif percentage_change < -5:
-        trend = 'decreasing'
-    else:
-        trend = 'stable'
+    Retourne, dans l'ordre des plages, des triplets
+    (nombre de points, agrégations par champ, tendances par champ).
+    """
+    summaries = [None] * len(windows)
+    remaining = []
+    for index, (date_start, date_end) in enumerate(windows):
+        if metrics_buffer.covers(date_start):
+            count, stats = metrics_buffer.summary(fields, date_start, date_end)
+            regressions = metrics_buffer.regression(trend_fields, date_start, date_end)
+            summaries[index] = (count, stats, regressions)
+        else:
+            remaining.append(index)
     
-    return {
-        'trend': trend,
-        'percentage': round(percentage_change, 2),
-        'first_value': round(first_value, 2),
-        'last_value': round(last_value, 2)
-    }
+    if remaining and period in ROLLUP_PERIODS:
+        candidates = []
+        for index in remaining:
+            date_start, date_end = windows[index]
+            resolution = select_resolution(date_start, date_end)
+            if resolution:
+                candidates.append((index, (resolution, date_start, date_end)))
+        if candidates:
+            results = rollup_windows([window for _, window in candidates], fields, trend_fields)
+            for (index, _), result in zip(candidates, results):
+                summaries[index] = result
+        remaining = [index for index in remaining if summaries[index] is None]
+    
+    if remaining:
+        origin = min(windows[index][0] for index in remaining)
+        ends = [windows[index][1] for index in remaining]
+        source = metrics_source(origin, None if None in ends else max(ends))
+        results = window_aggregates(
+            source,
+            [and_(*metrics_range_criteria(source, *windows[index])) for index in remaining],
+            fields,
+            hours_since(source.c.timestamp, origin),
+            trend_fields
+        )
+        archived = metrics_archive.window_aggregates(
+            [[windows[index]] for index in remaining], fields, origin, trend_fields
+        )
+        for index, (stats, regressions), (archived_stats, archived_regressions) in zip(
+            remaining, results, archived
+        ):
+            stats = {field: merge_stats(stats[field], archived_stats[field]) for field in fields}
+            regressions = {
+                field: merge_regression(regressions[field], archived_regressions[field])
+                for field in trend_fields
+            }
+            count = stats[fields[0]]['count'] if fields else 0
+            summaries[index] = (count, stats, regressions)
+    
+    return [
+        (
+            count,
+            {field: format_aggregation(stats[field]) for field in fields},
+            {field: least_squares_trend(regressions.get(field)) for field in trend_fields}
+        ) for count, stats, regressions in summaries
+    ]
+
+def latest_metrics_dict():
+    """Dernière métrique système (tampon mémoire, sinon base) ou None"""
+    metrics_buffer.sync()
+    latest = metrics_buffer.latest()
+    if latest is None:
+        rows = newest_rows(SystemMetrics.__tablename__, 1)
+        latest = sample_dict(rows[0]) if rows else None
+    return latest
+
+def metrics_source(date_start, date_end):
+    """Partitions de system_metrics qui chevauchent [date_start, date_end]"""
+    return partitioned_source(SystemMetrics.__tablename__, date_start, date_end)
+
+def metrics_range_criteria(source, date_start, date_end):
+    """Critères SQL de la plage [date_start, date_end] sur system_metrics"""
+    criteria = [source.c.timestamp >= date_start]
+    if date_end is not None:
+        criteria.append(source.c.timestamp <= date_end)
+    return criteria
+
+def archived_samples(field, date_start, date_end, threshold=None):
+    """
+    Échantillons archivés (timestamp, valeur) d'un champ, en ordre
+    chronologique ; threshold ne garde que les valeurs >= threshold
+    """
+    where = (field, threshold) if threshold is not None else None
+    samples = metrics_archive.samples([field], date_start, date_end, where=where)
+    return list(zip(samples['timestamp'], samples[field]))
+
+def merge_samples(rows, archived):
+    """Fusionne en ordre chronologique des échantillons lus en SQL et archivés"""
+    if not archived:
+        return rows
+    return sorted(chain(archived, rows), key=itemgetter(0))
+
+def threshold_samples(field, date_start, date_end, threshold):
+    """
+    Échantillons (timestamp, valeur) d'un champ supérieurs ou égaux à un seuil,
+    en ordre chronologique
+    """
+    if metrics_buffer.covers(date_start):
+        samples = metrics_buffer.samples([field], date_start, date_end, where=(field, threshold))
+        return list(zip(samples['timestamp'], samples[field]))
+    
+    source = metrics_source(date_start, date_end)
+    rows = db.session.execute(
+        select(source.c.timestamp, source.c[field])
+        .where(*metrics_range_criteria(source, date_start, date_end), source.c[field] >= threshold)
+        .order_by(source.c.timestamp.asc(), source.c.id.asc())
+    ).all()
+    return merge_samples(rows, archived_samples(field, date_start, date_end, threshold))
+
+def load_series(field, date_start, date_end, period, step=None):
+    """
+    Charge la série temporelle d'un champ avec son agrégation et sa tendance
+    
+    Avec un pas (step, en secondes), la série est rééchantillonnée sur une
+    grille régulière avec min/max par cellule et marqueurs de trous. Sinon
+    les longues périodes sont servies depuis les rollups (un point par
+    bucket) et les autres lisent seulement les colonnes timestamp et field.
+    
+    Retourne (résolution, agrégation, tendance, points)
+    """
+    resolution = select_resolution(date_start, date_end) if period in ROLLUP_PERIODS else None
+    
+    if step or resolution:
+        _, aggregations, trends = summarize_metrics(
+            date_start, date_end, [field], trend_fields=[field], period=period
+        )
+        if step:
+            resolution, points = grid_series(field, date_start, date_end, step)
+        else:
+            points = [
+                {'timestamp': point['bucket_start'], 'value': point['average']}
+                for point in rollup_series(resolution, date_start, date_end, field)
+            ]
+        return resolution, aggregations[field], trends[field], points
+    
+    source = metrics_source(date_start, date_end)
+    rows = db.session.execute(
+        select(source.c.timestamp, source.c[field])
+        .where(*metrics_range_criteria(source, date_start, date_end))
+        .order_by(source.c.timestamp.asc())
+    ).all()
+    samples = [
+        Sample(*row) for row in merge_samples(rows, archived_samples(field, date_start, date_end))
+    ]
+    # Comme les agrégats SQL, statistiques et tendance ignorent les NULL
+    present = [sample for sample in samples if sample.value is not None]
+    
+    return (
+        'raw',
+        calculate_aggregations(present, 'value'),
+        calculate_trend(present, 'value'),
+        [{'timestamp': sample.timestamp, 'value': sample.value} for sample in samples]
+    )
+
+def format_series(points, key):
+    """Met en forme les points d'une série pour la réponse JSON"""
+    data_points = []
+    for point in points:
+        entry = {
+            'timestamp': point['timestamp'].isoformat(),
+            key: point['value']
+        }
+        if 'min' in point:
+            entry['min'] = point['min']
+            entry['max'] = point['max']
+        if point.get('gap'):
+            entry['gap'] = True
+        data_points.append(entry)
+    return data_points
+
+def series_step(date_start, date_end):
+    """Pas de rééchantillonnage demandé via max_points / resolution"""
+    max_points = request.args.get('max_points')
+    return choose_step(
+        date_start, date_end,
+        max_points=int(max_points) if max_points is not None else None,
+        resolution=request.args.get('resolution')
+    )
+
+def threshold_range_criteria(source, ranges):
+    """Critère SQL : timestamp dans l'une des plages [début, fin) données"""
+    return or_(*[
+        and_(source.c.timestamp >= start, source.c.timestamp < end)
+        if end is not None else source.c.timestamp >= start
+        for start, end in ranges
+    ])
+
+def count_above(field, date_start, date_end, thresholds):
+    """
+    Compte en une requête les échantillons strictement au-dessus de chaque
+    seuil, en ne lisant que les buckets du rollup dont le maximum dépasse
+    le plus bas des seuils
+    """
+    source = metrics_source(date_start, date_end)
+    ranges = threshold_ranges(field, min(thresholds), date_start, date_end)
+    counts = threshold_counts(
+        source.c[field], thresholds,
+        *metrics_range_criteria(source, date_start, date_end),
+        threshold_range_criteria(source, ranges)
+    )
+    archived = [value for _, value in archived_samples(field, date_start, date_end, min(thresholds))]
+    return [
+        count + sum(1 for value in archived if value > threshold)
+        for count, threshold in zip(counts, thresholds)
+    ]
+
+def peak_summary(field, date_start, date_end, threshold, limit):
+    """
+    Nombre d'échantillons >= threshold, valeur maximale et limit plus hauts
+    pics (valeur décroissante, puis ordre chronologique)
+    """
+    if metrics_buffer.covers(date_start):
+        samples = threshold_samples(field, date_start, date_end, threshold)
+        highest = heapq.nlargest(limit, samples, key=lambda sample: sample[1])
+        return len(samples), (highest[0][1] if highest else 0), highest
+    
+    source = metrics_source(date_start, date_end)
+    column = source.c[field]
+    criteria = metrics_range_criteria(source, date_start, date_end) + [column >= threshold]
+    count, maximum = db.session.execute(
+        select(func.count(), func.max(column)).where(*criteria)
+    ).one()
+    highest = top_k(
+        [source.c.timestamp, column],
+        [column.desc(), source.c.timestamp.asc(), source.c.id.asc()],
+        limit,
+        *criteria
+    )
+    archived = archived_samples(field, date_start, date_end, threshold)
+    if archived:
+        count += len(archived)
+        maximum = max(maximum or 0, max(value for _, value in archived))
+        # nlargest est stable : à valeur égale, l'ordre chronologique est conservé
+        highest = heapq.nlargest(limit, merge_samples(highest, archived), key=itemgetter(1))
+    return count, maximum or 0, highest
+
+def peak_events(field, date_start, date_end, threshold, limit):
+    """
+    Pics d'un champ sur une période : pic de chaque incident de la règle
+    d'alerte qui couvre threshold, ou échantillons bruts si aucune règle
+    ne le couvre
+    
+    Retourne (nombre de pics, valeur maximale, limit plus hauts pics)
+    """
+    incidents = threshold_incidents(field, threshold, date_start, date_end, order='peak', limit=limit)
+    if incidents is not None:
+        count, highest, rows = incidents
+        return count, highest or 0, [
+            dict(incident, timestamp=incident['peak_at'], value=incident['peak_value'])
+            for incident in rows
+        ]
+    
+    count, highest, samples = peak_summary(field, date_start, date_end, threshold, limit)
+    return count, highest, [
+        {'timestamp': timestamp.isoformat(), 'value': value} for timestamp, value in samples
+    ]
+
+def alert_events(field, date_start, threshold, limit):
+    """
+    Alertes d'un champ depuis date_start (plus récentes d'abord) : incidents
+    de la règle d'alerte qui couvre threshold, ou échantillons bruts si
+    aucune règle ne le couvre
+    
+    Retourne (nombre d'alertes, limit plus récentes)
+    """
+    incidents = threshold_incidents(field, threshold, date_start, order='recent', limit=limit)
+    if incidents is not None:
+        count, _, rows = incidents
+        return count, [
+            dict(incident, timestamp=incident['started_at'], value=incident['peak_value'])
+            for incident in rows
+        ]
+    
+    samples = threshold_samples(field, date_start, None, threshold)
+    return len(samples), [
+        {
+            'timestamp': timestamp.isoformat(),
+            'value': value,
+            'severity': 'critical' if value > 95 else 'warning'
+        } for timestamp, value in reversed(samples[-limit:])
+    ]
+
+def events_above(field, date_start, date_end, threshold, limit):
+    """
+    Premiers échantillons (ordre chronologique) au-dessus d'un seuil, lus
+    jusqu'au limit-ième bucket du rollup dont le maximum le dépasse
+    """
+    source = metrics_source(date_start, date_end)
+    archived = [
+        sample for sample in archived_samples(field, date_start, date_end, threshold)
+        if sample[1] > threshold
+    ]
+    
+    def first_events(ranges):
+        rows = db.session.execute(
+            select(source.c.timestamp, source.c[field])
+            .where(
+                *metrics_range_criteria(source, date_start, date_end),
+                threshold_range_criteria(source, ranges),
+                source.c[field] > threshold
+            )
+            .order_by(source.c.timestamp.asc())
+            .limit(limit)
+        ).all()
+        return merge_samples(rows, archived)[:limit]
+    
+    ranges = threshold_ranges(field, threshold, date_start, date_end, limit=limit)
+    rows = first_events(ranges)
+    if len(rows) < limit:
+        # Buckets dont les lignes brutes ont expiré (rétention) : toutes les plages
+        all_ranges = threshold_ranges(field, threshold, date_start, date_end)
+        if all_ranges != ranges:
+            rows = first_events(all_ranges)
+    return [
+        {
+            'timestamp': timestamp.isoformat(),
+            'value': value
+        } for timestamp, value in rows
+    ]
 
 
 
 @metrics_bp.route('/performance/global', methods=['GET'])
+@cached(ttl=60, tables=['system_metrics'], snap=60)
 def get_global_performance_metrics():
     """
     Récupère les métriques globales de performance (CPU, mémoire, réseau)
@@ -349,13 +922,20 @@ def get_global_performance_metrics():
         # Calculer la plage de dates
         date_start, date_end = get_date_range(period, start_date, end_date)
         
-        # Récupérer les métriques de la période
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= date_start,
-            SystemMetrics.timestamp <= date_end
-        ).order_by(SystemMetrics.timestamp.asc()).all()
-        
-        if not metrics:
+        # Agréger les métriques de la période en une seule requête
+        count, aggregations, trends = summarize_metrics(
+            date_start, date_end,
+            ['cpu_usage', 'memory_usage', 'network_throughput',
+             'total_volunteers', 'active_volunteers',
+             'total_tasks', 'completed_tasks', 'pending_tasks', 'cost_savings'],
+            trend_fields=(
+                ['cpu_usage', 'memory_usage', 'network_throughput',
+                 'active_volunteers', 'completed_tasks'] if include_trends else []
+            ),
+            period=period
+        )
+        
+        if not count:
             return jsonify({
                 'success': False,
                 'error': 'Aucune donnée disponible pour cette période'
@@ -367,31 +947,31 @@ def get_global_performance_metrics():
                 'type': period,
                 'start': date_start.isoformat(),
                 'end': date_end.isoformat(),
-                'data_points': len(metrics)
+                'data_points': count
             },
-            'cpu': calculate_aggregations(metrics, 'cpu_usage'),
-            'memory': calculate_aggregations(metrics, 'memory_usage'),
-            'network': calculate_aggregations(metrics, 'network_throughput'),
+            'cpu': aggregations['cpu_usage'],
+            'memory': aggregations['memory_usage'],
+            'network': aggregations['network_throughput'],
             'volunteers': {
-                'total': calculate_aggregations(metrics, 'total_volunteers'),
-                'active': calculate_aggregations(metrics, 'active_volunteers')
+                'total': aggregations['total_volunteers'],
+                'active': aggregations['active_volunteers']
             },
             'tasks': {
-                'total': calculate_aggregations(metrics, 'total_tasks'),
-                'completed': calculate_aggregations(metrics, 'completed_tasks'),
-                'pending': calculate_aggregations(metrics, 'pending_tasks')
+                'total': aggregations['total_tasks'],
+                'completed': aggregations['completed_tasks'],
+                'pending': aggregations['pending_tasks']
             },
-            'cost_savings': calculate_aggregations(metrics, 'cost_savings')
+            'cost_savings': aggregations['cost_savings']
         }
         
         # Ajouter les tendances si demandé
         if include_trends:
             response_data['trends'] = {
-                'cpu': calculate_trend(metrics, 'cpu_usage'),
-                'memory': calculate_trend(metrics, 'memory_usage'),
-                'network': calculate_trend(metrics, 'network_throughput'),
-                'active_volunteers': calculate_trend(metrics, 'active_volunteers'),
-                'completed_tasks': calculate_trend(metrics, 'completed_tasks')
+                'cpu': trends['cpu_usage'],
+                'memory': trends['memory_usage'],
+                'network': trends['network_throughput'],
+                'active_volunteers': trends['active_volunteers'],
+                'completed_tasks': trends['completed_tasks']
             }
         
         return jsonify({
@@ -406,6 +986,7 @@ def get_global_performance_metrics():
         }), 500
 
 @metrics_bp.route('/performance/cpu', methods=['GET'])
+@cached(ttl=60, tables=['system_metrics'], snap=60)
 def get_cpu_performance():
     """
     Récupère les métriques CPU détaillées avec agrégations et pics
@@ -413,6 +994,8 @@ def get_cpu_performance():
     Query params:
     - period: hour|day|week|month|year|custom
     - start_date, end_date: pour période custom
+    - max_points: nombre maximal de points renvoyés (grille régulière)
+    - resolution: pas de la grille (30s, 5m, 1h, 1d ou minute|hour|day)
     """
     try:
         period = request.args.get('period', 'day')
@@ -421,45 +1004,36 @@ def get_cpu_performance():
         
         date_start, date_end = get_date_range(period, start_date, end_date)
         
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= date_start,
-            SystemMetrics.timestamp <= date_end
-        ).order_by(SystemMetrics.timestamp.asc()).all()
+        resolution, aggregations, trend, points = load_series(
+            'cpu_usage', date_start, date_end, period,
+            step=series_step(date_start, date_end)
+        )
         
-        if not metrics:
+        if not aggregations['count']:
             return jsonify({
                 'success': False,
                 'error': 'Aucune donnée CPU disponible'
             }), 404
         
         # Points de données
-        data_points = [
-            {
-                'timestamp': m.timestamp.isoformat(),
-                'cpu_usage': m.cpu_usage
-            } for m in metrics
-        ]
+        data_points = format_series(points, 'cpu_usage')
         
         # Identifier les pics (> 80%)
-        peaks = [
-            {
-                'timestamp': m.timestamp.isoformat(),
-                'value': m.cpu_usage
-            } for m in metrics if m.cpu_usage > 80
-        ]
+        peaks_count, = count_above('cpu_usage', date_start, date_end, [80])
         
         response = {
             'success': True,
             'data': {
                 'period': {
                     'start': date_start.isoformat(),
-                    'end': date_end.isoformat()
+                    'end': date_end.isoformat(),
+                    'resolution': resolution
                 },
-                'aggregations': calculate_aggregations(metrics, 'cpu_usage'),
-                'trend': calculate_trend(metrics, 'cpu_usage'),
+                'aggregations': aggregations,
+                'trend': trend,
                 'peaks': {
-                    'count': len(peaks),
-                    'events': peaks[:20]  # Limiter à 20 pics
+                    'count': peaks_count,
+                    'events': events_above('cpu_usage', date_start, date_end, 80, 20)  # Limiter à 20 pics
                 },
                 'data_points': data_points
             }
@@ -467,6 +1041,11 @@ def get_cpu_performance():
         
         return jsonify(response)
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -474,9 +1053,16 @@ def get_cpu_performance():
         }), 500
 
 @metrics_bp.route('/performance/memory', methods=['GET'])
+@cached(ttl=60, tables=['system_metrics'], snap=60)
 def get_memory_performance():
     """
     Récupère les métriques mémoire détaillées avec agrégations et alertes
+    
+    Query params:
+    - period: hour|day|week|month|year|custom
+    - start_date, end_date: pour période custom
+    - max_points: nombre maximal de points renvoyés (grille régulière)
+    - resolution: pas de la grille (30s, 5m, 1h, 1d ou minute|hour|day)
     """
     try:
         period = request.args.get('period', 'day')
@@ -485,41 +1071,46 @@ def get_memory_performance():
         
         date_start, date_end = get_date_range(period, start_date, end_date)
         
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= date_start,
-            SystemMetrics.timestamp <= date_end
-        ).order_by(SystemMetrics.timestamp.asc()).all()
+        resolution, aggregations, trend, points = load_series(
+            'memory_usage', date_start, date_end, period,
+            step=series_step(date_start, date_end)
+        )
         
-        if not metrics:
+        if not aggregations['count']:
             return jsonify({
                 'success': False,
                 'error': 'Aucune donnée mémoire disponible'
             }), 404
         
-        data_points = [
-            {
-                'timestamp': m.timestamp.isoformat(),
-                'memory_usage': m.memory_usage
-            } for m in metrics
-        ]
+        data_points = format_series(points, 'memory_usage')
+        
+        high_usage_count, critical_usage_count = count_above(
+            'memory_usage', date_start, date_end, [85, 95]
+        )
         
         return jsonify({
             'success': True,
             'data': {
                 'period': {
                     'start': date_start.isoformat(),
-                    'end': date_end.isoformat()
+                    'end': date_end.isoformat(),
+                    'resolution': resolution
                 },
-                'aggregations': calculate_aggregations(metrics, 'memory_usage'),
-                'trend': calculate_trend(metrics, 'memory_usage'),
+                'aggregations': aggregations,
+                'trend': trend,
                 'data_points': data_points,
                 'alerts': {
-                    'high_usage_count': len([m for m in metrics if m.memory_usage > 85]),
-                    'critical_usage_count': len([m for m in metrics if m.memory_usage > 95])
+                    'high_usage_count': high_usage_count,
+                    'critical_usage_count': critical_usage_count
                 }
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -527,9 +1118,16 @@ def get_memory_performance():
         }), 500
 
 @metrics_bp.route('/performance/network', methods=['GET'])
+@cached(ttl=60, tables=['system_metrics'], snap=60)
 def get_network_performance():
     """
     Récupère les métriques réseau avec throughput
+    
+    Query params:
+    - period: hour|day|week|month|year|custom
+    - start_date, end_date: pour période custom
+    - max_points: nombre maximal de points renvoyés (grille régulière)
+    - resolution: pas de la grille (30s, 5m, 1h, 1d ou minute|hour|day)
     """
     try:
         period = request.args.get('period', 'day')
@@ -538,37 +1136,100 @@ def get_network_performance():
         
         date_start, date_end = get_date_range(period, start_date, end_date)
         
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= date_start,
-            SystemMetrics.timestamp <= date_end
-        ).order_by(SystemMetrics.timestamp.asc()).all()
+        resolution, aggregations, trend, points = load_series(
+            'network_throughput', date_start, date_end, period,
+            step=series_step(date_start, date_end)
+        )
         
-        if not metrics:
+        if not aggregations['count']:
             return jsonify({
                 'success': False,
                 'error': 'Aucune donnée réseau disponible'
             }), 404
         
-        data_points = [
-            {
-                'timestamp': m.timestamp.isoformat(),
-                'throughput_mbps': m.network_throughput
-            } for m in metrics
-        ]
+        data_points = format_series(points, 'throughput_mbps')
         
         return jsonify({
             'success': True,
             'data': {
                 'period': {
                     'start': date_start.isoformat(),
-                    'end': date_end.isoformat()
+                    'end': date_end.isoformat(),
+                    'resolution': resolution
                 },
-                'throughput': calculate_aggregations(metrics, 'network_throughput'),
-                'trend': calculate_trend(metrics, 'network_throughput'),
+                'throughput': aggregations,
+                'trend': trend,
                 'data_points': data_points
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/performance/percentiles', methods=['GET'])
+@cached(ttl=120, tables=['system_metrics', 'tasks', 'performance_history', 'quantile_sketches'], snap=60)
+def get_performance_percentiles():
+    """
+    Percentiles d'une métrique sur une période, depuis les sketches
+    
+    Query params:
+    - metric: cpu_usage | memory_usage | task_execution_time | performance_execution_time
+    - period: hour, day, week, month, year, custom (défaut: day)
+    - start_date, end_date: pour période custom
+    - percentiles: liste séparée par des virgules (défaut: 50,95,99)
+    - group: workflow_id (tâches) ou volunteer_id (historique) optionnel
+    """
+    try:
+        metric = request.args.get('metric', 'cpu_usage')
+        period = request.args.get('period', 'day')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        group = request.args.get('group')
+        
+        percentiles = [
+            float(value) for value in request.args.get('percentiles', '50,95,99').split(',')
+        ]
+        if any(not 0 <= value <= 100 for value in percentiles):
+            raise ValueError('Les percentiles doivent être compris entre 0 et 100')
+        
+        date_start, date_end = get_date_range(period, start_date, end_date)
+        resolution, sketch = merged_sketch(metric, date_start, date_end, group)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'period': {
+                    'start': date_start.isoformat(),
+                    'end': date_end.isoformat(),
+                    'resolution': resolution
+                },
+                'metric': metric,
+                'group': group,
+                'count': sketch.count,
+                'average': round(sketch.average, 2) if sketch.count else 0,
+                'min': round(sketch.minimum, 2) if sketch.count else 0,
+                'max': round(sketch.maximum, 2) if sketch.count else 0,
+                'percentiles': {
+                    f'p{value:g}': round(sketch.quantile(value / 100), 2) if sketch.count else None
+                    for value in percentiles
+                },
+                'relative_accuracy': RELATIVE_ACCURACY
+            }
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -576,6 +1237,7 @@ def get_network_performance():
         }), 500
 
 @metrics_bp.route('/performance/summary', methods=['GET'])
+@cached(ttl=60, tables=['system_metrics'], snap=60)
 def get_performance_summary():
     """
     Récupère un résumé complet des performances système
@@ -583,19 +1245,7 @@ def get_performance_summary():
     """
     try:
         # Métriques actuelles
-        current = SystemMetrics.query.order_by(SystemMetrics.timestamp.desc()).first()
-        
-        # Métriques dernières 24h
-        day_ago = datetime.utcnow() - timedelta(days=1)
-        day_metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= day_ago
-        ).all()
-        
-        # Métriques dernière semaine
-        week_ago = datetime.utcnow() - timedelta(weeks=1)
-        week_metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= week_ago
-        ).all()
+        current = latest_metrics_dict()
         
         if not current:
             return jsonify({
@@ -603,28 +1253,36 @@ def get_performance_summary():
                 'error': 'Aucune donnée disponible'
             }), 404
         
+        fields = ['cpu_usage', 'memory_usage', 'network_throughput']
+        
+        # Dernières 24h et dernière semaine agrégées en une seule lecture
+        now = datetime.utcnow()
+        day_ago = now - timedelta(days=1)
+        week_ago = now - timedelta(weeks=1)
+        (_, day_aggregations, _), (_, week_aggregations, week_trends) = summarize_windows(
+            [(day_ago, None), (week_ago, None)], fields,
+            trend_fields=['cpu_usage', 'memory_usage']
+        )
+        
         return jsonify({
             'success': True,
             'data': {
-                'current': current.to_dict(),
+                'current': current,
                 'last_24h': {
-                    'cpu': calculate_aggregations(day_metrics, 'cpu_usage'),
-                    'memory': calculate_aggregations(day_metrics, 'memory_usage'),
-                    'network': calculate_aggregations(day_metrics, 'network_throughput')
+                    'cpu': day_aggregations['cpu_usage'],
+                    'memory': day_aggregations['memory_usage'],
+                    'network': day_aggregations['network_throughput']
                 },
                 'last_week': {
-                    'cpu': calculate_aggregations(week_metrics, 'cpu_usage'),
-                    'memory': calculate_aggregations(week_metrics, 'memory_usage'),
-                    'network': calculate_aggregations(week_metrics, 'network_throughput'),
+                    'cpu': week_aggregations['cpu_usage'],
+                    'memory': week_aggregations['memory_usage'],
+                    'network': week_aggregations['network_throughput'],
                     'trends': {
-                        'cpu': calculate_trend(week_metrics, 'cpu_usage'),
-                        'memory': calculate_trend(week_metrics, 'memory_usage')
+                        'cpu': week_trends['cpu_usage'],
+                        'memory': week_trends['memory_usage']
                     }
                 },
-                'health_score': {
-                    'cpu': 'good' if current.cpu_usage < 70 else 'warning' if current.cpu_usage < 85 else 'critical',
-                    'memory': 'good' if current.memory_usage < 70 else 'warning' if current.memory_usage < 85 else 'critical'
-                }
+                'health_score': health_state(current)
             }
         })
         
@@ -635,10 +1293,15 @@ def get_performance_summary():
         }), 500
 
 @metrics_bp.route('/performance/peaks', methods=['GET'])
+@cached(ttl=60, tables=['system_metrics', 'alert_rules', 'alert_incidents'], snap=60)
 def get_performance_peaks():
     """
     Identifie les pics de performance (CPU, mémoire) sur une période
     
+    Chaque pic est le maximum d'un incident des règles d'alerte (voir
+    /alerts/rules) ; sans règle couvrant le seuil, les échantillons bruts
+    sont lus.
+    
     Query params:
     - period: hour|day|week|month|year|custom
     - threshold: seuil pour identifier un pic (défaut: 80)
@@ -651,14 +1314,13 @@ def get_performance_peaks():
         
         date_start, date_end = get_date_range(period, start_date, end_date)
         
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= date_start,
-            SystemMetrics.timestamp <= date_end
-        ).order_by(SystemMetrics.timestamp.asc()).all()
-        
-        # Identifier les pics
-        cpu_peaks = [m for m in metrics if m.cpu_usage >= threshold]
-        memory_peaks = [m for m in metrics if m.memory_usage >= threshold]
+        # Pics lus dans les incidents des règles d'alerte
+        cpu_count, cpu_highest, cpu_peaks = peak_events(
+            'cpu_usage', date_start, date_end, threshold, 10
+        )
+        memory_count, memory_highest, memory_peaks = peak_events(
+            'memory_usage', date_start, date_end, threshold, 10
+        )
         
         return jsonify({
             'success': True,
@@ -669,24 +1331,14 @@ def get_performance_peaks():
                 },
                 'threshold': threshold,
                 'cpu_peaks': {
-                    'count': len(cpu_peaks),
-                    'highest': max([m.cpu_usage for m in cpu_peaks]) if cpu_peaks else 0,
-                    'events': [
-                        {
-                            'timestamp': m.timestamp.isoformat(),
-                            'value': m.cpu_usage
-                        } for m in sorted(cpu_peaks, key=lambda x: x.cpu_usage, reverse=True)[:10]
-                    ]
+                    'count': cpu_count,
+                    'highest': cpu_highest,
+                    'events': cpu_peaks
                 },
                 'memory_peaks': {
-                    'count': len(memory_peaks),
-                    'highest': max([m.memory_usage for m in memory_peaks]) if memory_peaks else 0,
-                    'events': [
-                        {
-                            'timestamp': m.timestamp.isoformat(),
-                            'value': m.memory_usage
-                        } for m in sorted(memory_peaks, key=lambda x: x.memory_usage, reverse=True)[:10]
-                    ]
+                    'count': memory_count,
+                    'highest': memory_highest,
+                    'events': memory_peaks
                 }
             }
         })
@@ -698,6 +1350,7 @@ def get_performance_peaks():
         }), 500
 
 @metrics_bp.route('/performance/comparison', methods=['GET'])
+@cached(ttl=600, tables=['system_metrics'])
 def compare_performance_periods():
     """
     Compare les performances entre deux périodes
@@ -715,26 +1368,22 @@ def compare_performance_periods():
         p2_start = datetime.fromisoformat(request.args.get('period2_start'))
         p2_end = datetime.fromisoformat(request.args.get('period2_end'))
         
-        # Récupérer les métriques
-        period1_metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= p1_start,
-            SystemMetrics.timestamp <= p1_end
-        ).all()
-        
-        period2_metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= p2_start,
-            SystemMetrics.timestamp <= p2_end
-        ).all()
+        # Agréger les métriques de chaque période
+        fields = ['cpu_usage', 'memory_usage', 'network_throughput',
+                  'active_volunteers', 'completed_tasks']
+        (period1_count, period1_aggregations, _), (period2_count, period2_aggregations, _) = summarize_windows(
+            [(p1_start, p1_end), (p2_start, p2_end)], fields, period='custom'
+        )
         
-        if not period1_metrics or not period2_metrics:
+        if not period1_count or not period2_count:
             return jsonify({
                 'success': False,
                 'error': 'Données insuffisantes pour la comparaison'
             }), 404
         
-        def compare_metric(metrics1, metrics2, field):
-            agg1 = calculate_aggregations(metrics1, field)
-            agg2 = calculate_aggregations(metrics2, field)
+        def compare_metric(aggregations1, aggregations2, field):
+            agg1 = aggregations1[field]
+            agg2 = aggregations2[field]
             
             diff = agg2['average'] - agg1['average']
             pct_change = (diff / agg1['average'] * 100) if agg1['average'] != 0 else 0
@@ -754,20 +1403,20 @@ def compare_performance_periods():
                     'period1': {
                         'start': p1_start.isoformat(),
                         'end': p1_end.isoformat(),
-                        'data_points': len(period1_metrics)
+                        'data_points': period1_count
                     },
                     'period2': {
                         'start': p2_start.isoformat(),
                         'end': p2_end.isoformat(),
-                        'data_points': len(period2_metrics)
+                        'data_points': period2_count
                     }
                 },
                 'comparison': {
-                    'cpu': compare_metric(period1_metrics, period2_metrics, 'cpu_usage'),
-                    'memory': compare_metric(period1_metrics, period2_metrics, 'memory_usage'),
-                    'network': compare_metric(period1_metrics, period2_metrics, 'network_throughput'),
-                    'active_volunteers': compare_metric(period1_metrics, period2_metrics, 'active_volunteers'),
-                    'completed_tasks': compare_metric(period1_metrics, period2_metrics, 'completed_tasks')
+                    'cpu': compare_metric(period1_aggregations, period2_aggregations, 'cpu_usage'),
+                    'memory': compare_metric(period1_aggregations, period2_aggregations, 'memory_usage'),
+                    'network': compare_metric(period1_aggregations, period2_aggregations, 'network_throughput'),
+                    'active_volunteers': compare_metric(period1_aggregations, period2_aggregations, 'active_volunteers'),
+                    'completed_tasks': compare_metric(period1_aggregations, period2_aggregations, 'completed_tasks')
                 }
             }
         })
@@ -784,10 +1433,15 @@ def compare_performance_periods():
         }), 500
 
 @metrics_bp.route('/performance/alerts', methods=['GET'])
+@cached(ttl=30, tables=['system_metrics', 'volunteers', 'tasks', 'alert_rules', 'alert_incidents'], snap=30)
 def get_performance_alerts():
     """
     Génère des alertes basées sur les seuils de performance
     
+    Les alertes sont les incidents enregistrés par les règles d'alerte
+    (dépassements consécutifs fusionnés), dont le pic dépasse le seuil
+    demandé ; sans règle couvrant ce seuil, les échantillons bruts sont lus.
+    
     Query params:
     - cpu_threshold: seuil CPU (défaut: 85)
     - memory_threshold: seuil mémoire (défaut: 85)
@@ -800,33 +1454,17 @@ def get_performance_alerts():
         
         start_time = datetime.utcnow() - timedelta(hours=hours)
         
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= start_time
-        ).order_by(SystemMetrics.timestamp.desc()).all()
+        samples_count, _, _ = summarize_metrics(start_time, None, ['cpu_usage'])
         
-        if not metrics:
+        if not samples_count:
             return jsonify({
                 'success': False,
                 'error': 'Aucune donnée pour générer des alertes'
             }), 404
         
-        # Identifier les alertes CPU
-        cpu_alerts = [
-            {
-                'timestamp': m.timestamp.isoformat(),
-                'value': m.cpu_usage,
-                'severity': 'critical' if m.cpu_usage > 95 else 'warning'
-            } for m in metrics if m.cpu_usage >= cpu_threshold
-        ]
-        
-        # Identifier les alertes mémoire
-        memory_alerts = [
-            {
-                'timestamp': m.timestamp.isoformat(),
-                'value': m.memory_usage,
-                'severity': 'critical' if m.memory_usage > 95 else 'warning'
-            } for m in metrics if m.memory_usage >= memory_threshold
-        ]
+        # Alertes CPU et mémoire (incidents des règles, plus récents d'abord)
+        cpu_count, cpu_alerts = alert_events('cpu_usage', start_time, cpu_threshold, 20)
+        memory_count, memory_alerts = alert_events('memory_usage', start_time, memory_threshold, 20)
         
         # Volontaires inactifs (plus de 24h)
         inactive_volunteers = Volunteer.query.filter(
@@ -853,12 +1491,12 @@ def get_performance_alerts():
                 },
                 'alerts': {
                     'cpu': {
-                        'count': len(cpu_alerts),
-                        'events': cpu_alerts[:20]
+                        'count': cpu_count,
+                        'events': cpu_alerts
                     },
                     'memory': {
-                        'count': len(memory_alerts),
-                        'events': memory_alerts[:20]
+                        'count': memory_count,
+                        'events': memory_alerts
                     },
                     'inactive_volunteers': {
                         'count': len(inactive_volunteers),
@@ -868,7 +1506,7 @@ def get_performance_alerts():
                         'count': failed_tasks
                     }
                 },
-                'overall_health': 'critical' if (len(cpu_alerts) > 10 or len(memory_alerts) > 10) else 'warning' if (len(cpu_alerts) > 0 or len(memory_alerts) > 0) else 'good'
+                'overall_health': 'critical' if (cpu_count > 10 or memory_count > 10) else 'warning' if (cpu_count > 0 or memory_count > 0) else 'good'
             }
         })
         
@@ -878,12 +1516,154 @@ def get_performance_alerts():
             'error': str(e)
         }), 500
 
+def build_performance_report(period, date_start, date_end):
+    """
+    Rapport complet de performance sur une plage avec recommandations
+    automatiques (None sans métriques dans la plage)
+    """
+    # Récupérer toutes les données nécessaires
+    metrics_count, metrics_aggregations, metrics_trends = summarize_metrics(
+        date_start, date_end,
+        ['cpu_usage', 'memory_usage', 'network_throughput'],
+        trend_fields=['cpu_usage', 'memory_usage'],
+        period=period
+    )
+    
+    tasks_table = Task.__table__
+    task_groups = grouped_aggregates(
+        tasks_table, tasks_table.c.status, ['execution_time'],
+        tasks_table.c.created_date >= date_start,
+        tasks_table.c.created_date <= date_end
+    )
+    task_status = histogram(task_groups, TASK_STATUSES)
+    total_tasks = sum(group['count'] for group in task_groups.values())
+    completed_group = task_groups.get('completed')
+    
+    volunteers_table = Volunteer.__table__
+    volunteer_groups = grouped_aggregates(volunteers_table, volunteers_table.c.status, [])
+    total_volunteers = sum(group['count'] for group in volunteer_groups.values())
+    active_volunteers = histogram(volunteer_groups, ['active'])['active']
+    top_performers = top_k(
+        [
+            volunteers_table.c.volunteer_id,
+            volunteers_table.c.name,
+            volunteers_table.c.tasks_completed,
+            volunteers_table.c.performance_score
+        ],
+        [volunteers_table.c.performance_score.desc(), volunteers_table.c.id.asc()],
+        5
+    )
+    
+    if not metrics_count:
+        return None
+    
+    # Compiler le rapport
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'period': {
+            'type': period,
+            'start': date_start.isoformat(),
+            'end': date_end.isoformat(),
+            'duration_hours': (date_end - date_start).total_seconds() / 3600
+        },
+        'executive_summary': {
+            'total_volunteers': total_volunteers,
+            'active_volunteers': active_volunteers,
+            'total_tasks': total_tasks,
+            'completed_tasks': task_status['completed'],
+            'failed_tasks': task_status['failed'],
+            'avg_cpu_usage': metrics_aggregations['cpu_usage']['average'],
+            'avg_memory_usage': metrics_aggregations['memory_usage']['average']
+        },
+        'system_performance': {
+            'cpu': metrics_aggregations['cpu_usage'],
+            'memory': metrics_aggregations['memory_usage'],
+            'network': metrics_aggregations['network_throughput'],
+            'trends': {
+                'cpu': metrics_trends['cpu_usage'],
+                'memory': metrics_trends['memory_usage']
+            }
+        },
+        'task_performance': {
+            'total': total_tasks,
+            'by_status': task_status,
+            'execution_time': format_aggregation(
+                completed_group['execution_time'] if completed_group else None
+            )
+        },
+        'volunteer_performance': {
+            'total': total_volunteers,
+            'active': active_volunteers,
+            'top_performers': [
+                {
+                    'volunteer_id': v.volunteer_id,
+                    'name': v.name,
+                    'tasks_completed': v.tasks_completed,
+                    'performance_score': v.performance_score
+                } for v in top_performers
+            ]
+        },
+        'recommendations': []
+    }
+    
+    # Ajouter des recommandations basées sur les données
+    avg_cpu = report['executive_summary']['avg_cpu_usage']
+    avg_memory = report['executive_summary']['avg_memory_usage']
+    failure_rate = (report['executive_summary']['failed_tasks'] / total_tasks * 100) if total_tasks else 0
+    
+    if avg_cpu > 80:
+        report['recommendations'].append({
+            'type': 'warning',
+            'category': 'cpu',
+            'message': f'Utilisation CPU élevée ({avg_cpu}%). Envisager d\'ajouter plus de ressources.'
+        })
+    
+    if avg_memory > 80:
+        report['recommendations'].append({
+            'type': 'warning',
+            'category': 'memory',
+            'message': f'Utilisation mémoire élevée ({avg_memory}%). Optimisation recommandée.'
+        })
+    
+    if failure_rate > 10:
+        report['recommendations'].append({
+            'type': 'critical',
+            'category': 'tasks',
+            'message': f'Taux d\'échec élevé ({failure_rate:.2f}%). Vérifier la stabilité du système.'
+        })
+    
+    if active_volunteers < total_volunteers * 0.5:
+        report['recommendations'].append({
+            'type': 'info',
+            'category': 'volunteers',
+            'message': 'Moins de 50% des volontaires sont actifs. Envisager une campagne de réactivation.'
+        })
+    
+    return report
+
+def performance_report_job(params):
+    """Constructeur des travaux de rapport de performance (services.reports)"""
+    report = build_performance_report(
+        params['period'],
+        datetime.fromisoformat(params['start']),
+        datetime.fromisoformat(params['end'])
+    )
+    if report is None:
+        raise ReportUnavailable(NO_REPORT_DATA)
+    return report
+
+report_worker.register('performance', performance_report_job, PERFORMANCE_REPORT_TABLES)
+
 @metrics_bp.route('/performance/report', methods=['GET'])
+@cached(ttl=300, tables=PERFORMANCE_REPORT_TABLES, snap=60)
 def generate_performance_report():
     """
     Génère un rapport complet de performance pour une période donnée
     avec recommandations automatiques
     
+    Pour les mois et les années, préférer POST /performance/reports, qui
+    calcule le rapport en arrière-plan.
+    
     Query params:
     - period: hour|day|week|month|year|custom
     - start_date, end_date: pour période custom
@@ -894,116 +1674,119 @@ def generate_performance_report():
         end_date = request.args.get('end_date')
         
         date_start, date_end = get_date_range(period, start_date, end_date)
+        report = build_performance_report(period, date_start, date_end)
         
-        # Récupérer toutes les données nécessaires
-        metrics = SystemMetrics.query.filter(
-            SystemMetrics.timestamp >= date_start,
-            SystemMetrics.timestamp <= date_end
-        ).all()
-        
-        tasks = Task.query.filter(
-            Task.created_date >= date_start,
-            Task.created_date <= date_end
-        ).all()
-        
-        volunteers = Volunteer.query.all()
-        active_volunteers = [v for v in volunteers if v.status == 'active']
-        
-        if not metrics:
+        if report is None:
             return jsonify({
                 'success': False,
-                'error': 'Aucune donnée pour générer le rapport'
+                'error': NO_REPORT_DATA
             }), 404
         
-        # Compiler le rapport
-        report = {
-            'generated_at': datetime.utcnow().isoformat(),
-            'period': {
-                'type': period,
-                'start': date_start.isoformat(),
-                'end': date_end.isoformat(),
-                'duration_hours': (date_end - date_start).total_seconds() / 3600
-            },
-            'executive_summary': {
-                'total_volunteers': len(volunteers),
-                'active_volunteers': len(active_volunteers),
-                'total_tasks': len(tasks),
-                'completed_tasks': len([t for t in tasks if t.status == 'completed']),
-                'failed_tasks': len([t for t in tasks if t.status == 'failed']),
-                'avg_cpu_usage': round(sum([m.cpu_usage for m in metrics]) / len(metrics), 2),
-                'avg_memory_usage': round(sum([m.memory_usage for m in metrics]) / len(metrics), 2)
-            },
-            'system_performance': {
-                'cpu': calculate_aggregations(metrics, 'cpu_usage'),
-                'memory': calculate_aggregations(metrics, 'memory_usage'),
-                'network': calculate_aggregations(metrics, 'network_throughput'),
-                'trends': {
-                    'cpu': calculate_trend(metrics, 'cpu_usage'),
-                    'memory': calculate_trend(metrics, 'memory_usage')
-                }
-            },
-            'task_performance': {
-                'total': len(tasks),
-                'by_status': {
-                    'pending': len([t for t in tasks if t.status == 'pending']),
-                    'running': len([t for t in tasks if t.status == 'running']),
-                    'completed': len([t for t in tasks if t.status == 'completed']),
-                    'failed': len([t for t in tasks if t.status == 'failed'])
-                },
-                'execution_time': calculate_aggregations([t for t in tasks if t.status == 'completed'], 'execution_time')
-            },
-            'volunteer_performance': {
-                'total': len(volunteers),
-                'active': len(active_volunteers),
-                'top_performers': [
-                    {
-                        'volunteer_id': v.volunteer_id,
-                        'name': v.name,
-                        'tasks_completed': v.tasks_completed,
-                        'performance_score': v.performance_score
-                    } for v in sorted(volunteers, key=lambda x: x.performance_score, reverse=True)[:5]
-                ]
-            },
-            'recommendations': []
-        }
+        return jsonify({
+            'success': True,
+            'data': report
+        })
         
-        # Ajouter des recommandations basées sur les données
-        avg_cpu = report['executive_summary']['avg_cpu_usage']
-        avg_memory = report['executive_summary']['avg_memory_usage']
-        failure_rate = (report['executive_summary']['failed_tasks'] / len(tasks) * 100) if tasks else 0
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/performance/reports', methods=['POST'])
+def create_performance_report_job():
+    """
+    Demande le calcul en arrière-plan d'un rapport de performance
+    
+    Paramètres (corps JSON ou query params) : period, start_date, end_date
+    comme GET /performance/report. Les périodes relatives sont résolues à
+    la demande, arrondies à REPORT_SNAP_SECONDS. Un rapport identique en
+    cours ou déjà calculé est réutilisé (200) ; sinon le travail est créé
+    (202). Le résultat se lit sur GET /performance/reports/<id>.
+    """
+    try:
+        data = request.get_json(silent=True) or request.args
+        if not isinstance(data, dict):
+            raise ValueError('Objet JSON attendu')
+        period = data.get('period', 'week')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        
+        if period == 'custom' and not (start_date and end_date):
+            raise ValueError('start_date et end_date sont requis pour la période custom')
+        date_start, date_end = get_date_range(period, start_date, end_date)
+        if period != 'custom':
+            # Toutes les demandes d'un même bucket partagent la même plage
+            shift = (date_end - datetime(1970, 1, 1)) % timedelta(seconds=REPORT_SNAP_SECONDS)
+            date_start, date_end = date_start - shift, date_end - shift
+        if date_end < date_start:
+            raise ValueError('end_date doit être postérieure à start_date')
+        
+        job, reused = report_worker.submit('performance', {
+            'period': period,
+            'start': date_start.isoformat(),
+            'end': date_end.isoformat()
+        })
         
-        if avg_cpu > 80:
-            report['recommendations'].append({
-                'type': 'warning',
-                'category': 'cpu',
-                'message': f'Utilisation CPU élevée ({avg_cpu}%). Envisager d\'ajouter plus de ressources.'
-            })
+        response = jsonify({
+            'success': True,
+            'data': job
+        })
+        response.status_code = 200 if job['status'] == 'done' else 202
+        response.headers['Location'] = f"{request.path}/{job['id']}"
+        return response
         
-        if avg_memory > 80:
-            report['recommendations'].append({
-                'type': 'warning',
-                'category': 'memory',
-                'message': f'Utilisation mémoire élevée ({avg_memory}%). Optimisation recommandée.'
-            })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except WriterBusy:
+        # File d'écriture pleine ou écriture en retard : réponse 503 du
+        # gestionnaire de l'application
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/performance/reports/<int:job_id>', methods=['GET'])
+def get_performance_report_job(job_id):
+    """
+    État d'un travail de rapport ; une fois terminé, le rapport est inclus
+    et l'ETag est l'empreinte de son contenu
+    
+    Réponses : 202 (avec Retry-After) tant que le calcul est en attente ou
+    en cours, 200 sinon, 304 si If-None-Match correspond.
+    """
+    try:
+        report_job = report_worker.get(job_id)
+        if report_job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Rapport non trouvé'
+            }), 404
         
-        if failure_rate > 10:
-            report['recommendations'].append({
-                'type': 'critical',
-                'category': 'tasks',
-                'message': f'Taux d\'échec élevé ({failure_rate:.2f}%). Vérifier la stabilité du système.'
-            })
+        if report_job.content_hash and request.if_none_match.contains(report_job.content_hash):
+            response = Response(status=304)
+            response.set_etag(report_job.content_hash)
+            return response
         
-        if len(active_volunteers) < len(volunteers) * 0.5:
-            report['recommendations'].append({
-                'type': 'info',
-                'category': 'volunteers',
-                'message': 'Moins de 50% des volontaires sont actifs. Envisager une campagne de réactivation.'
-            })
+        data = report_job.to_dict()
+        if report_job.status == 'done':
+            data['report'] = json.loads(report_job.result)
         
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'data': report
+            'data': data
         })
+        if report_job.status in ('pending', 'running'):
+            response.status_code = 202
+            response.headers['Retry-After'] = '1'
+        elif report_job.content_hash:
+            response.set_etag(report_job.content_hash)
+        return response
         
     except Exception as e:
         return jsonify({
@@ -1012,6 +1795,7 @@ def generate_performance_report():
         }), 500
 
 @metrics_bp.route('/performance/volunteers/<volunteer_id>', methods=['GET'])
+@cached(ttl=120, tables=['volunteers', 'performance_history'], snap=60)
 def get_volunteer_performance_details(volunteer_id):
     """
     Récupère les performances détaillées d'un volontaire spécifique
@@ -1035,23 +1819,39 @@ def get_volunteer_performance_details(volunteer_id):
                 'error': 'Volontaire non trouvé'
             }), 404
         
-        # Récupérer l'historique de performances
-        perf_history = PerformanceHistory.query.filter(
-            PerformanceHistory.volunteer_id == volunteer_id,
-            PerformanceHistory.timestamp >= date_start,
-            PerformanceHistory.timestamp <= date_end
-        ).order_by(PerformanceHistory.timestamp.asc()).all()
+        # Agrégations de l'historique, par résultat (succès / échec), en une requête
+        history = partitioned_source(PerformanceHistory.__tablename__, date_start, date_end)
+        criteria = [
+            history.c.volunteer_id == volunteer_id,
+            history.c.timestamp >= date_start,
+            history.c.timestamp <= date_end
+        ]
+        fields = ['execution_time', 'cpu_usage', 'memory_usage']
+        groups = grouped_aggregates(history, history.c.success, fields, *criteria)
         
-        if not perf_history:
+        total_tasks = sum(group['count'] for group in groups.values())
+        if not total_tasks:
             return jsonify({
                 'success': False,
                 'error': 'Aucune donnée de performance pour cette période'
             }), 404
         
         # Calculer les agrégations
-        total_tasks = len(perf_history)
-        successful_tasks = len([p for p in perf_history if p.success])
+        successful_tasks = groups[True]['count'] if True in groups else 0
         failed_tasks = total_tasks - successful_tasks
+        stats = {
+            field: merge_stats(*[group[field] for group in groups.values()])
+            for field in fields
+        }
+        regressions = regression_sums(
+            history, history.c.timestamp, date_start, ['execution_time', 'cpu_usage'], *criteria
+        )
+        recent_tasks = top_k(
+            [history.c.task_id, history.c.timestamp, history.c.execution_time, history.c.success],
+            [history.c.timestamp.desc(), history.c.id.desc()],
+            10,
+            *criteria
+        )
         
         return jsonify({
             'success': True,
@@ -1068,13 +1868,11 @@ def get_volunteer_performance_details(volunteer_id):
                     'success_rate': round((successful_tasks / total_tasks * 100), 2) if total_tasks > 0 else 0
                 },
                 'performance': {
-                    'execution_time': calculate_aggregations(perf_history, 'execution_time'),
-                    'cpu_usage': calculate_aggregations(perf_history, 'cpu_usage'),
-                    'memory_usage': calculate_aggregations(perf_history, 'memory_usage')
+                    field: format_aggregation(stats[field]) for field in fields
                 },
                 'trends': {
-                    'execution_time': calculate_trend(perf_history, 'execution_time'),
-                    'cpu_usage': calculate_trend(perf_history, 'cpu_usage')
+                    'execution_time': least_squares_trend(regressions['execution_time']),
+                    'cpu_usage': least_squares_trend(regressions['cpu_usage'])
                 },
                 'recent_tasks': [
                     {
@@ -1082,7 +1880,7 @@ def get_volunteer_performance_details(volunteer_id):
                         'timestamp': p.timestamp.isoformat(),
                         'execution_time': p.execution_time,
                         'success': p.success
-                    } for p in perf_history[-10:]
+                    } for p in reversed(recent_tasks)
                 ]
             }
         })
@@ -1094,6 +1892,7 @@ def get_volunteer_performance_details(volunteer_id):
         }), 500
 
 @metrics_bp.route('/performance/volunteers/ranking', methods=['GET'])
+@cached(ttl=120, tables=['volunteers'])
 def get_volunteers_performance_ranking():
     """
     Classe les volontaires par performance
@@ -1148,7 +1947,119 @@ def get_volunteers_performance_ranking():
             'error': str(e)
         }), 500
 
+def ranked_entries(entries):
+    """Entrées (rang, id, valeur) de l'index des rangs avec le détail des volontaires"""
+    volunteers = {
+        volunteer.id: volunteer
+        for volunteer in Volunteer.query.filter(Volunteer.id.in_([row_id for _, row_id, _ in entries]))
+    }
+    return [
+        {
+            'rank': rank,
+            'volunteer': volunteers[row_id].to_dict(),
+            'metric_value': value
+        } for rank, row_id, value in entries if row_id in volunteers
+    ]
+
+def rank_metric_argument():
+    """Critère de classement demandé (ValueError s'il est inconnu)"""
+    metric = request.args.get('metric', 'performance_score')
+    if metric not in RANK_METRICS:
+        raise ValueError(f'Metric invalide. Valeurs acceptées: {", ".join(RANK_METRICS)}')
+    return metric
+
+@metrics_bp.route('/performance/volunteers/<volunteer_id>/rank', methods=['GET'])
+def get_volunteer_rank(volunteer_id):
+    """
+    Rang exact d'un volontaire et ses voisins de classement
+    
+    Query params:
+    - metric: tasks_completed|performance_score|total_computation_time|composite_score
+      (défaut: performance_score)
+    - window: nombre de voisins de chaque côté (défaut: 5, max: 100)
+    """
+    try:
+        metric = rank_metric_argument()
+        window = min(max(int(request.args.get('window', 5)), 0), MAX_RANK_WINDOW)
+        
+        found = volunteer_ranks.rank_of(metric, volunteer_id)
+        if found is None:
+            return jsonify({
+                'success': False,
+                'error': 'Volontaire non trouvé'
+            }), 404
+        
+        _, rank, total, value = found
+        entries, total = volunteer_ranks.window(metric, rank - window, rank + window)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'volunteer_id': volunteer_id,
+                'ranking_by': metric,
+                'rank': rank,
+                'total_volunteers': total,
+                'metric_value': value,
+                'percentile': round((total - rank) / total * 100, 2) if total > 1 else 100.0,
+                'neighbors': ranked_entries(entries)
+            }
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@metrics_bp.route('/performance/volunteers/ranking/range', methods=['GET'])
+def get_volunteers_ranking_range():
+    """
+    Volontaires classés entre deux rangs (par exemple 480 à 520)
+    
+    Query params:
+    - metric: tasks_completed|performance_score|total_computation_time|composite_score
+      (défaut: performance_score)
+    - start, end: rangs inclus (défaut: 1 à 20, au plus 201 rangs)
+    """
+    try:
+        metric = rank_metric_argument()
+        start = int(request.args.get('start', 1))
+        end = int(request.args.get('end', start + 19))
+        if start < 1 or end < start:
+            raise ValueError('start doit être >= 1 et end >= start')
+        end = min(end, start + 2 * MAX_RANK_WINDOW)
+        
+        entries, total = volunteer_ranks.window(metric, start, end)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'ranking_by': metric,
+                'start': start,
+                'end': end,
+                'total_volunteers': total,
+                'results': ranked_entries(entries)
+            }
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @metrics_bp.route('/performance/tasks/statistics', methods=['GET'])
+@cached(ttl=120, tables=['tasks'], snap=60)
 def get_tasks_performance_statistics():
     """
     Récupère les statistiques de performance des tâches
@@ -1160,28 +2071,27 @@ def get_tasks_performance_statistics():
         
         date_start, date_end = get_date_range(period, start_date, end_date)
         
-        # Récupérer les tâches de la période
-        tasks = Task.query.filter(
-            Task.created_date >= date_start,
-            Task.created_date <= date_end
-        ).all()
-        
-        if not tasks:
+        # Effectif et statistiques de chaque statut en une requête
+        tasks_table = Task.__table__
+        task_groups = grouped_aggregates(
+            tasks_table, tasks_table.c.status,
+            ['execution_time', 'cpu_usage', 'memory_usage'],
+            tasks_table.c.created_date >= date_start,
+            tasks_table.c.created_date <= date_end
+        )
+        total_tasks = sum(group['count'] for group in task_groups.values())
+        
+        if not total_tasks:
             return jsonify({
                 'success': False,
                 'error': 'Aucune tâche pour cette période'
             }), 404
         
         # Statistiques par statut
-        status_counts = {
-            'pending': len([t for t in tasks if t.status == 'pending']),
-            'running': len([t for t in tasks if t.status == 'running']),
-            'completed': len([t for t in tasks if t.status == 'completed']),
-            'failed': len([t for t in tasks if t.status == 'failed'])
-        }
+        status_counts = histogram(task_groups, TASK_STATUSES)
         
         # Tâches complétées uniquement
-        completed_tasks = [t for t in tasks if t.status == 'completed']
+        completed_group = task_groups.get('completed')
         
         return jsonify({
             'success': True,
@@ -1190,14 +2100,13 @@ def get_tasks_performance_statistics():
                     'start': date_start.isoformat(),
                     'end': date_end.isoformat()
                 },
-                'total_tasks': len(tasks),
+                'total_tasks': total_tasks,
                 'status_distribution': status_counts,
-                'completion_rate': round((status_counts['completed'] / len(tasks) * 100), 2) if tasks else 0,
-                'failure_rate': round((status_counts['failed'] / len(tasks) * 100), 2) if tasks else 0,
+                'completion_rate': round((status_counts['completed'] / total_tasks * 100), 2),
+                'failure_rate': round((status_counts['failed'] / total_tasks * 100), 2),
                 'performance': {
-                    'execution_time': calculate_aggregations(completed_tasks, 'execution_time') if completed_tasks else {},
-                    'cpu_usage': calculate_aggregations(completed_tasks, 'cpu_usage') if completed_tasks else {},
-                    'memory_usage': calculate_aggregations(completed_tasks, 'memory_usage') if completed_tasks else {}
+                    field: format_aggregation(completed_group[field]) if completed_group else {}
+                    for field in ('execution_time', 'cpu_usage', 'memory_usage')
                 }
             }
         })
@@ -1209,6 +2118,7 @@ def get_tasks_performance_statistics():
         }), 500
 
 @metrics_bp.route('/performance/tasks/slowest', methods=['GET'])
+@cached(ttl=120, tables=['tasks'])
 def get_slowest_tasks():
     """
     Identifie les tâches les plus lentes
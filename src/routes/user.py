@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify, request
-from src.models.user import User, db
+from flask import Blueprint, jsonify, request, abort
+from src.models.user import User
+from src.services.writer import writer
 
 user_bp = Blueprint('user', __name__)
 
@@ -12,10 +13,14 @@ def get_users():
 def create_user():
     
     data = request.json
-    user = User(username=data['username'], email=data['email'])
-    db.session.add(user)
-    db.session.commit()
-    return jsonify(user.to_dict()), 201
+    
+    def job(session):
+        user = User(username=data['username'], email=data['email'])
+        session.add(user)
+        session.flush()
+        return user.to_dict()
+    
+    return jsonify(writer.run(job)), 201
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
@@ -24,16 +29,31 @@ def get_user(user_id):
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
-    user = User.query.get_or_404(user_id)
     data = request.json
-    user.username = data.get('username', user.username)
-    user.email = data.get('email', user.email)
-    db.session.commit()
-    return jsonify(user.to_dict())
+    
+    def job(session):
+        user = session.get(User, user_id)
+        if user is None:
+            return None
+        user.username = data.get('username', user.username)
+        user.email = data.get('email', user.email)
+        session.flush()
+        return user.to_dict()
+    
+    user = writer.run(job)
+    if user is None:
+        abort(404)
+    return jsonify(user)
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
-    db.session.delete(user)
-    db.session.commit()
+    def job(session):
+        user = session.get(User, user_id)
+        if user is None:
+            return False
+        session.delete(user)
+        return True
+    
+    if not writer.run(job):
+        abort(404)
     return '', 204
@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from src.main import app, db
 from src.models.badge import Badge
+from src.services.writer import add_objects, writer
 
 def seed_badges():
     """Créer les badges par défaut"""
@@ -20,8 +21,7 @@ def seed_badges():
             print(f"ℹ️  {existing_count} badges existent déjà")
             response = input("Voulez-vous les supprimer et recréer ? (y/N): ")
             if response.lower() == 'y':
-                Badge.query.delete()
-                db.session.commit()
+                writer.run(lambda session: session.query(Badge).delete())
                 print("✅ Badges existants supprimés")
             else:
                 print("❌ Opération annulée")
@@ -188,10 +188,11 @@ def seed_badges():
         
         # Créer les badges
         created_count = 0
+        badges = []
         for badge_data in default_badges:
             try:
                 badge = Badge(**badge_data)
-                db.session.add(badge)
+                badges.append(badge)
                 created_count += 1
                 print(f"✅ Badge créé: {badge.name} {badge.icon}")
             except Exception as e:
@@ -199,11 +200,10 @@ def seed_badges():
         
         # Sauvegarder
         try:
-            db.session.commit()
+            writer.run(add_objects(badges))
             print("-" * 60)
             print(f"🎉 {created_count} badges créés avec succès!")
         except Exception as e:
-            db.session.rollback()
             print(f"❌ Erreur lors de la sauvegarde: {e}")
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Statistiques partielles count/sum/min/max
+
+Les partielles calculées par analytics.window_aggregates, les rollups, le
+tampon mémoire et l'archive (count étant le nombre de valeurs non NULL)
+sont fusionnées puis mises en forme comme calculate_aggregations.
+"""
+
+
+def empty_aggregation():
+    """Agrégation renvoyée lorsqu'aucune donnée n'est disponible"""
+    return {
+        'average': 0,
+        'min': 0,
+        'max': 0,
+        'total': 0,
+        'count': 0
+    }
+
+
+def merge_stats(*partials):
+    """Fusionne plusieurs statistiques partielles (count/sum/min/max)"""
+    merged = {'count': 0, 'sum': None, 'min': None, 'max': None}
+    for stats in partials:
+        # count est le nombre de valeurs non NULL ; sum vaut None sans elles
+        if not stats or not stats['count'] or stats['sum'] is None:
+            continue
+        merged['count'] += stats['count']
+        merged['sum'] = stats['sum'] if merged['sum'] is None else merged['sum'] + stats['sum']
+        merged['min'] = stats['min'] if merged['min'] is None else min(merged['min'], stats['min'])
+        merged['max'] = stats['max'] if merged['max'] is None else max(merged['max'], stats['max'])
+    return merged
+
+
+def format_aggregation(stats):
+    """Met en forme des statistiques brutes comme calculate_aggregations"""
+    if not stats or not stats['count'] or stats['sum'] is None:
+        return empty_aggregation()
+
+    return {
+        'average': round(stats['sum'] / stats['count'], 2),
+        'min': round(stats['min'], 2),
+        'max': round(stats['max'], 2),
+        'total': round(stats['sum'], 2),
+        'count': stats['count']
+    }
+
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de règles d'alerte évalué à l'insertion des métriques
+
+Chaque règle (champ, seuil, durée, hystérésis) suit une petite machine à
+états mise à jour à chaque échantillon inséré, dans la transaction
+d'insertion (signal rows_inserted de system_metrics) :
+
+- repos : un échantillon au-delà du seuil ouvre un dépassement en attente
+- attente : le dépassement devient un incident lorsqu'il a duré au moins
+  duration_seconds ; un échantillon revenu en deçà du seuil l'annule
+- incident ouvert : les échantillons suivants mettent à jour le pic ;
+  l'incident est clos par le premier échantillon revenu au-delà de
+  seuil - hystérésis (seuil + hystérésis pour les règles « below »)
+
+Les dépassements consécutifs sont ainsi fusionnés en un incident (début,
+fin, pic) : les routes d'alertes lisent les incidents, dont le nombre ne
+dépend pas du nombre d'échantillons.
+
+Les échantillons antérieurs au dernier échantillon évalué par une règle
+(insertions rétroactives) sont ignorés ; replay_rule() réévalue une règle
+sur toutes les données brutes conservées.
+"""
+from datetime import datetime
+from sqlalchemy import delete, func, insert, or_, select, update
+from src.models.metrics import db, SystemMetrics, ROLLUP_FIELDS
+from src.models.alert import AlertRule, AlertIncident
+from src.services.archive import metrics_archive
+from src.services.events import rows_inserted
+from src.services.partitions import partition_tables
+
+COMPARISONS = ('above', 'below')
+
+SEVERITIES = ('warning', 'critical')
+
+# Règles créées à l'initialisation, équivalentes aux anciens seuils codés en dur
+# (pics au-delà de 80 %, alertes au-delà de 85 %, critiques au-delà de 95 %)
+DEFAULT_RULES = [
+    {
+        'name': 'CPU élevé',
+        'metric': 'cpu_usage',
+        'comparison': 'above',
+        'threshold': 80.0,
+        'critical_threshold': 95.0,
+        'duration_seconds': 0,
+        'hysteresis': 5.0,
+        'severity': 'warning'
+    },
+    {
+        'name': 'Mémoire élevée',
+        'metric': 'memory_usage',
+        'comparison': 'above',
+        'threshold': 80.0,
+        'critical_threshold': 95.0,
+        'duration_seconds': 0,
+        'hysteresis': 5.0,
+        'severity': 'warning'
+    }
+]
+
+_EDITABLE_FIELDS = (
+    'name', 'metric', 'comparison', 'threshold', 'critical_threshold',
+    'duration_seconds', 'hysteresis', 'severity', 'enabled'
+)
+
+
+def validate_rule(data, partial=False):
+    """
+    Valide les champs d'une règle ; retourne les valeurs normalisées
+
+    Lève ValueError pour un champ inconnu ou invalide. Avec partial=True,
+    seuls les champs fournis sont validés (mise à jour).
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Objet JSON attendu')
+
+    unknown = set(data) - set(_EDITABLE_FIELDS)
+    if unknown:
+        raise ValueError(f'Champs inconnus: {", ".join(sorted(unknown))}')
+
+    if not partial:
+        for field in ('metric', 'threshold'):
+            if data.get(field) is None:
+                raise ValueError(f'Champ requis: {field}')
+
+    values = {}
+    for field, value in data.items():
+        if field == 'metric':
+            if value not in ROLLUP_FIELDS:
+                raise ValueError(f'Métrique inconnue: {value}')
+        elif field == 'comparison':
+            if value not in COMPARISONS:
+                raise ValueError(f'comparison doit valoir {" ou ".join(COMPARISONS)}')
+        elif field == 'severity':
+            if value not in SEVERITIES:
+                raise ValueError(f'severity doit valoir {" ou ".join(SEVERITIES)}')
+        elif field in ('threshold', 'hysteresis') or (field == 'critical_threshold' and value is not None):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f'{field} doit être un nombre')
+            value = float(value)
+            if field == 'hysteresis' and value < 0:
+                raise ValueError('hysteresis doit être positive')
+        elif field == 'duration_seconds':
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError('duration_seconds doit être un entier positif')
+        elif field == 'enabled':
+            if not isinstance(value, bool):
+                raise ValueError('enabled doit être un booléen')
+        elif field == 'name':
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError('name doit être une chaîne non vide')
+            value = value.strip()
+        values[field] = value
+
+    if not partial:
+        values.setdefault('name', f"{values['metric']} {values.get('comparison', 'above')} {values['threshold']:g}")
+    return values
+
+
+class RuleEvaluator:
+    """État d'une règle pendant l'évaluation d'une série d'échantillons"""
+
+    def __init__(self, rule, incident=None):
+        self.rule = rule
+        self.above = rule['comparison'] != 'below'
+        self.state = {
+            'last_evaluated_at': rule['last_evaluated_at'],
+            'pending_since': rule['pending_since'],
+            'pending_peak': rule['pending_peak'],
+            'pending_peak_at': rule['pending_peak_at'],
+            'pending_count': rule['pending_count'] or 0
+        }
+        self.incident = dict(incident) if incident is not None else None
+        self.finished = []
+        self.changed = False
+
+    def _breaches(self, value):
+        threshold = self.rule['threshold']
+        return value > threshold if self.above else value < threshold
+
+    def _cleared(self, value):
+        hysteresis = self.rule['hysteresis'] or 0
+        if self.above:
+            return value <= self.rule['threshold'] - hysteresis
+        return value >= self.rule['threshold'] + hysteresis
+
+    def _worse(self, value, peak):
+        return peak is None or (value > peak if self.above else value < peak)
+
+    def _severity(self, peak):
+        critical = self.rule['critical_threshold']
+        if critical is not None and (peak > critical if self.above else peak < critical):
+            return 'critical'
+        return self.rule['severity']
+
+    def _reset_pending(self):
+        self.state.update(pending_since=None, pending_peak=None, pending_peak_at=None, pending_count=0)
+
+    def feed(self, timestamp, value):
+        """Fait avancer la machine à états d'un échantillon"""
+        last = self.state['last_evaluated_at']
+        if value is None or (last is not None and timestamp < last):
+            return
+        self.changed = True
+        self.state['last_evaluated_at'] = timestamp
+
+        incident = self.incident
+        if incident is not None:
+            if self._cleared(value):
+                incident['ended_at'] = timestamp
+                self.finished.append(incident)
+                self.incident = None
+            else:
+                incident['sample_count'] += 1
+                if self._breaches(value):
+                    incident['last_breach_at'] = timestamp
+                if self._worse(value, incident['peak_value']):
+                    incident['peak_value'] = value
+                    incident['peak_at'] = timestamp
+                    incident['severity'] = self._severity(value)
+            return
+
+        if not self._breaches(value):
+            self._reset_pending()
+            return
+
+        state = self.state
+        if state['pending_since'] is None:
+            state.update(pending_since=timestamp, pending_peak=value, pending_peak_at=timestamp, pending_count=1)
+        else:
+            state['pending_count'] += 1
+            if self._worse(value, state['pending_peak']):
+                state.update(pending_peak=value, pending_peak_at=timestamp)
+
+        if (timestamp - state['pending_since']).total_seconds() >= (self.rule['duration_seconds'] or 0):
+            self.incident = {
+                'rule_id': self.rule['id'],
+                'metric': self.rule['metric'],
+                'severity': self._severity(state['pending_peak']),
+                'threshold': self.rule['threshold'],
+                'started_at': state['pending_since'],
+                'ended_at': None,
+                'last_breach_at': timestamp,
+                'peak_value': state['pending_peak'],
+                'peak_at': state['pending_peak_at'],
+                'sample_count': state['pending_count']
+            }
+            self._reset_pending()
+
+    def flush(self, connection):
+        """Écrit les incidents créés ou modifiés et l'état de la règle"""
+        if not self.changed:
+            return
+        incidents_table = AlertIncident.__table__
+        open_incident_id = None
+        for incident in self.finished + ([self.incident] if self.incident is not None else []):
+            values = {key: value for key, value in incident.items() if key != 'id'}
+            if incident.get('id') is None:
+                incident['id'] = connection.execute(
+                    insert(incidents_table).values(**values).returning(incidents_table.c.id)
+                ).scalar_one()
+            else:
+                connection.execute(
+                    update(incidents_table).where(incidents_table.c.id == incident['id']).values(**values)
+                )
+        if self.incident is not None:
+            open_incident_id = self.incident['id']
+
+        rules_table = AlertRule.__table__
+        connection.execute(
+            update(rules_table).where(rules_table.c.id == self.rule['id']).values(
+                open_incident_id=open_incident_id, **self.state
+            )
+        )
+        self.finished = []
+        self.changed = False
+
+
+def _open_incident(connection, rule):
+    if rule['open_incident_id'] is None:
+        return None
+    incidents_table = AlertIncident.__table__
+    return connection.execute(
+        select(incidents_table).where(incidents_table.c.id == rule['open_incident_id'])
+    ).mappings().first()
+
+
+def evaluate_samples(connection, rows):
+    """Évalue les règles actives sur des échantillons venant d'être insérés"""
+    rules_table = AlertRule.__table__
+    rules = connection.execute(
+        select(rules_table).where(rules_table.c.enabled.is_(True))
+    ).mappings().all()
+    if not rules:
+        return
+
+    samples = sorted(
+        (row for row in rows if row.get('timestamp') is not None),
+        key=lambda row: row['timestamp']
+    )
+    for rule in rules:
+        evaluator = RuleEvaluator(rule, _open_incident(connection, rule))
+        for sample in samples:
+            evaluator.feed(sample['timestamp'], sample.get(rule['metric']))
+        evaluator.flush(connection)
+
+
+@rows_inserted.connect_via(SystemMetrics.__tablename__)
+def _on_metrics_inserted(sender, connection, rows):
+    evaluate_samples(connection, rows)
+
+
+def replay_rule(connection, rule_id, chunk_size=5000):
+    """
+    Réévalue une règle sur toutes les métriques brutes conservées, mois
+    archivés compris
+
+    Les incidents de la règle sont supprimés puis reconstruits.
+    """
+    rules_table = AlertRule.__table__
+    incidents_table = AlertIncident.__table__
+    connection.execute(delete(incidents_table).where(incidents_table.c.rule_id == rule_id))
+    connection.execute(
+        update(rules_table).where(rules_table.c.id == rule_id).values(
+            last_evaluated_at=None, pending_since=None, pending_peak=None,
+            pending_peak_at=None, pending_count=0, open_incident_id=None
+        )
+    )
+    rule = connection.execute(select(rules_table).where(rules_table.c.id == rule_id)).mappings().first()
+    if rule is None or not rule['enabled']:
+        return
+
+    evaluator = RuleEvaluator(rule)
+    # Mois archivés (les plus anciens), puis partitions dans l'ordre chronologique
+    for chunk in metrics_archive.row_chunks(connection=connection):
+        for row in chunk:
+            evaluator.feed(row['timestamp'], row[rule['metric']])
+        evaluator.flush(connection)
+    for raw in partition_tables(connection, SystemMetrics.__tablename__):
+        result = connection.execution_options(yield_per=chunk_size).execute(
+            select(raw.c.timestamp, raw.c[rule['metric']]).order_by(raw.c.timestamp, raw.c.id)
+        )
+        for chunk in result.partitions():
+            for timestamp, value in chunk:
+                evaluator.feed(timestamp, value)
+            # Les incidents clos sont écrits au fil de l'eau
+            evaluator.flush(connection)
+    evaluator.flush(connection)
+
+
+def seed_default_rules(connection):
+    """Crée les règles par défaut si aucune règle n'existe, puis les évalue"""
+    rules_table = AlertRule.__table__
+    if connection.execute(select(rules_table.c.id).limit(1)).first() is not None:
+        return
+    now = datetime.utcnow()
+    for rule in DEFAULT_RULES:
+        rule_id = connection.execute(
+            insert(rules_table).values(enabled=True, created_at=now, updated_at=now, **rule)
+            .returning(rules_table.c.id)
+        ).scalar_one()
+        replay_rule(connection, rule_id)
+
+
+def rule_for_threshold(metric, threshold):
+    """
+    Règle « above » active la plus précise couvrant un seuil demandé :
+    celle dont le seuil est le plus élevé sans dépasser threshold
+    """
+    rules_table = AlertRule.__table__
+    return db.session.execute(
+        select(rules_table).where(
+            rules_table.c.metric == metric,
+            rules_table.c.comparison == 'above',
+            rules_table.c.enabled.is_(True),
+            rules_table.c.threshold <= threshold
+        ).order_by(rules_table.c.threshold.desc()).limit(1)
+    ).mappings().first()
+
+
+def incident_criteria(rule_id, date_start, date_end=None, min_peak=None):
+    """Incidents d'une règle qui chevauchent [date_start, date_end]"""
+    table = AlertIncident.__table__
+    criteria = [
+        table.c.rule_id == rule_id,
+        or_(table.c.ended_at.is_(None), table.c.ended_at >= date_start)
+    ]
+    if date_end is not None:
+        criteria.append(table.c.started_at <= date_end)
+    if min_peak is not None:
+        criteria.append(table.c.peak_value > min_peak)
+    return criteria
+
+
+def incident_dict(row):
+    """Incident (ligne brute) au format de AlertIncident.to_dict"""
+    return {
+        'id': row['id'],
+        'rule_id': row['rule_id'],
+        'metric': row['metric'],
+        'severity': row['severity'],
+        'threshold': row['threshold'],
+        'started_at': row['started_at'].isoformat(),
+        'ended_at': row['ended_at'].isoformat() if row['ended_at'] else None,
+        'last_breach_at': row['last_breach_at'].isoformat(),
+        'peak_value': row['peak_value'],
+        'peak_at': row['peak_at'].isoformat(),
+        'sample_count': row['sample_count'],
+        'ongoing': row['ended_at'] is None
+    }
+
+
+def threshold_incidents(metric, threshold, date_start, date_end=None, order='recent', limit=20):
+    """
+    Incidents d'un champ dont le pic dépasse threshold sur une période
+
+    Lus dans les incidents de la règle qui couvre threshold ; order vaut
+    'recent' (plus récents d'abord) ou 'peak' (pics les plus hauts).
+    Retourne (nombre, pic le plus haut, incidents) ou None si aucune
+    règle ne couvre le seuil.
+    """
+    rule = rule_for_threshold(metric, threshold)
+    if rule is None:
+        return None
+
+    table = AlertIncident.__table__
+    criteria = incident_criteria(rule['id'], date_start, date_end, min_peak=threshold)
+    count, highest = db.session.execute(
+        select(func.count(), func.max(table.c.peak_value)).where(*criteria)
+    ).one()
+    order_by = table.c.peak_value.desc() if order == 'peak' else table.c.started_at.desc()
+    rows = db.session.execute(
+        select(table).where(*criteria).order_by(order_by).limit(limit)
+    ).mappings()
+    return count, highest, [incident_dict(row) for row in rows]
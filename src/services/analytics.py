@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Noyau analytique exécuté en SQL
+
+Remplace les compréhensions de listes sur des objets ORM (un filtre par
+statut, par seuil, puis un tri) par des requêtes Core qui ne lisent que les
+colonnes utiles et calculent en une passe :
+
+- histogrammes par groupe avec statistiques de chaque groupe (GROUP BY)
+- comptages au-dessus de seuils (SUM(CASE ...))
+- top-k (ORDER BY ... LIMIT k)
+- tendances par moindres carrés : les sommes n, Σx, Σx², Σy, Σxy sont
+  mergeables, ce qui permet de combiner tampon mémoire, rollups et table
+  brute
+- agrégats de plusieurs fenêtres temporelles en une seule requête
+"""
+from sqlalchemy import case, func, or_, select
+from src.models.metrics import db
+
+# Seuil de variation (en %) au-delà duquel une tendance n'est plus stable
+TREND_THRESHOLD_PERCENT = 5
+
+
+def grouped_aggregates(source, group_column, fields, *criteria):
+    """
+    Nombre de lignes et count/sum/min/max de chaque champ par groupe
+
+    Retourne {groupe: {'count': n, champ: {'count', 'sum', 'min', 'max'}}}
+    """
+    columns = [group_column.label('group_key'), func.count().label('row_count')]
+    for field in fields:
+        column = source.c[field]
+        columns.extend([
+            func.count(column).label(f'{field}__count'),
+            func.sum(column).label(f'{field}__sum'),
+            func.min(column).label(f'{field}__min'),
+            func.max(column).label(f'{field}__max')
+        ])
+
+    rows = db.session.execute(
+        select(*columns).select_from(source).where(*criteria).group_by(group_column)
+    ).mappings()
+
+    groups = {}
+    for row in rows:
+        entry = {'count': row['row_count']}
+        for field in fields:
+            entry[field] = {
+                'count': row[f'{field}__count'],
+                'sum': row[f'{field}__sum'],
+                'min': row[f'{field}__min'],
+                'max': row[f'{field}__max']
+            }
+        groups[row['group_key']] = entry
+    return groups
+
+
+def histogram(groups, keys):
+    """Effectif de chaque clé attendue (0 si absente) à partir de grouped_aggregates"""
+    return {key: groups[key]['count'] if key in groups else 0 for key in keys}
+
+
+def threshold_counts(column, thresholds, *criteria):
+    """Compte en une requête les lignes strictement au-dessus de chaque seuil"""
+    row = db.session.execute(
+        select(*[
+            func.coalesce(func.sum(case((column > threshold, 1), else_=0)), 0)
+            for threshold in thresholds
+        ]).where(*criteria)
+    ).one()
+    return list(row)
+
+
+def top_k(columns, order_by, limit, *criteria):
+    """Les limit premières lignes selon order_by (liste de clauses de tri)"""
+    return db.session.execute(
+        select(*columns).where(*criteria).order_by(*order_by).limit(limit)
+    ).all()
+
+
+# Tendances par moindres carrés
+
+def empty_regression():
+    return {'n': 0, 'sx': 0.0, 'sxx': 0.0, 'sy': 0.0, 'sxy': 0.0, 'x_min': None, 'x_max': None}
+
+
+def hours_since(column, origin):
+    """Expression SQL : heures écoulées entre origin et une colonne datetime"""
+    return (func.julianday(column) - func.julianday(origin.isoformat(sep=' '))) * 24
+
+
+def regression_sums(source, time_column, origin, fields, *criteria):
+    """
+    Sommes de régression de chaque champ en fonction du temps (en heures
+    depuis origin), en une seule requête
+
+    Retourne {champ: {'n', 'sx', 'sxx', 'sy', 'sxy', 'x_min', 'x_max'}}
+    """
+    x = hours_since(time_column, origin)
+    columns = [
+        func.count().label('n'),
+        func.sum(x).label('sx'),
+        func.sum(x * x).label('sxx'),
+        func.min(x).label('x_min'),
+        func.max(x).label('x_max')
+    ]
+    for field in fields:
+        column = source.c[field]
+        columns.extend([
+            func.sum(column).label(f'{field}__sy'),
+            func.sum(x * column).label(f'{field}__sxy')
+        ])
+
+    row = db.session.execute(
+        select(*columns).select_from(source).where(*criteria)
+    ).one()._mapping
+
+    return {
+        field: {
+            'n': row['n'],
+            'sx': row['sx'] or 0.0,
+            'sxx': row['sxx'] or 0.0,
+            'sy': row[f'{field}__sy'] or 0.0,
+            'sxy': row[f'{field}__sxy'] or 0.0,
+            'x_min': row['x_min'],
+            'x_max': row['x_max']
+        } for field in fields
+    }
+
+
+def regression_from_points(points):
+    """Sommes de régression d'une liste de couples (x, y)"""
+    sums = empty_regression()
+    for x, y in points:
+        y = y or 0
+        sums['n'] += 1
+        sums['sx'] += x
+        sums['sxx'] += x * x
+        sums['sy'] += y
+        sums['sxy'] += x * y
+        sums['x_min'] = x if sums['x_min'] is None else min(sums['x_min'], x)
+        sums['x_max'] = x if sums['x_max'] is None else max(sums['x_max'], x)
+    return sums
+
+
+def merge_regression(*partials):
+    """Fusionne des sommes de régression partielles"""
+    merged = empty_regression()
+    for sums in partials:
+        if not sums or not sums['n']:
+            continue
+        for key in ('n', 'sx', 'sxx', 'sy', 'sxy'):
+            merged[key] += sums[key]
+        merged['x_min'] = sums['x_min'] if merged['x_min'] is None else min(merged['x_min'], sums['x_min'])
+        merged['x_max'] = sums['x_max'] if merged['x_max'] is None else max(merged['x_max'], sums['x_max'])
+    return merged
+
+
+def least_squares_trend(sums):
+    """
+    Tendance d'une série à partir de sa droite des moindres carrés
+
+    first_value / last_value sont les valeurs de la droite au premier et au
+    dernier échantillon ; percentage est la variation entre les deux.
+    """
+    n = sums['n'] if sums else 0
+    if n < 2:
+        return {'trend': 'stable', 'percentage': 0}
+
+    denominator = n * sums['sxx'] - sums['sx'] ** 2
+    if denominator <= 0:
+        return {'trend': 'stable', 'percentage': 0}
+
+    slope = (n * sums['sxy'] - sums['sx'] * sums['sy']) / denominator
+    intercept = (sums['sy'] - slope * sums['sx']) / n
+    first_value = intercept + slope * sums['x_min']
+    last_value = intercept + slope * sums['x_max']
+
+    if first_value == 0:
+        return {'trend': 'stable', 'percentage': 0}
+
+    percentage_change = ((last_value - first_value) / abs(first_value)) * 100
+
+    if percentage_change > TREND_THRESHOLD_PERCENT:
+        trend = 'increasing'
+    elif percentage_change < -TREND_THRESHOLD_PERCENT:
+        trend = 'decreasing'
+    else:
+        trend = 'stable'
+
+    return {
+        'trend': trend,
+        'percentage': round(percentage_change, 2),
+        'first_value': round(first_value, 2),
+        'last_value': round(last_value, 2),
+        'slope_per_hour': round(slope, 4) + 0.0
+    }
+
+
+# Agrégation multi-fenêtres
+
+def window_aggregates(source, conditions, fields, x=None, trend_fields=()):
+    """
+    Agrège plusieurs fenêtres en une seule requête
+
+    Chaque fenêtre est une condition SQL ; chaque statistique de chaque
+    fenêtre est une colonne CASE, et seules les lignes d'au moins une
+    fenêtre sont lues (WHERE cond1 OR cond2 ...). x est l'expression du
+    temps (en heures) utilisée pour les tendances de trend_fields.
+
+    Retourne, dans l'ordre des fenêtres, des couples
+    (statistiques par champ, sommes de régression par champ).
+    """
+    columns = []
+    for index, condition in enumerate(conditions):
+        prefix = f'w{index}'
+        columns.append(func.count(case((condition, 1))).label(f'{prefix}__count'))
+        for field in fields:
+            value = case((condition, source.c[field]))
+            columns.extend([
+                func.count(value).label(f'{prefix}__{field}__count'),
+                func.sum(value).label(f'{prefix}__{field}__sum'),
+                func.min(value).label(f'{prefix}__{field}__min'),
+                func.max(value).label(f'{prefix}__{field}__max')
+            ])
+        if trend_fields:
+            window_x = case((condition, x))
+            columns.extend([
+                func.sum(window_x).label(f'{prefix}__sx'),
+                func.sum(case((condition, x * x))).label(f'{prefix}__sxx'),
+                func.min(window_x).label(f'{prefix}__x_min'),
+                func.max(window_x).label(f'{prefix}__x_max')
+            ])
+            for field in trend_fields:
+                columns.extend([
+                    func.sum(case((condition, source.c[field]))).label(f'{prefix}__{field}__sy'),
+                    func.sum(case((condition, x * source.c[field]))).label(f'{prefix}__{field}__sxy')
+                ])
+
+    row = db.session.execute(
+        select(*columns).select_from(source).where(or_(*conditions))
+    ).one()._mapping
+
+    results = []
+    for index in range(len(conditions)):
+        prefix = f'w{index}'
+        count = row[f'{prefix}__count']
+        stats = {
+            field: {
+                'count': row[f'{prefix}__{field}__count'],
+                'sum': row[f'{prefix}__{field}__sum'],
+                'min': row[f'{prefix}__{field}__min'],
+                'max': row[f'{prefix}__{field}__max']
+            } for field in fields
+        }
+        regressions = {
+            field: {
+                'n': count,
+                'sx': row[f'{prefix}__sx'] or 0.0,
+                'sxx': row[f'{prefix}__sxx'] or 0.0,
+                'sy': row[f'{prefix}__{field}__sy'] or 0.0,
+                'sxy': row[f'{prefix}__{field}__sxy'] or 0.0,
+                'x_min': row[f'{prefix}__x_min'],
+                'x_max': row[f'{prefix}__x_max']
+            } for field in trend_fields
+        }
+        results.append((stats, regressions))
+    return results
@@ -0,0 +1,742 @@
+# -*- coding: utf-8 -*-
+"""
+Archive en colonnes compressées de l'historique froid de system_metrics
+
+Les mois entièrement plus anciens que ARCHIVE_AFTER_DAYS sortent de
+SQLite : la partition du mois (voir services.partitions) est encodée dans
+un fichier, puis supprimée par DROP TABLE dans le même travail d'écriture
+que l'enregistrement du fichier dans archive_segments. Une ligne est donc
+toujours soit dans une partition, soit dans un fichier référencé ; des
+lignes arrivées en retard pour un mois archivé recréent sa partition et
+sont fusionnées au fichier au cycle suivant.
+
+Chaque tentative d'archivage écrit son propre fichier
+(<table>_pAAAAMM.<dernier id>.<jeton>.col, jeton aléatoire) : deux
+archivages concurrents du même mois (autre processus, rechargement du
+serveur de développement) n'écrivent jamais le même fichier, et celui
+qui perd la course ne supprime que le sien. Un fichier non référencé
+n'est supprimé par remove_orphans qu'après ORPHAN_GRACE_SECONDS, délai
+laissé à une tentative en cours pour l'enregistrer.
+
+Format d'un fichier :
+- en-tête : signature, version, longueur, puis JSON (type d'encodage de
+  chaque colonne, blocs de BLOCK_ROWS lignes avec premier/dernier
+  timestamp et position de chaque colonne)
+- pour chaque bloc et chaque colonne : un octet indiquant la présence de
+  NULL (suivi d'un masque de bits), puis les valeurs encodées :
+  - id et timestamp (microsecondes) : delta-of-delta, en entiers zigzag
+    varint ; à intervalle régulier, un échantillon tient en un octet
+  - autres entiers : delta, en zigzag varint
+  - réels : XOR avec la valeur précédente comme dans Gorilla, mais aligné
+    sur l'octet (un octet de contrôle donnant le nombre d'octets nuls en
+    tête et en queue, puis les octets restants), ce qui garde le décodage
+    rapide en Python ; une valeur inchangée tient en un octet
+
+Les fichiers sont lus par mmap ; seuls les blocs qui chevauchent la plage
+demandée sont décodés, et les colonnes décodées restent dans un petit
+cache LRU. Les lectures renvoient les mêmes formes que leurs équivalents
+SQL (analytics.window_aggregates) ou que le tampon mémoire
+(MetricsRingBuffer.samples) : les routes ajoutent la part archivée d'une
+plage à ce qu'elles lisent dans les partitions.
+
+Configuration (app.config) :
+- ARCHIVE_AFTER_DAYS : âge à partir duquel un mois est archivé ; None
+  désactive l'archivage
+- ARCHIVE_DIR : répertoire des fichiers (par défaut archive/ à côté de la
+  base)
+La rétention de system_metrics (RETENTION_DAYS) s'applique aussi à
+l'archive, par mois entiers.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import accumulate, chain, compress
+from operator import itemgetter, mul
+from sqlalchemy import DateTime, Float, delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import make_url
+from src.models.metrics import db, SystemMetrics
+from src.services.aggregations import merge_stats
+from src.services.analytics import empty_regression, merge_regression
+from src.services.events import mark_changed
+from src.services.partitions import next_month, partition_registry, partition_table
+from src.services.writer import writer
+
+# Mois archivés une fois entièrement plus anciens que ce nombre de jours
+DEFAULT_ARCHIVE_AFTER_DAYS = 31
+
+# Lignes par bloc (unité de décodage)
+BLOCK_ROWS = 4096
+
+# Colonnes de blocs décodées gardées en mémoire
+DECODED_CACHE_SIZE = 256
+
+# Âge minimal d'un fichier non référencé avant sa suppression (secondes)
+ORPHAN_GRACE_SECONDS = 3600
+
+MAGIC = b'VCAR'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHI')
+
+EPOCH = datetime(1970, 1, 1)
+
+# Fichiers d'archive de chaque mois archivé
+archive_segments = db.Table(
+    'archive_segments',
+    db.Column('table_name', db.String(100), primary_key=True),
+    db.Column('month', db.DateTime, primary_key=True),
+    db.Column('file_name', db.String(255), nullable=False),
+    db.Column('row_count', db.Integer, nullable=False),
+    db.Column('first_timestamp', db.DateTime, nullable=False),
+    db.Column('last_timestamp', db.DateTime, nullable=False),
+    db.Column('size_bytes', db.Integer, nullable=False),
+    db.Column('archived_at', db.DateTime, nullable=False, default=datetime.utcnow)
+)
+
+
+def archive_after_days(app_config):
+    """Âge d'archivage configuré (None = archivage désactivé)"""
+    return app_config.get('ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+
+
+def archive_cutoff(app_config, now=None):
+    """Date avant laquelle un mois entier est archivé, ou None"""
+    days = archive_after_days(app_config)
+    if days is None:
+        return None
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def _to_micros(timestamp):
+    delta = timestamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+# Encodages
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _put_varints(out, values):
+    for value in values:
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def _get_varints(buffer):
+    values = []
+    value = shift = 0
+    for byte in buffer:
+        if byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            values.append(value | (byte << shift))
+            value = shift = 0
+    return values
+
+
+def _encode_delta(values):
+    out = bytearray()
+    previous = 0
+    deltas = []
+    for value in values:
+        deltas.append(_zigzag(value - previous))
+        previous = value
+    _put_varints(out, deltas)
+    return out
+
+
+def _decode_delta(buffer, count):
+    return array('q', accumulate(map(_unzigzag, _get_varints(buffer))))
+
+
+def _encode_dod(values):
+    out = bytearray()
+    previous = delta = 0
+    changes = []
+    for value in values:
+        current = value - previous
+        changes.append(_zigzag(current - delta))
+        previous, delta = value, current
+    _put_varints(out, changes)
+    return out
+
+
+def _decode_dod(buffer, count):
+    return array('q', accumulate(accumulate(map(_unzigzag, _get_varints(buffer)))))
+
+
+def _encode_xor(values):
+    out = bytearray()
+    previous = 0
+    for bits in array('Q', array('d', values).tobytes()):
+        xor = bits ^ previous
+        previous = bits
+        if not xor:
+            out.append(0)
+            continue
+        leading = (64 - xor.bit_length()) // 8
+        trailing = ((xor & -xor).bit_length() - 1) // 8
+        out.append(0x80 | (leading << 3) | trailing)
+        out += (xor >> (8 * trailing)).to_bytes(8 - leading - trailing, 'big')
+    return out
+
+
+def _decode_xor(buffer, count):
+    bits = array('Q')
+    previous = 0
+    position = 0
+    for _ in range(count):
+        control = buffer[position]
+        position += 1
+        if control:
+            trailing = control & 7
+            size = 8 - ((control >> 3) & 7) - trailing
+            previous ^= int.from_bytes(buffer[position:position + size], 'big') << (8 * trailing)
+            position += size
+        bits.append(previous)
+    return array('d', bits.tobytes())
+
+
+_CODECS = {
+    'dod': (_encode_dod, _decode_dod),
+    'delta': (_encode_delta, _decode_delta),
+    'xor': (_encode_xor, _decode_xor),
+    'timestamp': (_encode_dod, _decode_dod)
+}
+
+
+def _column_kind(column):
+    if isinstance(column.type, DateTime):
+        return 'timestamp'
+    if column.primary_key:
+        return 'dod'
+    if isinstance(column.type, Float):
+        return 'xor'
+    return 'delta'
+
+
+def _encode_column(kind, values):
+    """Octet de présence de NULL, masque éventuel puis valeurs encodées"""
+    if kind == 'timestamp':
+        values = [_to_micros(value) if value is not None else None for value in values]
+    elif kind != 'xor':
+        values = [int(value) if value is not None else None for value in values]
+
+    out = bytearray()
+    if any(value is None for value in values):
+        mask = bytearray((len(values) + 7) // 8)
+        filled = []
+        previous = 0
+        for index, value in enumerate(values):
+            if value is None:
+                mask[index >> 3] |= 1 << (index & 7)
+                value = previous
+            filled.append(value)
+            previous = value
+        out.append(1)
+        out += mask
+        values = filled
+    else:
+        out.append(0)
+    out += _CODECS[kind][0](values)
+    return out
+
+
+def _decode_column(kind, buffer, count):
+    """
+    Valeurs d'une colonne de bloc : un array sans NULL, sinon une liste
+    contenant des None (timestamps en microsecondes)
+    """
+    position = 1
+    mask = None
+    if buffer[0]:
+        position += (count + 7) // 8
+        mask = buffer[1:position]
+    values = _CODECS[kind][1](buffer[position:], count)
+    if mask is not None:
+        values = values.tolist()
+        for index in range(count):
+            if mask[index >> 3] >> (index & 7) & 1:
+                values[index] = None
+    return values
+
+
+def _present(values):
+    """Valeurs non nulles d'une tranche de colonne"""
+    return [value for value in values if value is not None] if isinstance(values, list) else values
+
+
+def write_segment(path, table, rows):
+    """
+    Écrit des lignes (dicts triés par timestamp) au format d'archive
+
+    Le fichier est écrit à côté puis renommé. Retourne les informations
+    enregistrées dans archive_segments.
+    """
+    kinds = [(column.name, _column_kind(column)) for column in table.columns]
+    blocks = []
+    body = bytearray()
+    for start in range(0, len(rows), BLOCK_ROWS):
+        chunk = rows[start:start + BLOCK_ROWS]
+        positions = {}
+        for name, kind in kinds:
+            encoded = _encode_column(kind, [row[name] for row in chunk])
+            positions[name] = [len(body), len(encoded)]
+            body += encoded
+        blocks.append({
+            'rows': len(chunk),
+            'first': _to_micros(chunk[0]['timestamp']),
+            'last': _to_micros(chunk[-1]['timestamp']),
+            'columns': positions
+        })
+
+    header = json.dumps({'table': table.name, 'columns': kinds, 'blocks': blocks}).encode('utf-8')
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header)))
+        file.write(header)
+        file.write(body)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+    return {
+        'row_count': len(rows),
+        'first_timestamp': rows[0]['timestamp'],
+        'last_timestamp': rows[-1]['timestamp'],
+        'size_bytes': _HEADER.size + len(header) + len(body)
+    }
+
+
+class ArchiveSegment:
+    """Fichier d'archive d'un mois, projeté en mémoire (mmap)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Fichier d'archive invalide: {path}")
+        header = json.loads(self._map[_HEADER.size:_HEADER.size + size])
+        self._data = _HEADER.size + size
+        self.kinds = dict(header['columns'])
+        self.blocks = header['blocks']
+
+    def read(self, index, name):
+        """Décode une colonne d'un bloc"""
+        block = self.blocks[index]
+        offset, size = block['columns'][name]
+        start = self._data + offset
+        return _decode_column(self.kinds[name], self._map[start:start + size], block['rows'])
+
+
+class ColumnArchive:
+    """Mois archivés d'une table partitionnée et lectures en colonnes"""
+
+    def __init__(self, table):
+        self.table = table
+        self.directory = None
+        self._columns = [column.name for column in table.columns]
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._decoded = OrderedDict()
+
+    def init_app(self, app):
+        """Répertoire des fichiers : ARCHIVE_DIR ou archive/ à côté de la base"""
+        directory = app.config.get('ARCHIVE_DIR')
+        if directory is None:
+            database = make_url(app.config['SQLALCHEMY_DATABASE_URI']).database
+            if database and database != ':memory:':
+                directory = os.path.join(os.path.dirname(os.path.abspath(database)), 'archive')
+        self.directory = directory
+
+    # Lecture
+
+    def segments(self, connection=None, date_start=None, date_end=None):
+        """Fichiers (ordre chronologique) dont les lignes chevauchent la plage"""
+        connection = connection if connection is not None else db.session.connection()
+        table = archive_segments
+        criteria = [table.c.table_name == self.table.name]
+        if date_start is not None:
+            criteria.append(table.c.last_timestamp >= date_start)
+        if date_end is not None:
+            criteria.append(table.c.first_timestamp <= date_end)
+        return connection.execute(
+            select(table).where(*criteria).order_by(table.c.month)
+        ).mappings().all()
+
+    def _segment(self, file_name):
+        with self._lock:
+            segment = self._segments.get(file_name)
+            if segment is None:
+                segment = ArchiveSegment(os.path.join(self.directory, file_name))
+                self._segments[file_name] = segment
+            return segment
+
+    def _column(self, file_name, index, name):
+        key = (file_name, index, name)
+        with self._lock:
+            values = self._decoded.get(key)
+            if values is not None:
+                self._decoded.move_to_end(key)
+                return values
+        values = self._segment(file_name).read(index, name)
+        with self._lock:
+            self._decoded[key] = values
+            while len(self._decoded) > DECODED_CACHE_SIZE:
+                self._decoded.popitem(last=False)
+        return values
+
+    def _blocks(self, segments, date_start, date_end):
+        """(fichier, bloc, début, fin) des tranches de blocs dans [date_start, date_end]"""
+        start = _to_micros(date_start) if date_start is not None else None
+        end = _to_micros(date_end) if date_end is not None else None
+        for row in segments:
+            if (date_start is not None and row['last_timestamp'] < date_start) or \
+                    (date_end is not None and row['first_timestamp'] > date_end):
+                continue
+            for index, block in enumerate(self._segment(row['file_name']).blocks):
+                if (start is not None and block['last'] < start) or (end is not None and block['first'] > end):
+                    continue
+                timestamps = self._column(row['file_name'], index, 'timestamp')
+                lo = bisect_left(timestamps, start) if start is not None else 0
+                hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+                if lo < hi:
+                    yield row['file_name'], index, lo, hi
+
+    def window_aggregates(self, windows, fields, origin, trend_fields=(), connection=None):
+        """
+        Part archivée de plusieurs fenêtres, chacune étant une liste de plages
+        [(début, fin incluse), ...]
+
+        Même forme que analytics.window_aggregates : retourne, dans l'ordre,
+        des couples (statistiques par champ, sommes de régression par champ),
+        x étant exprimé en heures depuis origin.
+        """
+        results = [
+            (
+                {field: {'count': 0, 'sum': None, 'min': None, 'max': None} for field in fields},
+                {field: empty_regression() for field in trend_fields}
+            ) for _ in windows
+        ]
+        ranges = [(date_start, date_end) for window in windows for date_start, date_end in window]
+        if not ranges:
+            return results
+        ends = [date_end for _, date_end in ranges]
+        segments = self.segments(
+            connection, min(date_start for date_start, _ in ranges), None if None in ends else max(ends)
+        )
+        if not segments:
+            return results
+
+        origin = _to_micros(origin)
+        for window, (stats, regressions) in zip(windows, results):
+            for date_start, date_end in window:
+                for name, index, lo, hi in self._blocks(segments, date_start, date_end):
+                    for field in fields:
+                        values = _present(self._column(name, index, field)[lo:hi])
+                        if len(values):
+                            stats[field] = merge_stats(stats[field], {
+                                'count': len(values),
+                                'sum': sum(values),
+                                'min': min(values),
+                                'max': max(values)
+                            })
+                    if not trend_fields:
+                        continue
+                    xs = [(ts - origin) / 3600000000 for ts in self._column(name, index, 'timestamp')[lo:hi]]
+                    base = {
+                        'n': len(xs),
+                        'sx': sum(xs),
+                        'sxx': sum(map(mul, xs, xs)),
+                        'x_min': xs[0],
+                        'x_max': xs[-1]
+                    }
+                    for field in trend_fields:
+                        column = self._column(name, index, field)[lo:hi]
+                        pairs = [(x, y) for x, y in zip(xs, column) if y is not None]
+                        regressions[field] = merge_regression(regressions[field], dict(
+                            base,
+                            sy=sum(y for _, y in pairs),
+                            sxy=sum(x * y for x, y in pairs)
+                        ))
+        return results
+
+    def samples(self, fields, date_start, date_end=None, where=None, connection=None):
+        """
+        Échantillons archivés d'une plage sous forme de colonnes
+
+        where=(champ, seuil) ne garde que les échantillons >= seuil.
+        Retourne {'timestamp': [...], champ: [...]} en ordre chronologique,
+        comme MetricsRingBuffer.samples.
+        """
+        result = {'timestamp': []}
+        result.update({field: [] for field in fields})
+        segments = self.segments(connection, date_start, date_end)
+        for name, index, lo, hi in self._blocks(segments, date_start, date_end):
+            timestamps = self._column(name, index, 'timestamp')[lo:hi]
+            columns = {field: self._column(name, index, field)[lo:hi] for field in fields}
+            if where is not None:
+                field, threshold = where
+                keep = [
+                    value is not None and value >= threshold
+                    for value in self._column(name, index, field)[lo:hi]
+                ]
+                timestamps = compress(timestamps, keep)
+                columns = {field: compress(column, keep) for field, column in columns.items()}
+            result['timestamp'].extend(map(_from_micros, timestamps))
+            for field, column in columns.items():
+                result[field].extend(column)
+        return result
+
+    def row_chunks(self, date_start=None, date_end=None, connection=None, segments=None):
+        """
+        Lignes archivées d'une plage (dicts de toutes les colonnes), par
+        blocs, en ordre chronologique
+        """
+        if segments is None:
+            segments = self.segments(connection, date_start, date_end)
+        for name, index, lo, hi in self._blocks(segments, date_start, date_end):
+            kinds = self._segment(name).kinds
+            columns = []
+            for column in self._columns:
+                values = self._column(name, index, column)[lo:hi]
+                if kinds[column] == 'timestamp':
+                    values = [_from_micros(value) if value is not None else None for value in values]
+                columns.append(values)
+            yield [dict(zip(self._columns, values)) for values in zip(*columns)]
+
+    # Archivage
+
+    def _file_name(self, month, rows):
+        last_id = max(row['id'] for row in rows)
+        return f'{self.table.name}_p{month:%Y%m}.{last_id}.{uuid.uuid4().hex[:12]}.col'
+
+    def _is_referenced(self, file_name):
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(archive_segments.c.file_name).where(archive_segments.c.file_name == file_name)
+            ).first() is not None
+
+    def archive_month(self, month):
+        """
+        Archive la partition d'un mois (fusionnée au fichier existant du
+        mois) puis la supprime
+
+        Retourne le nombre de lignes du fichier, ou None si la partition a
+        changé pendant l'encodage (nouvel essai au cycle suivant).
+        """
+        table_name = self.table.name
+        partition = partition_table(table_name, month)
+        with db.engine.connect() as connection:
+            rows = [
+                dict(row) for row in connection.execute(
+                    select(partition).order_by(partition.c.timestamp, partition.c.id)
+                ).mappings()
+            ]
+            snapshot = (len(rows), max((row['id'] for row in rows), default=None))
+            existing = connection.execute(
+                select(archive_segments).where(
+                    archive_segments.c.table_name == table_name,
+                    archive_segments.c.month == month
+                )
+            ).mappings().all()
+            if rows and existing:
+                archived = chain.from_iterable(self.row_chunks(segments=existing))
+                rows = sorted(chain(archived, rows), key=itemgetter('timestamp', 'id'))
+
+        file_name = None
+        if rows:
+            file_name = self._file_name(month, rows)
+            segment = write_segment(os.path.join(self.directory, file_name), self.table, rows)
+
+        def job(session):
+            connection = session.connection()
+            if month not in partition_registry.months(connection, table_name):
+                return None
+            current = connection.execute(
+                select(func.count(), func.max(partition.c.id)).select_from(partition)
+            ).one()
+            if tuple(current) != snapshot:
+                return None
+            if file_name is not None:
+                # Fichier supprimé entre-temps (remove_orphans d'un autre processus)
+                if not os.path.exists(os.path.join(self.directory, file_name)):
+                    return None
+                replaced = connection.execute(
+                    select(archive_segments.c.file_name).where(
+                        archive_segments.c.table_name == table_name,
+                        archive_segments.c.month == month
+                    )
+                ).scalar()
+                values = dict(segment, file_name=file_name, archived_at=datetime.utcnow())
+                connection.execute(
+                    insert(archive_segments)
+                    .values(table_name=table_name, month=month, **values)
+                    .on_conflict_do_update(index_elements=['table_name', 'month'], set_=values)
+                )
+            else:
+                replaced = None
+            partition.drop(connection)
+            mark_changed(session, table_name)
+            return len(rows), replaced
+
+        # En cas d'erreur (délai d'attente du résultat dépassé), le travail
+        # peut encore être validé : le fichier est laissé à remove_orphans
+        result = writer.run(job)
+        if result is None:
+            if file_name is not None and not self._is_referenced(file_name):
+                # Ne supprimer que le fichier de cette tentative
+                os.remove(os.path.join(self.directory, file_name))
+            return None
+        archived, replaced = result
+        # Le fichier remplacé n'est plus référencé une fois le travail validé
+        self._remove_files([replaced])
+        return archived
+
+    def archive_before(self, cutoff):
+        """Archive les partitions dont le mois entier précède cutoff"""
+        if self.directory is None:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+        with db.engine.connect() as connection:
+            months = [
+                month for month in partition_registry.months(connection, self.table.name)
+                if next_month(month) <= cutoff
+            ]
+
+        archived = []
+        # Un mois par travail, pour ne pas retenir le verrou d'écriture
+        for month in months:
+            count = self.archive_month(month)
+            if count is not None:
+                archived.append({'month': month.strftime('%Y-%m'), 'rows': count})
+        self.remove_orphans()
+        return archived
+
+    def expire(self, cutoff):
+        """Retire de l'archive les mois entièrement antérieurs à cutoff"""
+        table = archive_segments
+
+        def job(session):
+            months = session.execute(
+                select(table.c.month).where(table.c.table_name == self.table.name)
+            ).scalars().all()
+            expired = [month for month in months if next_month(month) <= cutoff]
+            files = []
+            if expired:
+                files = session.execute(
+                    select(table.c.file_name).where(
+                        table.c.table_name == self.table.name, table.c.month.in_(expired)
+                    )
+                ).scalars().all()
+                session.execute(delete(table).where(
+                    table.c.table_name == self.table.name, table.c.month.in_(expired)
+                ))
+                mark_changed(session, self.table.name)
+            return [month.strftime('%Y-%m') for month in expired], files
+
+        expired, files = writer.run(job)
+        self._remove_files(files)
+        self.remove_orphans()
+        return expired
+
+    def _remove_file(self, file_name):
+        """Supprime un fichier et sa projection en cache ; False s'il n'existe plus"""
+        # Les lectures en cours gardent leur projection jusqu'à leur fin
+        with self._lock:
+            self._segments.pop(file_name, None)
+            for key in [key for key in self._decoded if key[0] == file_name]:
+                del self._decoded[key]
+        try:
+            os.remove(os.path.join(self.directory, file_name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _remove_files(self, file_names):
+        """Supprime des fichiers que le registre ne référence plus"""
+        for file_name in file_names:
+            if file_name is not None and not self._is_referenced(file_name):
+                self._remove_file(file_name)
+
+    def remove_orphans(self, grace_seconds=ORPHAN_GRACE_SECONDS):
+        """
+        Supprime les fichiers qui ne sont plus référencés par archive_segments
+
+        Les fichiers modifiés depuis moins de grace_seconds peuvent
+        appartenir à un archivage en cours et sont conservés.
+        """
+        if self.directory is None or not os.path.isdir(self.directory):
+            return []
+        # Fichiers listés avant la lecture des références : un fichier
+        # enregistré entre les deux n'est pas considéré comme orphelin
+        candidates = [
+            file_name for file_name in os.listdir(self.directory)
+            if file_name.startswith(f'{self.table.name}_p')
+        ]
+        with db.engine.connect() as connection:
+            referenced = set(connection.execute(select(archive_segments.c.file_name)).scalars())
+
+        removed = []
+        now = time.time()
+        for file_name in candidates:
+            if file_name in referenced:
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                if now - os.path.getmtime(path) < grace_seconds:
+                    continue
+            except FileNotFoundError:
+                continue
+            if self._remove_file(file_name):
+                removed.append(file_name)
+        return removed
+
+    def status(self, connection):
+        """Mois archivés, taille des fichiers et octets par ligne"""
+        segments = []
+        for row in self.segments(connection):
+            segments.append({
+                'month': row['month'].strftime('%Y-%m'),
+                'file_name': row['file_name'],
+                'rows': row['row_count'],
+                'first_timestamp': row['first_timestamp'].isoformat(),
+                'last_timestamp': row['last_timestamp'].isoformat(),
+                'size_bytes': row['size_bytes'],
+                'bytes_per_row': round(row['size_bytes'] / row['row_count'], 2)
+            })
+        with self._lock:
+            decoded = len(self._decoded)
+        return {
+            'table': self.table.name,
+            'directory': self.directory,
+            'segments': segments,
+            'rows': sum(segment['rows'] for segment in segments),
+            'size_bytes': sum(segment['size_bytes'] for segment in segments),
+            'decoded_columns_cached': decoded
+        }
+
+
+metrics_archive = ColumnArchive(SystemMetrics.__table__)
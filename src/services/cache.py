@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des réponses des routes analytiques en lecture seule
+
+Les tableaux de bord ouverts dans plusieurs onglets envoient chaque minute
+les mêmes requêtes ; chaque réponse était recalculée entièrement. Le
+décorateur cached() conserve le corps des réponses 200 :
+
+- clé : endpoint, paramètres d'URL et paramètres de requête normalisés
+  (ordre indifférent, valeurs vides ignorées, dates ISO réécrites sous une
+  forme unique) ; pour les routes dont la plage est relative à
+  maintenant, l'instant courant est arrondi à un bucket de snap secondes,
+  si bien que toutes les requêtes d'un même bucket partagent l'entrée
+- durée de vie (ttl) propre à chaque route
+- éviction LRU bornée en nombre d'entrées et en octets
+- invalidation sélective : chaque route déclare les tables qu'elle lit, et
+  le signal tables_changed (émis après chaque commit) supprime les seules
+  entrées qui dépendent de la table modifiée. Une réponse calculée pendant
+  qu'une écriture était validée n'est pas conservée.
+- coalescence (single-flight) : quand plusieurs requêtes identiques
+  arrivent sur une entrée absente, une seule calcule la réponse ; les
+  autres attendent son résultat (ou son erreur) au plus wait_timeout
+  secondes, puis reçoivent 503 (CacheWaitTimeout).
+
+Configuration (app.config) :
+- RESPONSE_CACHE_ENABLED : active le cache (défaut True)
+- RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES : bornes mémoire
+- RESPONSE_CACHE_WAIT_TIMEOUT : attente maximale d'un calcul en cours
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime
+from functools import wraps
+from flask import Response, current_app, request
+from src.services.events import tables_changed
+
+DEFAULT_MAX_ENTRIES = 512
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Attente maximale (secondes) du calcul d'une requête identique en cours
+DEFAULT_WAIT_TIMEOUT = 30
+
+
+class CacheWaitTimeout(Exception):
+    """Le calcul d'une requête identique n'a pas abouti à temps"""
+
+
+def _normalize_value(value):
+    """Forme canonique d'un paramètre (les dates ISO équivalentes sont confondues)"""
+    value = value.strip()
+    if len(value) >= 10 and value[:4].isdigit() and value[4] == '-':
+        try:
+            return datetime.fromisoformat(value).isoformat()
+        except ValueError:
+            pass
+    return value
+
+
+def cache_key(snap=None):
+    """Clé de la requête courante ; snap arrondit l'instant courant (secondes)"""
+    args = tuple(
+        (name, tuple(_normalize_value(value) for value in values))
+        for name, values in sorted(request.args.lists())
+        if any(value.strip() for value in values)
+    )
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    bucket = int(time.time() // snap) if snap else None
+    return request.endpoint, view_args, args, bucket
+
+
+class ResponseCache:
+    """Cache LRU de réponses avec durée de vie et invalidation par table"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        self.enabled = True
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0,
+            'coalesced': 0, 'wait_timeouts': 0
+        }
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        self.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.wait_timeout = app.config.get('RESPONSE_CACHE_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT)
+
+    def versions(self, tables):
+        """Numéros de version des tables (incrémentés à chaque invalidation)"""
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def put(self, key, entry, versions):
+        """
+        Conserve une entrée si ses tables n'ont pas changé depuis versions
+
+        Retourne False si l'entrée est refusée (trop grande ou périmée).
+        """
+        size = len(entry['body'])
+        with self._lock:
+            if size > self.max_bytes:
+                return False
+            if versions != tuple(self._versions.get(table, 0) for table in entry['tables']):
+                return False
+            if key in self._entries:
+                self._remove(key)
+            entry['size'] = size
+            self._entries[key] = entry
+            self._bytes += size
+            self.stats['stores'] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+            return True
+
+    def invalidate(self, table_name):
+        """Supprime les entrées qui dépendent d'une table ; retourne leur nombre"""
+        with self._lock:
+            self._versions[table_name] = self._versions.get(table_name, 0) + 1
+            keys = [key for key, entry in self._entries.items() if table_name in entry['tables']]
+            for key in keys:
+                self._remove(key)
+            self.stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def join(self, key):
+        """
+        Rejoint le calcul en cours pour une clé
+
+        Retourne (future, leader) : leader vaut True si l'appelant doit
+        calculer la réponse puis appeler leave().
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def leave(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def wait(self, future):
+        """Résultat du calcul mené par une autre requête (ou son exception)"""
+        try:
+            return future.result(self.wait_timeout)
+        except FutureTimeout:
+            self.stats['wait_timeouts'] += 1
+            raise CacheWaitTimeout('Calcul identique en cours, réessayer plus tard')
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return count
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+
+    def status(self):
+        """Occupation et compteurs pour l'administration"""
+        with self._lock:
+            by_endpoint = {}
+            for key in self._entries:
+                by_endpoint[key[0]] = by_endpoint.get(key[0], 0) + 1
+            return dict(
+                self.stats,
+                enabled=self.enabled,
+                entries=len(self._entries),
+                inflight=len(self._inflight),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                by_endpoint=by_endpoint
+            )
+
+
+response_cache = ResponseCache()
+
+
+@tables_changed.connect
+def _on_tables_changed(sender):
+    response_cache.invalidate(sender)
+
+
+def cached(ttl, tables, snap=None):
+    """
+    Met en cache les réponses 200 d'une route GET et coalesce les requêtes
+    identiques simultanées
+
+    ttl : durée de vie en secondes ; tables : tables lues par la route ;
+    snap : largeur (secondes) du bucket de l'instant courant, pour les
+    routes dont la plage est relative à maintenant.
+    """
+    tables = tuple(tables)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = cache_key(snap)
+            entry = response_cache.get(key)
+            if entry is not None:
+                return _entry_response(entry, 'HIT')
+
+            future, leader = response_cache.join(key)
+            if not leader:
+                return _entry_response(response_cache.wait(future), 'COALESCED')
+
+            try:
+                versions = response_cache.versions(tables)
+                response = current_app.make_response(view(*args, **kwargs))
+                entry = None
+                if not response.is_streamed:
+                    entry = {
+                        'body': response.get_data(),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'tables': tables,
+                        'expires': time.monotonic() + ttl
+                    }
+                    if response.status_code == 200:
+                        response_cache.put(key, dict(entry), versions)
+                # Les réponses d'erreur sont partagées avec les requêtes en attente, sans être conservées
+                future.set_result(entry)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                response_cache.leave(key, future)
+
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _entry_response(entry, cache_status):
+    if entry is None:
+        # Réponse en flux : elle ne peut pas être rejouée pour les requêtes en attente
+        raise CacheWaitTimeout('Réponse non partageable, réessayer')
+    response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['X-Cache'] = cache_status
+    return response
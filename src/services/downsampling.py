@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Rééchantillonnage des séries temporelles sur une grille régulière
+
+Chaque cellule de la grille contient la moyenne, le minimum et le maximum
+des échantillons qu'elle couvre : les pics restent visibles même avec
+peu de points. Les cellules sans donnée sont renvoyées comme marqueurs
+de trou explicites.
+
+Le regroupement est fait en SQL (une ligne par cellule), depuis le rollup
+le plus grossier aligné sur le pas de la grille ou depuis la table brute ;
+les échantillons des mois archivés sont ajoutés à leurs cellules. Seuls
+les buckets entièrement compris dans la plage sont lus dans le rollup :
+les bordures (début et fin de plage au milieu d'un bucket) sont lues dans
+la table brute, comme pour rollup_windows.
+
+Les cellules sont alignées sur des multiples du pas depuis l'epoch Unix ;
+les cellules d'une ou plusieurs semaines commencent le lundi à 00:00 UTC
+(semaines ISO 8601). Le nombre de cellules, première cellule partielle
+comprise, ne dépasse jamais max_points.
+"""
+import math
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, and_, cast, func, or_, select
+from src.models.metrics import db, SystemMetrics, ROLLUP_RESOLUTIONS, system_metrics_rollups
+from src.services.archive import metrics_archive
+from src.services.partitions import partitioned_source
+from src.services.rollups import EPOCH, ceil_bucket, floor_bucket
+
+# Pas "ronds" proposés lorsque seul max_points est fourni (secondes)
+NICE_STEPS = [
+    1, 5, 10, 15, 30,
+    60, 300, 600, 900, 1800,
+    3600, 7200, 10800, 21600, 43200,
+    86400, 604800
+]
+
+MAX_GRID_POINTS = 10000
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+WEEK = 604800
+
+# Lundi 5 janvier 1970 : origine des cellules d'une ou plusieurs semaines
+WEEK_ORIGIN = EPOCH + timedelta(days=4)
+
+
+def parse_resolution(value):
+    """
+    Convertit une résolution ('30s', '5m', '1h', '1d' ou minute|hour|day)
+    en secondes
+    """
+    if value in ROLLUP_RESOLUTIONS:
+        return ROLLUP_RESOLUTIONS[value]
+
+    match = re.fullmatch(r'(\d+)([smhdw])', value or '')
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f'Résolution invalide: {value}')
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+def choose_step(date_start, date_end, max_points=None, resolution=None):
+    """
+    Détermine le pas de la grille en secondes
+
+    max_points plafonne le nombre de cellules ; resolution impose un pas
+    minimal. Retourne None si aucun rééchantillonnage n'est demandé.
+    """
+    if max_points is None and resolution is None:
+        return None
+
+    span = max(((date_end or datetime.utcnow()) - date_start).total_seconds(), 1)
+    step = parse_resolution(resolution) if resolution is not None else 1
+
+    if max_points is not None:
+        if max_points <= 0:
+            raise ValueError('max_points doit être positif')
+        needed = math.ceil(span / max_points)
+        if needed > step:
+            step = next((nice for nice in NICE_STEPS if nice >= needed), needed)
+        # La première cellule commence avant date_start : un pas plus grand
+        # peut être nécessaire pour rester dans max_points
+        while grid_cell_count(date_start, date_end, step) > max_points:
+            step = next((nice for nice in NICE_STEPS if nice > step), step + needed)
+
+    if span / step > MAX_GRID_POINTS:
+        raise ValueError(f'Résolution trop fine: plus de {MAX_GRID_POINTS} points')
+    return step
+
+
+def grid_start(date_start, step):
+    """Début de la cellule de pas step (secondes) contenant date_start"""
+    origin = WEEK_ORIGIN if step % WEEK == 0 else EPOCH
+    seconds = (date_start - origin) // timedelta(seconds=1)
+    return origin + timedelta(seconds=seconds - seconds % step)
+
+
+def grid_cell_count(date_start, date_end, step):
+    """Nombre de cellules de la grille couvrant [date_start, date_end]"""
+    date_end = date_end or datetime.utcnow()
+    return int((date_end - grid_start(date_start, step)).total_seconds() // step) + 1
+
+
+def _epoch_seconds(column):
+    return cast(func.strftime('%s', column), Integer)
+
+
+def _add_to_cell(cells, index, count, total, minimum, maximum):
+    cell = cells.setdefault(index, [0, None, None, None])
+    cell[0] += count
+    if total is not None:
+        cell[1] = total if cell[1] is None else cell[1] + total
+    if minimum is not None:
+        cell[2] = minimum if cell[2] is None else min(cell[2], minimum)
+    if maximum is not None:
+        cell[3] = maximum if cell[3] is None else max(cell[3], maximum)
+
+
+def _raw_cells(cells, field, ranges, grid_origin, step):
+    """
+    Ajoute aux cellules {index: [count, sum, min, max]} les échantillons
+    bruts (table et mois archivés) des plages [début, fin] données
+    """
+    table = partitioned_source(
+        SystemMetrics.__tablename__,
+        min(start for start, _ in ranges),
+        max(end for _, end in ranges)
+    )
+    column = table.c[field]
+    cell = ((_epoch_seconds(table.c.timestamp) - grid_origin) // step).label('cell')
+    rows = db.session.execute(
+        select(cell, func.count(column), func.sum(column), func.min(column), func.max(column))
+        .where(or_(*[
+            and_(table.c.timestamp >= start, table.c.timestamp <= end) for start, end in ranges
+        ]))
+        .group_by(cell)
+    ).all()
+    for row in rows:
+        _add_to_cell(cells, *row)
+
+    for start, end in ranges:
+        samples = metrics_archive.samples([field], start, end)
+        for timestamp, value in zip(samples['timestamp'], samples[field]):
+            index = ((timestamp - EPOCH) // timedelta(seconds=1) - grid_origin) // step
+            _add_to_cell(cells, index, int(value is not None), value, value, value)
+
+
+def grid_series(field, date_start, date_end, step):
+    """
+    Série d'un champ rééchantillonnée sur une grille de pas step (secondes)
+
+    Retourne (source, cellules) ; source vaut 'raw' ou le nom du rollup lu.
+    Chaque cellule est un dict {timestamp, value, min, max} ou un trou
+    {timestamp, value: None, min: None, max: None, gap: True}.
+    """
+    date_end = date_end or datetime.utcnow()
+    first_cell = grid_start(date_start, step)
+    grid_origin = int((first_cell - EPOCH).total_seconds())
+
+    # Rollup le plus grossier dont les buckets tombent entièrement dans une cellule
+    aligned = [
+        (width, name) for name, width in ROLLUP_RESOLUTIONS.items()
+        if width <= step and step % width == 0
+    ]
+    if aligned:
+        width, source = max(aligned)
+        inner_start, inner_end = ceil_bucket(date_start, width), floor_bucket(date_end, width)
+        if inner_start >= inner_end:
+            # Aucun bucket complet dans la plage
+            aligned = []
+
+    cells = {}
+    if aligned:
+        table = system_metrics_rollups
+        cell = ((_epoch_seconds(table.c.bucket_start) - grid_origin) // step).label('cell')
+        rows = db.session.execute(
+            select(
+                cell,
+                func.sum(table.c[f'{field}_count']),
+                func.sum(table.c[f'{field}_sum']),
+                func.min(table.c[f'{field}_min']),
+                func.max(table.c[f'{field}_max'])
+            ).where(
+                table.c.resolution == source,
+                table.c.bucket_start >= inner_start,
+                table.c.bucket_start < inner_end,
+                table.c.sample_count > 0
+            ).group_by(cell)
+        ).all()
+        for row in rows:
+            _add_to_cell(cells, *row)
+        # Bordures hors des buckets complets
+        ranges = [(inner_end, date_end)]
+        if date_start < inner_start:
+            ranges.insert(0, (date_start, inner_start - timedelta(microseconds=1)))
+        _raw_cells(cells, field, ranges, grid_origin, step)
+    else:
+        source = 'raw'
+        _raw_cells(cells, field, [(date_start, date_end)], grid_origin, step)
+
+    filled = {
+        index: (total / count if total is not None else None, minimum, maximum)
+        for index, (count, total, minimum, maximum) in cells.items() if count
+    }
+
+    cells = []
+    for index in range(grid_cell_count(date_start, date_end, step)):
+        timestamp = first_cell + timedelta(seconds=index * step)
+        if index in filled:
+            average, minimum, maximum = filled[index]
+            cells.append({
+                'timestamp': timestamp,
+                'value': average,
+                'min': minimum,
+                'max': maximum
+            })
+        else:
+            cells.append({
+                'timestamp': timestamp,
+                'value': None,
+                'min': None,
+                'max': None,
+                'gap': True
+            })
+
+    return source, cells
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Requêtes conditionnelles (ETag / If-None-Match) pour les routes interrogées
+en boucle par les tableaux de bord
+
+Le validateur d'une réponse est calculé sans exécuter la requête de la
+route, à partir de :
+
+- la clé normalisée de la requête (endpoint, paramètres)
+- le filigrane de chaque table lue : max(id), lu en une seule requête sur
+  la clé primaire (dernier id attribué pour les tables partitionnées),
+  qui révèle les nouvelles lignes, y compris écrites par un autre processus
+- le numéro de version de chaque table, incrémenté par le signal
+  tables_changed (mises à jour et suppressions faites par ce processus)
+- un jeton de démarrage, les versions repartant de zéro à chaque lancement
+
+Si l'en-tête If-None-Match correspond, la route répond 304 sans corps ;
+sinon la réponse 200 porte l'ETag et un Cache-Control avec
+stale-while-revalidate.
+"""
+import hashlib
+import uuid
+from functools import wraps
+from flask import Response, current_app, request
+from sqlalchemy import func, select
+from src.models.user import db
+from src.services.cache import cache_key, response_cache
+from src.services.partitions import PARTITIONED_TABLES, partition_sequences
+
+_BOOT_TOKEN = uuid.uuid4().hex
+
+
+def _watermark(table):
+    if table in PARTITIONED_TABLES:
+        # Les ids des tables partitionnées sont attribués par partition_sequences
+        return select(partition_sequences.c.last_id).where(
+            partition_sequences.c.table_name == table
+        ).scalar_subquery()
+    return select(func.max(db.metadata.tables[table].c.id)).scalar_subquery()
+
+
+def table_watermarks(tables):
+    """max(id) de chaque table, en une seule requête"""
+    columns = [_watermark(table) for table in tables]
+    return tuple(db.session.execute(select(*columns)).one())
+
+
+def compute_etag(tables):
+    """Validateur de la requête courante pour des tables données"""
+    state = (
+        _BOOT_TOKEN,
+        cache_key(),
+        table_watermarks(tables),
+        response_cache.versions(tables)
+    )
+    return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()[:32]
+
+
+def conditional(tables, max_age, stale_while_revalidate):
+    """
+    Ajoute ETag et Cache-Control aux réponses 200 d'une route GET et
+    répond 304 Not Modified lorsque If-None-Match correspond
+
+    tables : tables lues par la route ; max_age et stale_while_revalidate
+    en secondes.
+    """
+    tables = tuple(tables)
+    cache_control = f'max-age={max_age}, stale-while-revalidate={stale_while_revalidate}'
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            etag = compute_etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = cache_control
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Signaux émis lors de l'écriture de lignes en base
+
+Les structures dérivées (rollups, caches, ...) s'abonnent à ces signaux
+plutôt que d'être appelées depuis chaque route qui écrit des données.
+
+- rows_inserted : émis dans la transaction, avec la connexion courante,
+  pour les mises à jour qui doivent être atomiques avec l'insertion
+- rows_committed : émis après le commit, pour les structures en mémoire
+- rows_updated, rows_deleted : émis après le commit avec les valeurs des
+  objets ORM modifiés (colonnes) ou supprimés (clé primaire)
+- rows_invalidated : émis après le commit pour les tables visées par une
+  instruction UPDATE/DELETE exécutée par la session, dont les lignes ne
+  sont pas connues ; les structures en mémoire doivent être relues
+- tables_changed : émis après le commit pour chaque table modifiée
+  (insertion, mise à jour ou suppression, via l'ORM ou une instruction
+  DML exécutée par la session), pour invalider les caches
+
+Les notifications ne sont émises qu'au commit de la transaction
+principale, pas au RELEASE d'un SAVEPOINT. Lors de l'annulation d'un
+SAVEPOINT, son propriétaire rétablit les notifications en attente avec
+snapshot_pending() / restore_pending() (voir services.writer).
+
+L'expéditeur (sender) est toujours le nom de la table concernée.
+"""
+from blinker import Namespace
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_signals = Namespace()
+
+# Notifications en attente du commit, dans session.info
+PENDING_KEYS = ('committed_rows', 'updated_rows', 'deleted_rows', 'invalidated_tables', 'changed_tables')
+
+rows_inserted = _signals.signal('rows-inserted')
+rows_committed = _signals.signal('rows-committed')
+rows_updated = _signals.signal('rows-updated')
+rows_deleted = _signals.signal('rows-deleted')
+rows_invalidated = _signals.signal('rows-invalidated')
+tables_changed = _signals.signal('tables-changed')
+
+
+def row_values(obj):
+    """Valeurs brutes des colonnes d'un objet ORM"""
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def primary_key_values(obj):
+    """Clé primaire d'un objet ORM, sans recharger ses attributs"""
+    columns = [column.key for column in obj.__table__.primary_key]
+    return dict(zip(columns, inspect(obj).identity or ()))
+
+
+def publish_inserted(connection, table_name, rows):
+    """Notifie l'insertion de lignes (appelé dans la transaction)"""
+    if rows:
+        rows_inserted.send(table_name, connection=connection, rows=rows)
+
+
+def publish_committed(table_name, rows):
+    """Notifie que des lignes insérées ont été validées"""
+    if rows:
+        rows_committed.send(table_name, rows=rows)
+
+
+def defer_committed(session, table_name, rows):
+    """Notifie rows_committed lorsque la transaction de la session sera validée"""
+    pending = session.info.setdefault('committed_rows', {})
+    pending.setdefault(table_name, []).extend(rows)
+    mark_changed(session, table_name)
+
+
+def mark_changed(session, table_name):
+    """Notifie tables_changed lorsque la transaction de la session sera validée"""
+    session.info.setdefault('changed_tables', set()).add(table_name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_inserted_rows(session, flush_context):
+    """Relaye les insertions faites via l'ORM (db.session.add)"""
+    inserted = {}
+    for obj in session.new:
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            inserted.setdefault(table.name, []).append(row_values(obj))
+
+    if not inserted:
+        return
+
+    connection = session.connection()
+    for table_name, rows in inserted.items():
+        publish_inserted(connection, table_name, rows)
+
+    for table_name, rows in inserted.items():
+        defer_committed(session, table_name, rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_tables(session, flush_context):
+    """Tables et valeurs des objets ORM modifiés ou supprimés"""
+    for obj in session.dirty:
+        table = getattr(obj, '__table__', None)
+        if table is not None and session.is_modified(obj):
+            _defer(session, 'updated_rows', table.name, row_values(obj))
+    for obj in session.deleted:
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _defer(session, 'deleted_rows', table.name, primary_key_values(obj))
+
+
+def _defer(session, kind, table_name, row):
+    session.info.setdefault(kind, {}).setdefault(table_name, []).append(row)
+    mark_changed(session, table_name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_statement_table(orm_execute_state):
+    """Tables visées par les INSERT/UPDATE/DELETE exécutés par la session"""
+    state = orm_execute_state
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if table is not None:
+            mark_changed(state.session, table.name)
+            if not state.is_insert:
+                state.session.info.setdefault('invalidated_tables', set()).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_rows(session):
+    if session.in_nested_transaction():
+        # RELEASE d'un SAVEPOINT : rien n'est encore validé
+        return
+    pending = session.info.pop('committed_rows', None)
+    for table_name, rows in (pending or {}).items():
+        publish_committed(table_name, rows)
+
+    for table_name, rows in (session.info.pop('updated_rows', None) or {}).items():
+        rows_updated.send(table_name, rows=rows)
+    for table_name, rows in (session.info.pop('deleted_rows', None) or {}).items():
+        rows_deleted.send(table_name, rows=rows)
+    for table_name in sorted(session.info.pop('invalidated_tables', None) or ()):
+        rows_invalidated.send(table_name)
+
+    for table_name in sorted(session.info.pop('changed_tables', None) or ()):
+        tables_changed.send(table_name)
+
+
+def snapshot_pending(session):
+    """Copie des notifications en attente de la session (avant un SAVEPOINT)"""
+    snapshot = {}
+    for key in PENDING_KEYS:
+        pending = session.info.get(key)
+        if pending is None:
+            continue
+        if isinstance(pending, set):
+            snapshot[key] = set(pending)
+        else:
+            snapshot[key] = {table_name: list(rows) for table_name, rows in pending.items()}
+    return snapshot
+
+
+def restore_pending(session, snapshot):
+    """Rétablit les notifications en attente après l'annulation d'un SAVEPOINT"""
+    for key in PENDING_KEYS:
+        session.info.pop(key, None)
+    session.info.update(snapshot)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_rows(session):
+    if session.in_nested_transaction():
+        # Annulation d'un SAVEPOINT : les notifications des travaux précédents
+        # restent dues, celui qui a ouvert le SAVEPOINT rétablit son instantané
+        return
+    for key in PENDING_KEYS:
+        session.info.pop(key, None)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Export en flux des lignes brutes (NDJSON, CSV ou liste JSON)
+
+Les lignes sont lues par lots (yield_per) et sérialisées au fil de l'eau
+par des générateurs : la réponse est envoyée morceau par morceau et la
+mémoire reste constante quel que soit le nombre de lignes exportées.
+
+Les tables partitionnées sont lues partition par partition, dans l'ordre
+chronologique ; pour system_metrics, les mois archivés (voir
+services.archive) sont fusionnés au flux par heapq.merge sur
+(timestamp, id), bloc par bloc.
+
+Avec columns, seules ces colonnes (plus la colonne de temps et l'id,
+nécessaires au tri) sont lues et seules ces colonnes sont exportées.
+"""
+import csv
+import heapq
+import io
+import json
+from datetime import datetime
+from itertools import chain
+from operator import itemgetter
+from sqlalchemy import select
+from src.models.metrics import SystemMetrics, Task, PerformanceHistory
+from src.services.archive import metrics_archive
+from src.services.partitions import PARTITIONED_TABLES, partition_tables
+
+# Lignes lues par lot et sérialisées par morceau de réponse
+EXPORT_CHUNK_SIZE = 1000
+
+# Tables exportables et colonne de temps de leur plage
+EXPORT_TABLES = {
+    SystemMetrics.__tablename__: (SystemMetrics.__table__, 'timestamp'),
+    Task.__tablename__: (Task.__table__, 'created_date'),
+    PerformanceHistory.__tablename__: (PerformanceHistory.__table__, 'timestamp')
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def _table_rows(connection, table, time_column, date_start, date_end, where, chunk_size, columns=None):
+    column = table.c[time_column]
+    criteria = list(where(table)) if where is not None else []
+    if date_start is not None:
+        criteria.append(column >= date_start)
+    if date_end is not None:
+        criteria.append(column <= date_end)
+    if columns is None:
+        statement = select(table)
+    else:
+        names = dict.fromkeys([*columns, time_column, 'id'])
+        statement = select(*[table.c[name] for name in names])
+    result = connection.execution_options(yield_per=chunk_size).execute(
+        statement.where(*criteria).order_by(column, table.c.id)
+    )
+    yield from result.mappings()
+
+
+def iter_rows(connection, table_name, date_start=None, date_end=None, where=None,
+              chunk_size=EXPORT_CHUNK_SIZE, columns=None):
+    """
+    Lignes d'une table (mappings) en ordre chronologique, lues par lots
+
+    where(table) retourne des critères supplémentaires ; les mois archivés
+    ne sont lus que sans where. columns limite les colonnes lues.
+    """
+    table, time_column = EXPORT_TABLES[table_name]
+    if table_name not in PARTITIONED_TABLES:
+        return _table_rows(connection, table, time_column, date_start, date_end, where, chunk_size, columns)
+
+    rows = chain.from_iterable(
+        _table_rows(connection, partition, time_column, date_start, date_end, where, chunk_size, columns)
+        for partition in partition_tables(connection, table_name, date_start, date_end)
+    )
+    if table_name == metrics_archive.table.name and where is None:
+        archived = chain.from_iterable(metrics_archive.row_chunks(date_start, date_end, connection))
+        rows = heapq.merge(archived, rows, key=itemgetter(time_column, 'id'))
+    return rows
+
+
+def export_columns(table_name, columns=None):
+    """Colonnes exportées d'une table (toutes par défaut)"""
+    if columns is not None:
+        return list(columns)
+    return [column.key for column in EXPORT_TABLES[table_name][0].columns]
+
+
+def row_dict(table_name, row, columns=None):
+    """Ligne au format du to_dict du modèle (dates en ISO 8601)"""
+    values = {}
+    for name in export_columns(table_name, columns):
+        value = row[name]
+        values[name] = value.isoformat() if isinstance(value, datetime) else value
+    return values
+
+
+def ndjson_chunks(table_name, rows, chunk_size=EXPORT_CHUNK_SIZE, columns=None):
+    """Un objet JSON par ligne, envoyé par morceaux de chunk_size lignes"""
+    columns = export_columns(table_name, columns)
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row_dict(table_name, row, columns), separators=(',', ':')))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(table_name, rows, chunk_size=EXPORT_CHUNK_SIZE, columns=None):
+    """En-tête puis lignes CSV, envoyées par morceaux de chunk_size lignes"""
+    columns = export_columns(table_name, columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        values = row_dict(table_name, row, columns)
+        writer.writerow([values[column] for column in columns])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def json_list_chunks(items, chunk_size=EXPORT_CHUNK_SIZE):
+    """Corps {"success": true, "data": [...]} produit par morceaux"""
+    yield '{"success":true,"data":['
+    separator = ''
+    batch = []
+    for item in items:
+        batch.append(json.dumps(item, separators=(',', ':')))
+        if len(batch) >= chunk_size:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']}'
+
+
+def export_chunks(connection, table_name, export_format, date_start=None, date_end=None, where=None,
+                  columns=None):
+    """Morceaux de l'export d'une table au format ndjson ou csv"""
+    rows = iter_rows(connection, table_name, date_start, date_end, where, columns=columns)
+    if export_format == 'csv':
+        return csv_chunks(table_name, rows, columns=columns)
+    return ndjson_chunks(table_name, rows, columns=columns)
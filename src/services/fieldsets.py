@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Sélection des champs d'une réponse (paramètre fields=)
+
+Les listes sérialisaient toutes les colonnes de chaque modèle (lecture,
+hydratation ORM, formatage ISO 8601 des dates et encodage JSON), alors que
+certains clients n'en affichent que quelques-unes. Avec
+
+    ?fields=volunteer_id,name,tasks_completed
+    ?fields=id,earned_date,badge.name,badge.icon
+
+seules les colonnes demandées sont lues (load_only pour les requêtes ORM,
+select des seules colonnes pour les exports) et seules ces clés sont
+émises par to_dict(fields=...).
+
+Un chemin « relation.champ » sélectionne des champs du modèle lié (badge
+d'une attribution) ; « relation » seul émet le modèle lié complet. Une
+relation non demandée n'est ni jointe ni chargée. Un champ inconnu est
+refusé (ValueError, réponse 400).
+"""
+from sqlalchemy.orm import joinedload, lazyload, load_only
+
+
+def parse_fields(value):
+    """'id,badge.name' -> {'id': None, 'badge': {'name': None}} ; None si absent"""
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        parts = path.strip().split('.')
+        if not parts[-1]:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                # Le modèle lié complet est déjà demandé
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    if not tree:
+        raise ValueError('fields ne contient aucun champ')
+    return tree
+
+
+class Fieldset:
+    """Champs demandés d'un modèle et de ses relations"""
+
+    def __init__(self, model, tree, relations=None):
+        self.model = model
+        self.relations = relations or {}
+        columns = set(model.__table__.columns.keys())
+        self.fields = {}
+        for name, subtree in tree.items():
+            if name in self.relations:
+                related = self.relations[name]
+                self.fields[name] = None if subtree is None else Fieldset(related, subtree)
+            elif name in columns and subtree is None:
+                self.fields[name] = None
+            else:
+                raise ValueError(f'Champ inconnu pour {model.__tablename__} : {name}')
+
+    @property
+    def columns(self):
+        """Colonnes du modèle à lire"""
+        return [name for name in self.fields if name not in self.relations]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def load_options(self, *required):
+        """Options de chargement ORM : colonnes demandées (et required), relations demandées"""
+        model = self.model
+        names = list(dict.fromkeys(self.columns + [column.key for column in required]))
+        options = [load_only(*[getattr(model, name) for name in names])]
+        for name in self.relations:
+            attribute = getattr(model, name)
+            if name not in self.fields:
+                options.append(lazyload(attribute))
+            elif self.fields[name] is None:
+                options.append(joinedload(attribute))
+            else:
+                related = self.fields[name]
+                options.append(joinedload(attribute).load_only(
+                    *[getattr(related.model, column) for column in related.columns]
+                ))
+        return options
+
+
+def fields_argument(args, model, relations=None):
+    """Fieldset du paramètre fields, ou None pour tous les champs"""
+    tree = parse_fields(args.get('fields'))
+    if tree is None:
+        return None
+    return Fieldset(model, tree, relations)
+
+
+def apply_fieldset(query, fieldset, *required):
+    """Restreint une requête ORM aux colonnes d'un Fieldset (None : inchangée)"""
+    if fieldset is None:
+        return query
+    return query.options(*fieldset.load_options(*required))
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestion en masse de métriques système
+
+Les échantillons sont validés un par un puis insérés par lots avec une
+seule instruction INSERT multi-lignes par partition mensuelle, sans passer
+par l'unité de travail de l'ORM. Chaque lot est un travail de la file
+d'écriture (SAVEPOINT propre, validé avec les autres écritures du moment).
+"""
+import json
+import math
+from datetime import datetime, timezone
+from itertools import islice
+from src.models.metrics import db, SystemMetrics, ROLLUP_FIELDS
+from src.services.events import defer_committed, publish_inserted
+from src.services.partitions import insert_rows
+from src.services.writer import WriterBusy, writer
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Nombre maximal d'erreurs de validation détaillées dans la réponse
+MAX_REPORTED_ERRORS = 100
+
+# Plus grand entier stocké par SQLite (INTEGER sur 64 bits)
+MAX_INTEGER = 2 ** 63 - 1
+
+# Champs exprimés en pourcentage
+PERCENT_FIELDS = ('cpu_usage', 'memory_usage')
+
+
+def parse_timestamp(value):
+    """Timestamp ISO 8601 ou epoch (secondes) converti en datetime UTC naïf"""
+    if value is None:
+        return datetime.utcnow()
+    if isinstance(value, bool):
+        raise ValueError('timestamp invalide')
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError('timestamp invalide')
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+        except (OverflowError, OSError):
+            # Epoch hors de la plage de time_t ou de datetime
+            raise ValueError('timestamp hors limites')
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    raise ValueError('timestamp invalide')
+
+
+def validate_sample(raw):
+    """
+    Valide un échantillon brut et le convertit en ligne system_metrics
+
+    Lève ValueError avec un message explicite si l'échantillon est invalide.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('un échantillon doit être un objet JSON')
+
+    unknown = set(raw) - set(ROLLUP_FIELDS) - {'timestamp'}
+    if unknown:
+        raise ValueError(f'champs inconnus: {", ".join(sorted(unknown))}')
+
+    row = {'timestamp': parse_timestamp(raw.get('timestamp'))}
+    for field, column_type in ROLLUP_FIELDS.items():
+        value = raw.get(field, 0)
+        if value is None:
+            value = 0
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f'{field} doit être numérique')
+        if isinstance(value, float) and not math.isfinite(value):
+            # NaN et Infinity : ni stockables en entier ni émis en JSON valide
+            raise ValueError(f'{field} doit être un nombre fini')
+        if isinstance(value, int) and abs(value) > MAX_INTEGER:
+            raise ValueError(f'{field} hors limites')
+        if column_type is db.Integer:
+            if int(value) != value:
+                raise ValueError(f'{field} doit être un entier')
+            value = int(value)
+        else:
+            value = float(value)
+        if value < 0:
+            raise ValueError(f'{field} doit être positif')
+        if field in PERCENT_FIELDS and value > 100:
+            raise ValueError(f'{field} doit être compris entre 0 et 100')
+        row[field] = value
+    return row
+
+
+def iter_payload(content_type, body_stream, get_json):
+    """
+    Itère sur les échantillons d'une requête
+
+    Accepte un tableau JSON, un objet unique ou un flux NDJSON
+    (application/x-ndjson), lu ligne par ligne.
+    """
+    if content_type and 'ndjson' in content_type:
+        for line in body_stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield ValueError('ligne NDJSON invalide')
+        return
+
+    payload = get_json(silent=True)
+    if payload is None:
+        raise ValueError('Corps JSON invalide ou absent')
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        raise ValueError('Le corps doit être un tableau d\'échantillons')
+    yield from payload
+
+
+def insert_chunk(rows):
+    """
+    Insère un lot via la file d'écriture et retourne le nombre de lignes
+
+    Les ids créés sont ajoutés aux lignes.
+    """
+    table = SystemMetrics.__table__
+
+    def job(session):
+        connection = session.connection()
+        insert_rows(connection, table.name, rows)
+        publish_inserted(connection, table.name, rows)
+        defer_committed(session, table.name, rows)
+        return len(rows)
+
+    return writer.run(job)
+
+
+def ingest_samples(samples, chunk_size=DEFAULT_CHUNK_SIZE, insert=insert_chunk):
+    """
+    Valide et insère des échantillons par lots
+
+    Retourne un rapport : nombre reçu / inséré / rejeté, erreurs de
+    validation et résultat de chaque lot.
+    """
+    report = {
+        'received': 0,
+        'inserted': 0,
+        'rejected': 0,
+        'errors': [],
+        'chunks': []
+    }
+
+    iterator = iter(samples)
+    index = 0
+    while True:
+        raw_chunk = list(islice(iterator, chunk_size))
+        if not raw_chunk:
+            break
+
+        rows = []
+        for raw in raw_chunk:
+            try:
+                if isinstance(raw, Exception):
+                    raise raw
+                rows.append(validate_sample(raw))
+            except ValueError as e:
+                report['rejected'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'index': index, 'error': str(e)})
+            index += 1
+
+        report['received'] += len(raw_chunk)
+        chunk_report = {
+            'chunk': len(report['chunks']),
+            'first_index': index - len(raw_chunk),
+            'size': len(raw_chunk),
+            'valid': len(rows),
+            'inserted': 0,
+            'status': 'empty'
+        }
+        if rows:
+            try:
+                chunk_report['inserted'] = insert(rows)
+                chunk_report['status'] = 'committed'
+                report['inserted'] += chunk_report['inserted']
+            except WriterBusy as e:
+                chunk_report['status'] = 'busy'
+                chunk_report['error'] = str(e)
+            except Exception as e:
+                chunk_report['status'] = 'failed'
+                chunk_report['error'] = str(e)
+        report['chunks'].append(chunk_report)
+
+    return report
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Score composite du classement des volontaires, calculé par SQLite
+
+Le classement chargeait tous les volontaires, calculait le score en Python
+puis triait la liste entière pour n'en garder que 50. Le score est
+désormais une expression SQL (somme pondérée de colonnes de volunteers)
+indexée par un index sur expression, l'équivalent SQLite d'une colonne
+générée indexée :
+
+    CREATE INDEX ix_volunteers_leaderboard_score
+    ON volunteers ((tasks_completed * 0.4 + ...) DESC, id)
+
+ORDER BY score DESC, id LIMIT n lit alors les n premières entrées de
+l'index, sans tri ni parcours de la table. Le planificateur ne reconnaît
+l'expression que si elle est identique à celle de l'index : les poids
+sont donc écrits en littéraux (et non en paramètres liés), avec la même
+mise en forme dans l'index et dans les requêtes.
+
+Le classement d'une période (voir services.period_stats) utilise le même
+score sur l'activité de la période (tâches, taux de réussite en %, heures
+de calcul), indexé de la même façon dans volunteer_period_stats.
+
+Les poids sont propres à chaque déploiement. Au démarrage, init_app()
+compare la définition des index à celle des poids configurés et les
+reconstruit s'ils ont changé.
+
+Configuration (app.config) :
+- LEADERBOARD_WEIGHTS : {colonne de volunteers: poids}
+"""
+from sqlalchemy import literal_column, text
+from src.models.metrics import db, Volunteer, volunteer_period_stats
+
+DEFAULT_WEIGHTS = {
+    'tasks_completed': 0.4,
+    'performance_score': 0.3,
+    'total_computation_time': 0.3
+}
+
+# Colonnes numériques utilisables dans le score
+SCORE_COLUMNS = ('tasks_completed', 'performance_score', 'total_computation_time', 'cpu_cores', 'memory_gb')
+
+# Colonne de volunteer_period_stats équivalente sur une période ; les
+# autres colonnes n'entrent pas dans le score par période
+PERIOD_SCORE_COLUMNS = {
+    'tasks_completed': 'tasks_done',
+    'performance_score': 'success_rate',
+    'total_computation_time': 'compute_hours'
+}
+
+LEADERBOARD_INDEX = 'ix_volunteers_leaderboard_score'
+
+PERIOD_LEADERBOARD_INDEX = 'ix_volunteer_period_stats_score'
+
+
+def leaderboard_weights(app_config):
+    """Poids configurés, validés (ordre des colonnes conservé)"""
+    weights = app_config.get('LEADERBOARD_WEIGHTS', DEFAULT_WEIGHTS)
+    if not weights:
+        raise ValueError('LEADERBOARD_WEIGHTS ne contient aucune colonne')
+    unknown = sorted(set(weights) - set(SCORE_COLUMNS))
+    if unknown:
+        raise ValueError(f'Colonnes de score inconnues : {", ".join(unknown)}')
+    return {column: float(weight) for column, weight in weights.items()}
+
+
+def _literal(weight):
+    return repr(float(weight))
+
+
+def _score_expression(table, weights):
+    terms = [table.c[column] * literal_column(_literal(weight)) for column, weight in weights.items()]
+    score = terms[0]
+    for term in terms[1:]:
+        score = score + term
+    return score
+
+
+def _score_sql(weights):
+    return ' + '.join(f'{column} * {_literal(weight)}' for column, weight in weights.items())
+
+
+class VolunteerLeaderboard:
+    """Expressions du score composite et index qui les couvrent"""
+
+    def __init__(self, weights=None):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+
+    def init_app(self, app):
+        """Applique les poids de l'application et (re)crée les index du score"""
+        self.weights = leaderboard_weights(app.config)
+        with app.app_context():
+            with db.engine.begin() as connection:
+                self.ensure_index(connection)
+
+    @property
+    def period_weights(self):
+        """Poids du score par période (colonnes de volunteer_period_stats)"""
+        weights = {
+            PERIOD_SCORE_COLUMNS[column]: weight
+            for column, weight in self.weights.items() if column in PERIOD_SCORE_COLUMNS
+        }
+        return weights or {'tasks_done': 1.0}
+
+    @property
+    def score(self):
+        """Expression SQL du score composite"""
+        return _score_expression(Volunteer.__table__, self.weights)
+
+    @property
+    def period_score(self):
+        """Expression SQL du score composite sur l'activité d'une période"""
+        return _score_expression(volunteer_period_stats, self.period_weights)
+
+    def index_statements(self):
+        """Instructions de création des index de score, par nom d'index"""
+        return {
+            LEADERBOARD_INDEX: (
+                f'CREATE INDEX {LEADERBOARD_INDEX} ON volunteers '
+                f'(({_score_sql(self.weights)}) DESC, id)'
+            ),
+            PERIOD_LEADERBOARD_INDEX: (
+                f'CREATE INDEX {PERIOD_LEADERBOARD_INDEX} ON volunteer_period_stats '
+                f'(period, bucket_start, ({_score_sql(self.period_weights)}) DESC, volunteer_id)'
+            )
+        }
+
+    def ensure_index(self, connection):
+        """Crée les index du score, ou les reconstruit si les poids ont changé ; True si modifié"""
+        changed = False
+        for name, expected in self.index_statements().items():
+            current = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :name"),
+                {'name': name}
+            ).scalar()
+            if current == expected:
+                continue
+            if current is not None:
+                connection.execute(text(f'DROP INDEX {name}'))
+            connection.execute(text(expected))
+            changed = True
+        return changed
+
+
+volunteer_leaderboard = VolunteerLeaderboard()
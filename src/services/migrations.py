@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Migrations de schéma versionnées
+
+db.create_all() crée les tables manquantes mais ne modifie jamais une table
+existante : les index ajoutés aux modèles n'apparaissent donc pas dans les
+bases déjà en service. Chaque migration est une fonction appliquée une seule
+fois, dans sa propre transaction, et enregistrée dans schema_migrations.
+
+Pour ajouter une migration : écrire une fonction migration(connection) et
+l'ajouter en fin de MIGRATIONS avec le numéro de version suivant. Une
+migration déjà publiée ne doit plus être modifiée.
+"""
+from datetime import datetime
+from sqlalchemy import func, select, text
+from src.models.metrics import db
+from src.services.rollups import ROLLUP_FIELDS, rebuild_rollups, system_metrics_rollups
+from src.services.sketches import rebuild_sketches, quantile_sketches
+from src.services.alerts import seed_default_rules
+from src.services.partitions import PARTITIONED_TABLES, migrate_to_partitions
+from src.services.period_stats import rebuild_period_stats, volunteer_period_stats
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False, default=datetime.utcnow)
+)
+
+
+def _index_hot_filter_columns(connection):
+    """Index des colonnes filtrées par les routes /performance/* et /badges/*"""
+    statements = [
+        'CREATE INDEX IF NOT EXISTS ix_system_metrics_timestamp '
+        'ON system_metrics (timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_tasks_created_date ON tasks (created_date)',
+        'CREATE INDEX IF NOT EXISTS ix_tasks_status ON tasks (status)',
+        'CREATE INDEX IF NOT EXISTS ix_tasks_created_date_status '
+        'ON tasks (created_date, status)',
+        'CREATE INDEX IF NOT EXISTS ix_tasks_status_completed_date '
+        'ON tasks (status, completed_date)',
+        'CREATE INDEX IF NOT EXISTS ix_tasks_status_execution_time '
+        'ON tasks (status, execution_time)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_status ON volunteers (status)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_last_seen ON volunteers (last_seen)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_joined_date ON volunteers (joined_date)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_status_last_seen '
+        'ON volunteers (status, last_seen)',
+        'CREATE INDEX IF NOT EXISTS ix_performance_history_timestamp '
+        'ON performance_history (timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_performance_history_volunteer_timestamp '
+        'ON performance_history (volunteer_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteer_badges_revoked_earned_date '
+        'ON volunteer_badges (revoked, earned_date)',
+        # Statistiques pour le planificateur de requêtes
+        'ANALYZE'
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def _backfill_rollups(connection):
+    """Construit les rollups des métriques déjà présentes"""
+    has_rollups = connection.execute(
+        select(system_metrics_rollups.c.id).limit(1)
+    ).first()
+    if not has_rollups:
+        rebuild_rollups(connection)
+
+
+def _incremental_auto_vacuum(connection):
+    """
+    Passe la base en auto_vacuum=INCREMENTAL pour que la rétention puisse
+    rendre les pages libérées (PRAGMA incremental_vacuum). Le mode ne
+    s'applique à une base existante qu'après un VACUUM complet, exécuté une
+    seule fois ici.
+    """
+    if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+
+
+def _backfill_sketches(connection):
+    """Construit les sketches de quantiles des données déjà présentes"""
+    has_sketches = connection.execute(
+        select(quantile_sketches.c.id).limit(1)
+    ).first()
+    if not has_sketches:
+        rebuild_sketches(connection)
+
+
+def _seed_alert_rules(connection):
+    """Crée les règles d'alerte par défaut et leurs incidents historiques"""
+    seed_default_rules(connection)
+
+
+def _partition_time_series(connection):
+    """Déplace les séries temporelles brutes dans des partitions mensuelles"""
+    for table_name in PARTITIONED_TABLES:
+        migrate_to_partitions(connection, table_name)
+
+
+def _backfill_period_stats(connection):
+    """Agrège l'historique déjà présent par volontaire et par période"""
+    has_stats = connection.execute(
+        select(volunteer_period_stats.c.id).limit(1)
+    ).first()
+    if not has_stats:
+        rebuild_period_stats(connection)
+
+
+
+def _index_keyset_pagination(connection):
+    """Index des pages de /tasks filtrées par statut (pagination par curseur)"""
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_tasks_status_created_date '
+        'ON tasks (status, created_date)'
+    ))
+    # Statistiques utilisées par les totaux estimés
+    connection.execute(text('ANALYZE'))
+
+
+def _rollup_field_counts(connection):
+    """
+    Ajoute aux rollups le nombre de valeurs non NULL de chaque champ, puis
+    les reconstruit : sample_count compte aussi les échantillons NULL
+    """
+    existing = {
+        row[1] for row in connection.exec_driver_sql(
+            f'PRAGMA table_info({system_metrics_rollups.name})'
+        )
+    }
+    missing = [field for field in ROLLUP_FIELDS if f'{field}_count' not in existing]
+    for field in missing:
+        connection.exec_driver_sql(
+            f'ALTER TABLE {system_metrics_rollups.name} '
+            f'ADD COLUMN {field}_count INTEGER NOT NULL DEFAULT 0'
+        )
+    if missing:
+        rebuild_rollups(connection)
+
+
+MIGRATIONS = [
+    (1, 'index_hot_filter_columns', _index_hot_filter_columns),
+    (2, 'backfill_rollups', _backfill_rollups),
+    (3, 'incremental_auto_vacuum', _incremental_auto_vacuum),
+    (4, 'backfill_quantile_sketches', _backfill_sketches),
+    (5, 'seed_alert_rules', _seed_alert_rules),
+    (6, 'partition_time_series', _partition_time_series),
+    (7, 'backfill_volunteer_period_stats', _backfill_period_stats),
+    (8, 'index_keyset_pagination', _index_keyset_pagination),
+    (9, 'rollup_field_counts', _rollup_field_counts)
+]
+
+
+def current_version(connection):
+    """Dernière version de schéma appliquée (0 si aucune)"""
+    return connection.execute(
+        select(func.coalesce(func.max(schema_migrations.c.version), 0))
+    ).scalar()
+
+
+def run_migrations(engine=None):
+    """
+    Applique les migrations en attente, dans l'ordre des versions
+
+    Retourne la liste des versions appliquées.
+    """
+    engine = engine or db.engine
+    schema_migrations.create(engine, checkfirst=True)
+
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        with engine.begin() as connection:
+            if version <= current_version(connection):
+                continue
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+
+def migration_status(connection):
+    """Migrations appliquées et en attente"""
+    rows = connection.execute(
+        select(schema_migrations).order_by(schema_migrations.c.version)
+    ).mappings().all()
+    applied = {row['version']: row for row in rows}
+
+    return [
+        {
+            'version': version,
+            'name': name,
+            'applied': version in applied,
+            'applied_at': applied[version]['applied_at'].isoformat() if version in applied else None
+        } for version, name, _ in MIGRATIONS
+    ]
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Pagination par curseur (keyset) des listes
+
+Les listes paginées par limit/offset relisaient toutes les lignes qui
+précèdent la page (O(offset) dans SQLite) et recomptaient la table
+entière à chaque page. Une page est désormais lue à partir de la clé de
+tri de la dernière ligne de la page précédente :
+
+    WHERE (earned_date, id) < (:earned_date, :id)
+    ORDER BY earned_date DESC, id DESC
+    LIMIT :limit + 1
+
+Avec un index sur la colonne de tri (l'id, rowid de SQLite, y est inclus
+implicitement), chaque page est une lecture de l'index à partir de la
+position du curseur, quelle que soit sa profondeur. La ligne
+supplémentaire indique s'il reste des lignes après la page.
+
+Le curseur est opaque pour les clients : JSON encodé en base64url
+contenant la clé de tri, l'id et une empreinte de la liste (route et
+filtres). Un curseur présenté avec d'autres filtres est refusé.
+
+Le total est facultatif (paramètre total) :
+- none (défaut) : pas de comptage
+- exact : count(*) sur les filtres de la liste
+- estimate : comptage exact borné à ESTIMATE_EXACT_LIMIT lignes, puis
+  estimation à partir des statistiques du planificateur (sqlite_stat1,
+  mises à jour par ANALYZE) pour les filtres d'égalité indexés
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+from sqlalchemy import func, select, text, tuple_
+from src.models.metrics import db
+
+DEFAULT_PAGE_SIZE = 50
+
+MAX_PAGE_SIZE = 1000
+
+TOTAL_MODES = ('none', 'exact', 'estimate')
+
+# Au-delà, le total en mode estimate provient des statistiques
+ESTIMATE_EXACT_LIMIT = 1000
+
+
+def _fingerprint(scope, filters):
+    state = json.dumps([scope, filters], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(state.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(scope, filters, sort_value, row_id):
+    """Curseur opaque positionné après la ligne (sort_value, row_id)"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = {'f': _fingerprint(scope, filters), 'k': sort_value, 'i': row_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, scope, filters, sort_column=None):
+    """(clé de tri, id) d'un curseur ; ValueError s'il est invalide pour cette liste"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort_value, row_id = payload['k'], int(payload['i'])
+        fingerprint = payload['f']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError('Curseur de pagination invalide')
+    if fingerprint != _fingerprint(scope, filters):
+        raise ValueError('Curseur de pagination invalide pour ces filtres')
+    if sort_column is not None and sort_value is not None and sort_column.type.python_type is datetime:
+        sort_value = datetime.fromisoformat(sort_value)
+    return sort_value, row_id
+
+
+def page_size_argument(args, default=DEFAULT_PAGE_SIZE):
+    """Taille de page demandée (paramètre limit), bornée à MAX_PAGE_SIZE"""
+    value = args.get('limit')
+    if value is None:
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit doit être supérieur à 0')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def total_mode_argument(args, default='none'):
+    """Mode de calcul du total demandé (paramètre total)"""
+    mode = args.get('total', default)
+    if mode not in TOTAL_MODES:
+        raise ValueError(f'total invalide. Valeurs acceptées: {", ".join(TOTAL_MODES)}')
+    return mode
+
+
+def _table_statistics(table_name):
+    """(nombre de lignes, {première colonne d'index: lignes par valeur}) d'après sqlite_stat1"""
+    connection = db.session.connection()
+    if not connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    ).first():
+        return None, {}
+    row_count = None
+    per_value = {}
+    for index_name, stat in connection.execute(
+        text('SELECT idx, stat FROM sqlite_stat1 WHERE tbl = :table'), {'table': table_name}
+    ):
+        numbers = [int(part) for part in stat.split() if part.isdigit()]
+        if not numbers:
+            continue
+        row_count = numbers[0]
+        if index_name and len(numbers) > 1:
+            first = connection.exec_driver_sql(f'PRAGMA index_info("{index_name}")').first()
+            if first is not None:
+                per_value.setdefault(first[2], numbers[1])
+    return row_count, per_value
+
+
+def estimate_rows(table, filters):
+    """Estimation du nombre de lignes de table vérifiant des filtres d'égalité"""
+    row_count, per_value = _table_statistics(table.name)
+    if row_count is None:
+        # Pas de statistiques : dernier id attribué
+        return db.session.execute(select(func.max(table.c.id))).scalar() or 0
+    estimate = float(row_count)
+    for column in filters:
+        if column in per_value and row_count:
+            estimate *= per_value[column] / row_count
+    return int(round(estimate))
+
+
+def count_rows(query, mode, table=None, filters=None):
+    """(total, estimé) des lignes d'une requête, ou (None, False) en mode none"""
+    if mode == 'none':
+        return None, False
+    query = query.order_by(None)
+    if mode == 'exact':
+        return query.count(), False
+    bounded = db.session.execute(
+        select(func.count()).select_from(query.limit(ESTIMATE_EXACT_LIMIT + 1).subquery())
+    ).scalar()
+    if bounded <= ESTIMATE_EXACT_LIMIT:
+        return bounded, False
+    return max(estimate_rows(table, filters or {}), bounded), True
+
+
+class KeysetPage:
+    """Page d'une liste triée sur (clé de tri, id)"""
+
+    def __init__(self, items, limit, next_cursor, total=None, estimated=False):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.total = total
+        self.estimated = estimated
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def to_dict(self):
+        """Métadonnées de pagination pour JSON"""
+        result = {
+            'limit': self.limit,
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more
+        }
+        if self.total is not None:
+            result['total'] = self.total
+            result['total_estimated'] = self.estimated
+        return result
+
+
+def keyset_page(query, scope, id_column, sort_column=None, descending=True,
+                cursor=None, limit=DEFAULT_PAGE_SIZE, filters=None, total='none'):
+    """
+    Page d'une requête ORM triée sur (sort_column, id_column)
+
+    Sans sort_column, la liste est triée sur l'id seul. scope et filters
+    identifient la liste : un curseur n'est valable que pour les mêmes.
+    limit None lit toute la liste à partir du curseur.
+    """
+    filters = filters or {}
+    columns = [sort_column, id_column] if sort_column is not None else [id_column]
+    total_count, estimated = count_rows(query, total, id_column.table, filters)
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, scope, filters, sort_column)
+        position = [sort_value, row_id] if sort_column is not None else [row_id]
+        if sort_column is not None and sort_value is None:
+            raise ValueError('Curseur de pagination invalide')
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        bound = tuple_(*position) if len(position) > 1 else position[0]
+        query = query.filter(key < bound if descending else key > bound)
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    if limit is not None:
+        query = query.limit(limit + 1)
+    rows = query.all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+        next_cursor = encode_cursor(scope, filters, sort_value, getattr(last, id_column.key))
+    return KeysetPage(rows, limit, next_cursor, total_count, estimated)
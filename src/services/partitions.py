@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Partitionnement mensuel des séries temporelles brutes
+
+system_metrics et performance_history sont découpées en une table par mois
+(system_metrics_p202610, ...) de mêmes colonnes et mêmes index que la table
+parente, qui reste vide et sert de modèle :
+
+- lecture : partitioned_source() retourne, pour une plage de dates, la
+  seule partition concernée ou l'union (UNION ALL) des partitions qui
+  chevauchent la plage, chaque branche étant filtrée sur la plage ; les
+  autres mois ne sont jamais lus. Sans partition concernée, la table
+  parente est lue (elle contient encore les données tant que la migration
+  de partitionnement n'a pas été appliquée).
+- écriture : insert_rows() répartit les lignes par mois, crée les
+  partitions manquantes et attribue les ids depuis partition_sequences :
+  les ids restent uniques et croissants sur l'ensemble des partitions.
+- rétention : un mois entièrement expiré est supprimé par DROP TABLE, sans
+  DELETE ligne à ligne (voir services.retention).
+
+La liste des partitions est relue dans sqlite_master lorsque
+PRAGMA schema_version change (partition créée ou supprimée, y compris par
+un autre processus).
+"""
+import re
+import threading
+from datetime import datetime
+from sqlalchemy import MetaData, delete, func, insert, select, text, union_all, update
+from src.models.metrics import db, SystemMetrics, PerformanceHistory
+
+PARTITIONED_TABLES = {
+    SystemMetrics.__tablename__: SystemMetrics.__table__,
+    PerformanceHistory.__tablename__: PerformanceHistory.__table__
+}
+
+# Dernier id attribué pour chaque table partitionnée
+partition_sequences = db.Table(
+    'partition_sequences',
+    db.Column('table_name', db.String(100), primary_key=True),
+    db.Column('last_id', db.Integer, nullable=False, default=0)
+)
+
+_PARTITION_NAME = re.compile(r'^(\w+)_p(\d{6})$')
+
+# Les partitions ne sont pas créées par db.create_all()
+_partition_metadata = MetaData()
+_metadata_lock = threading.Lock()
+
+
+def month_start(timestamp):
+    """Premier instant du mois d'un timestamp"""
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def partition_name(table_name, month):
+    return f'{table_name}_p{month:%Y%m}'
+
+
+def partition_table(table_name, month):
+    """Table de la partition d'un mois (colonnes et index de la table parente)"""
+    name = partition_name(table_name, month)
+    with _metadata_lock:
+        table = _partition_metadata.tables.get(name)
+        if table is None:
+            table = PARTITIONED_TABLES[table_name].to_metadata(_partition_metadata, name=name)
+            # Les noms d'index sont uniques dans toute la base
+            for index in table.indexes:
+                index.name = f'ix_{name}_' + '_'.join(column.name for column in index.columns)
+        return table
+
+
+class PartitionRegistry:
+    """Mois des partitions existantes, relus quand le schéma change"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schema_version = None
+        self._months = {}
+
+    def months(self, connection, table_name):
+        """Mois (ordre chronologique) des partitions d'une table"""
+        version = connection.exec_driver_sql('PRAGMA schema_version').scalar()
+        with self._lock:
+            if version != self._schema_version:
+                months = {name: [] for name in PARTITIONED_TABLES}
+                names = connection.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'table'")
+                ).scalars()
+                for name in names:
+                    match = _PARTITION_NAME.match(name)
+                    if match and match.group(1) in months:
+                        months[match.group(1)].append(datetime.strptime(match.group(2), '%Y%m'))
+                self._months = {name: sorted(found) for name, found in months.items()}
+                self._schema_version = version
+            return list(self._months[table_name])
+
+
+partition_registry = PartitionRegistry()
+
+
+def partition_tables(connection, table_name, date_start=None, date_end=None):
+    """
+    Partitions (ordre chronologique) qui chevauchent [date_start, date_end],
+    ou [table parente] si aucune ne la chevauche
+    """
+    first = month_start(date_start) if date_start is not None else None
+    tables = [
+        partition_table(table_name, month)
+        for month in partition_registry.months(connection, table_name)
+        if (first is None or month >= first) and (date_end is None or month <= date_end)
+    ]
+    return tables or [PARTITIONED_TABLES[table_name]]
+
+
+def partitioned_source(table_name, date_start=None, date_end=None, connection=None):
+    """
+    Source de lecture d'une table partitionnée pour une plage de dates
+
+    Même colonnes que la table parente ; les critères de plage doivent
+    toujours être appliqués sur la source retournée.
+    """
+    connection = connection if connection is not None else db.session.connection()
+    tables = partition_tables(connection, table_name, date_start, date_end)
+    if len(tables) == 1:
+        return tables[0]
+
+    branches = []
+    for table in tables:
+        criteria = []
+        if date_start is not None:
+            criteria.append(table.c.timestamp >= date_start)
+        if date_end is not None:
+            criteria.append(table.c.timestamp <= date_end)
+        branches.append(select(table).where(*criteria))
+    return union_all(*branches).subquery(table_name)
+
+
+def newest_rows(table_name, limit, where=None, connection=None):
+    """
+    Les limit lignes les plus récentes (timestamp décroissant), en lisant
+    les partitions de la plus récente à la plus ancienne
+
+    where(table) retourne les critères à appliquer à une partition.
+    """
+    connection = connection if connection is not None else db.session.connection()
+    rows = []
+    for table in reversed(partition_tables(connection, table_name)):
+        criteria = where(table) if where is not None else []
+        rows.extend(connection.execute(
+            select(table).where(*criteria)
+            .order_by(table.c.timestamp.desc(), table.c.id.desc())
+            .limit(limit - len(rows))
+        ).mappings())
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def last_id(connection, table_name):
+    """Dernier id attribué d'une table partitionnée (0 si aucun)"""
+    return connection.execute(
+        select(partition_sequences.c.last_id)
+        .where(partition_sequences.c.table_name == table_name)
+    ).scalar() or 0
+
+
+def _allocate_ids(connection, table_name, count):
+    """Réserve count ids consécutifs ; retourne le premier"""
+    sequences = partition_sequences
+    allocated = connection.execute(
+        update(sequences)
+        .where(sequences.c.table_name == table_name)
+        .values(last_id=sequences.c.last_id + count)
+        .returning(sequences.c.last_id)
+    ).scalar()
+    if allocated is None:
+        parent = PARTITIONED_TABLES[table_name]
+        allocated = (connection.execute(select(func.max(parent.c.id))).scalar() or 0) + count
+        connection.execute(insert(sequences).values(table_name=table_name, last_id=allocated))
+    return allocated - count + 1
+
+
+def ensure_partition(connection, table_name, month):
+    """Crée la partition d'un mois si elle n'existe pas encore"""
+    table = partition_table(table_name, month)
+    if month not in partition_registry.months(connection, table_name):
+        table.create(connection, checkfirst=True)
+    return table
+
+
+def insert_rows(connection, table_name, rows):
+    """
+    Insère des lignes (dicts avec timestamp) dans les partitions de leur mois
+
+    Les ids attribués sont ajoutés aux lignes, dans l'ordre.
+    """
+    if not rows:
+        return rows
+    first_id = _allocate_ids(connection, table_name, len(rows))
+    by_month = {}
+    for offset, row in enumerate(rows):
+        row['id'] = first_id + offset
+        by_month.setdefault(month_start(row['timestamp']), []).append(row)
+    for month, month_rows in sorted(by_month.items()):
+        connection.execute(insert(ensure_partition(connection, table_name, month)), month_rows)
+    return rows
+
+
+def expired_partitions(connection, table_name, cutoff):
+    """Partitions dont le mois entier précède cutoff"""
+    return [
+        partition_table(table_name, month)
+        for month in partition_registry.months(connection, table_name)
+        if next_month(month) <= cutoff
+    ]
+
+
+def partition_containing(connection, table_name, timestamp):
+    """Partition du mois d'un timestamp, ou None si elle n'existe pas"""
+    month = month_start(timestamp)
+    if month in partition_registry.months(connection, table_name):
+        return partition_table(table_name, month)
+    return None
+
+
+def migrate_to_partitions(connection, table_name):
+    """Déplace les lignes de la table parente dans les partitions de leur mois"""
+    parent = PARTITIONED_TABLES[table_name]
+    max_id = connection.execute(select(func.max(parent.c.id))).scalar() or 0
+    if connection.execute(
+        update(partition_sequences)
+        .where(partition_sequences.c.table_name == table_name)
+        .values(last_id=func.max(partition_sequences.c.last_id, max_id))
+    ).rowcount == 0:
+        connection.execute(insert(partition_sequences).values(table_name=table_name, last_id=max_id))
+
+    months = connection.execute(
+        select(func.strftime('%Y%m', parent.c.timestamp).distinct())
+    ).scalars().all()
+    columns = [column.name for column in parent.columns]
+    for month in sorted(datetime.strptime(value, '%Y%m') for value in months):
+        table = ensure_partition(connection, table_name, month)
+        connection.execute(insert(table).from_select(columns, select(parent).where(
+            parent.c.timestamp >= month, parent.c.timestamp < next_month(month)
+        )))
+    connection.execute(delete(parent))
+
+
+def partition_status(connection):
+    """Partitions de chaque table avec leur premier et dernier timestamp"""
+    status = {}
+    for table_name in PARTITIONED_TABLES:
+        partitions = []
+        for month in partition_registry.months(connection, table_name):
+            table = partition_table(table_name, month)
+            first, last = connection.execute(
+                select(func.min(table.c.timestamp), func.max(table.c.timestamp))
+            ).one()
+            partitions.append({
+                'name': table.name,
+                'month': month.strftime('%Y-%m'),
+                'first_timestamp': first.isoformat() if first else None,
+                'last_timestamp': last.isoformat() if last else None
+            })
+        status[table_name] = {
+            'last_id': last_id(connection, table_name),
+            'partitions': partitions
+        }
+    return status
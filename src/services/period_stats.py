@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Activité des volontaires par période calendaire (classements par période)
+
+Les badges de la semaine, du mois, de l'année et le filtre period du
+classement filtraient sur last_seen ou joined_date mais classaient sur les
+compteurs cumulés depuis l'inscription. L'activité de chaque volontaire
+est désormais agrégée depuis performance_history dans
+volunteer_period_stats, par (période, bucket, volontaire) :
+
+- buckets calendaires : semaine ISO (lundi 00:00), mois, année (UTC)
+- tasks_done, tasks_succeeded, success_rate (en %) et compute_hours
+  (somme des execution_time en secondes, convertie en heures)
+- mise à jour incrémentale à chaque insertion dans performance_history
+  (signal rows_inserted, dans la même transaction), par upsert
+- un classement de bucket est une lecture de l'index
+  (period, bucket_start, critère) limitée aux premiers volontaires
+
+Comme pour les rollups, les agrégats ne sont pas concernés par la
+rétention de performance_history, et les lignes d'historique ne sont
+jamais modifiées après insertion.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from src.models.metrics import db, Volunteer, PerformanceHistory, LEADERBOARD_PERIODS, volunteer_period_stats
+from src.services.events import rows_inserted
+from src.services.leaderboard import volunteer_leaderboard
+from src.services.partitions import next_month, partition_tables
+
+
+def period_bucket(period, timestamp):
+    """Début du bucket calendaire d'une période contenant timestamp"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'year':
+        return day.replace(month=1, day=1)
+    raise ValueError(f'Période invalide. Valeurs acceptées: {", ".join(LEADERBOARD_PERIODS)}')
+
+
+def next_bucket(period, bucket_start):
+    """Début du bucket suivant"""
+    if period == 'week':
+        return bucket_start + timedelta(days=7)
+    if period == 'month':
+        return next_month(bucket_start)
+    return bucket_start.replace(year=bucket_start.year + 1)
+
+
+def resolve_bucket(period, value=None, now=None):
+    """
+    Bucket demandé : current (défaut), previous, ou une date ISO contenue
+    dans le bucket
+    """
+    current = period_bucket(period, now or datetime.utcnow())
+    if not value or value == 'current':
+        return current
+    if value == 'previous':
+        return period_bucket(period, current - timedelta(days=1))
+    return period_bucket(period, datetime.fromisoformat(value))
+
+
+def _bucket_partials(rows, partials=None):
+    """Regroupe des lignes d'historique par (période, bucket, volontaire)"""
+    partials = {} if partials is None else partials
+    for row in rows:
+        timestamp = row.get('timestamp')
+        if timestamp is None or not row.get('volunteer_id'):
+            continue
+        for period in LEADERBOARD_PERIODS:
+            key = (period, period_bucket(period, timestamp), row['volunteer_id'])
+            partial = partials.get(key)
+            if partial is None:
+                partial = partials[key] = {
+                    'period': key[0],
+                    'bucket_start': key[1],
+                    'volunteer_id': key[2],
+                    'tasks_done': 0,
+                    'tasks_succeeded': 0,
+                    'execution_seconds': 0.0,
+                    'last_timestamp': timestamp
+                }
+            partial['tasks_done'] += 1
+            partial['tasks_succeeded'] += 1 if row.get('success', True) else 0
+            partial['execution_seconds'] += row.get('execution_time') or 0.0
+            partial['last_timestamp'] = max(partial['last_timestamp'], timestamp)
+    return partials
+
+
+def apply_history(connection, rows, partials=None):
+    """Intègre des lignes d'historique dans volunteer_period_stats (upsert par bucket)"""
+    partials = _bucket_partials(rows, partials)
+    if not partials:
+        return
+
+    values = []
+    for partial in partials.values():
+        values.append({
+            'period': partial['period'],
+            'bucket_start': partial['bucket_start'],
+            'volunteer_id': partial['volunteer_id'],
+            'tasks_done': partial['tasks_done'],
+            'tasks_succeeded': partial['tasks_succeeded'],
+            'success_rate': partial['tasks_succeeded'] * 100.0 / partial['tasks_done'],
+            'compute_hours': partial['execution_seconds'] / 3600,
+            'last_timestamp': partial['last_timestamp']
+        })
+
+    table = volunteer_period_stats
+    stmt = insert(table)
+    excluded = stmt.excluded
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['period', 'bucket_start', 'volunteer_id'],
+            set_={
+                'tasks_done': table.c.tasks_done + excluded.tasks_done,
+                'tasks_succeeded': table.c.tasks_succeeded + excluded.tasks_succeeded,
+                'success_rate': (table.c.tasks_succeeded + excluded.tasks_succeeded) * 100.0
+                / (table.c.tasks_done + excluded.tasks_done),
+                'compute_hours': table.c.compute_hours + excluded.compute_hours,
+                'last_timestamp': func.max(table.c.last_timestamp, excluded.last_timestamp)
+            }
+        ),
+        values
+    )
+
+
+@rows_inserted.connect_via(PerformanceHistory.__tablename__)
+def _on_history_inserted(sender, connection, rows):
+    apply_history(connection, rows)
+
+
+def rebuild_period_stats(connection, chunk_size=5000):
+    """Reconstruit volunteer_period_stats à partir de performance_history"""
+    connection.execute(volunteer_period_stats.delete())
+
+    columns = ('timestamp', 'volunteer_id', 'execution_time', 'success')
+    for history in partition_tables(connection, PerformanceHistory.__tablename__):
+        result = connection.execution_options(yield_per=chunk_size).execute(
+            select(*[history.c[column] for column in columns])
+        )
+        # Partiels cumulés sur toute la partition : une seule écriture par bucket
+        partials = {}
+        for chunk in result.mappings().partitions():
+            _bucket_partials(chunk, partials)
+        apply_history(connection, [], partials)
+
+
+def period_ranking(period, bucket_start, order_by, limit, *criteria):
+    """
+    Volontaires d'un bucket dans l'ordre de order_by (expressions sur
+    volunteer_period_stats) : [(Volunteer, statistiques de la période)]
+    """
+    stats = volunteer_period_stats
+    rows = db.session.execute(
+        select(Volunteer, stats, volunteer_leaderboard.period_score.label('composite_score'))
+        .join(stats, stats.c.volunteer_id == Volunteer.volunteer_id)
+        .where(stats.c.period == period, stats.c.bucket_start == bucket_start, *criteria)
+        .order_by(*order_by)
+        .limit(limit)
+    ).all()
+    return [(row[0], period_stats_dict(row._mapping)) for row in rows]
+
+
+def period_count(period, bucket_start):
+    """Nombre de volontaires actifs dans un bucket"""
+    stats = volunteer_period_stats
+    return db.session.execute(
+        select(func.count()).select_from(stats)
+        .where(stats.c.period == period, stats.c.bucket_start == bucket_start)
+    ).scalar()
+
+
+def period_stats_dict(row):
+    """Statistiques d'un volontaire sur une période, pour JSON"""
+    return {
+        'period': row['period'],
+        'bucket_start': row['bucket_start'].isoformat(),
+        'tasks_done': row['tasks_done'],
+        'tasks_succeeded': row['tasks_succeeded'],
+        'success_rate': round(row['success_rate'], 2),
+        'compute_hours': round(row['compute_hours'], 2),
+        'composite_score': round(row['composite_score'], 2)
+    }
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Rapport EXPLAIN QUERY PLAN des requêtes principales de chaque route
+
+Permet de vérifier, sur une base donnée, que les requêtes de plage
+utilisent bien un index et ne parcourent pas toute la table.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, tuple_
+from src.models.metrics import (
+    db, SystemMetrics, Volunteer, Task, PerformanceHistory, system_metrics_rollups, volunteer_period_stats
+)
+from src.models.badge import VolunteerBadge
+from src.services.leaderboard import volunteer_leaderboard
+from src.services.partitions import partition_tables, partitioned_source
+from src.services.period_stats import period_bucket
+
+
+def _route_queries(connection):
+    """Requêtes représentatives par route (paramètres d'exemple)"""
+    now = datetime.utcnow()
+    week_ago = now - timedelta(weeks=1)
+    # Partitions de la semaine écoulée, et partition la plus récente
+    metrics = partitioned_source(SystemMetrics.__tablename__, week_ago, now, connection)
+    latest = partition_tables(connection, SystemMetrics.__tablename__)[-1]
+    rollups = system_metrics_rollups
+    volunteers = Volunteer.__table__
+    tasks = Task.__table__
+    history = partitioned_source(PerformanceHistory.__tablename__, week_ago, now, connection)
+    badges = VolunteerBadge.__table__
+    score = volunteer_leaderboard.score
+    period_stats = volunteer_period_stats
+    period_score = volunteer_leaderboard.period_score
+
+    metrics_range = select(func.count(), func.sum(metrics.c.cpu_usage)).where(
+        metrics.c.timestamp >= week_ago, metrics.c.timestamp <= now
+    )
+
+    return {
+        '/system-metrics': [
+            select(latest).order_by(latest.c.timestamp.desc()).limit(1)
+        ],
+        '/performance/global': [metrics_range],
+        '/performance/cpu': [
+            select(metrics.c.timestamp, metrics.c.cpu_usage).where(
+                metrics.c.timestamp >= week_ago, metrics.c.timestamp <= now
+            ).order_by(metrics.c.timestamp),
+            select(rollups.c.bucket_start, rollups.c.cpu_usage_sum).where(
+                rollups.c.resolution == 'hour',
+                rollups.c.bucket_start >= week_ago,
+                rollups.c.bucket_start < now
+            ).order_by(rollups.c.bucket_start)
+        ],
+        '/performance/peaks': [
+            select(metrics.c.timestamp, metrics.c.cpu_usage).where(
+                metrics.c.timestamp >= week_ago,
+                metrics.c.timestamp <= now,
+                metrics.c.cpu_usage >= 80
+            )
+        ],
+        '/performance/alerts': [
+            select(volunteers.c.volunteer_id).where(
+                volunteers.c.last_seen < now - timedelta(hours=24),
+                volunteers.c.status != 'inactive'
+            ),
+            select(func.count()).select_from(tasks).where(
+                tasks.c.status == 'failed', tasks.c.completed_date >= week_ago
+            )
+        ],
+        '/performance/report': [
+            metrics_range,
+            select(tasks.c.status, func.count()).where(
+                tasks.c.created_date >= week_ago, tasks.c.created_date <= now
+            ).group_by(tasks.c.status)
+        ],
+        '/performance/volunteers/<volunteer_id>': [
+            select(history).where(
+                history.c.volunteer_id == 'vol_001',
+                history.c.timestamp >= week_ago,
+                history.c.timestamp <= now
+            ).order_by(history.c.timestamp)
+        ],
+        '/performance/tasks/slowest': [
+            select(tasks).where(
+                tasks.c.status == 'completed', tasks.c.execution_time >= 0
+            ).order_by(tasks.c.execution_time.desc()).limit(10)
+        ],
+        '/tasks': [
+            select(tasks).where(tasks.c.status == 'pending')
+            .order_by(tasks.c.created_date.desc(), tasks.c.id.desc()).limit(101),
+            # Page suivante (curseur)
+            select(tasks).where(tasks.c.status == 'pending', tuple_(tasks.c.created_date, tasks.c.id) < (week_ago, 1))
+            .order_by(tasks.c.created_date.desc(), tasks.c.id.desc()).limit(101)
+        ],
+        '/volunteers': [
+            select(volunteers).where(volunteers.c.id > 1).order_by(volunteers.c.id).limit(51)
+        ],
+        '/badges/leaderboard': [
+            select(volunteers).order_by(score.desc(), volunteers.c.id).limit(50),
+            select(period_stats).where(
+                period_stats.c.period == 'week', period_stats.c.bucket_start == period_bucket('week', now)
+            ).order_by(period_score.desc(), period_stats.c.volunteer_id).limit(50)
+        ],
+        '/badges/volunteer-of-week': [
+            select(period_stats).where(
+                period_stats.c.period == 'week', period_stats.c.bucket_start == period_bucket('week', now)
+            ).order_by(period_stats.c.tasks_done.desc(), period_stats.c.compute_hours.desc()).limit(1)
+        ],
+        '/badges/attributed': [
+            select(badges).where(badges.c.revoked == False)
+            .order_by(badges.c.earned_date.desc(), badges.c.id.desc()).limit(51),
+            select(badges).where(badges.c.revoked == False, tuple_(badges.c.earned_date, badges.c.id) < (week_ago, 1))
+            .order_by(badges.c.earned_date.desc(), badges.c.id.desc()).limit(51)
+        ]
+    }
+
+
+def explain(connection, statement):
+    """Exécute EXPLAIN QUERY PLAN sur une requête SQLAlchemy"""
+    compiled = statement.compile(dialect=connection.dialect)
+    params = [compiled.params[name] for name in (compiled.positiontup or [])]
+    params = [
+        value.isoformat(sep=' ') if isinstance(value, datetime) else value
+        for value in params
+    ]
+    rows = connection.exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + str(compiled), tuple(params)
+    ).all()
+    return [row[-1] for row in rows]
+
+
+def plan_uses_index(details):
+    """
+    Une requête utilise un index si aucune étape ne parcourt une table
+    entière (SCAN sans USING INDEX) ; le parcours du résultat d'une
+    sous-requête (union des partitions) n'est pas un parcours de table
+    """
+    subqueries = {
+        detail.split(' ', 1)[1] for detail in details
+        if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    for detail in details:
+        if detail.startswith('SCAN') and 'USING' not in detail and detail[5:] not in subqueries:
+            return False
+    return any('USING' in detail for detail in details)
+
+
+def query_plan_report():
+    """Plan d'exécution de chaque requête, groupé par route"""
+    report = {}
+    with db.engine.connect() as connection:
+        for route, statements in _route_queries(connection).items():
+            entries = []
+            for statement in statements:
+                details = explain(connection, statement)
+                entries.append({
+                    'sql': ' '.join(str(statement.compile(dialect=connection.dialect)).split()),
+                    'plan': details,
+                    'uses_index': plan_uses_index(details)
+                })
+            report[route] = {
+                'uses_index': all(entry['uses_index'] for entry in entries),
+                'queries': entries
+            }
+    return report
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Index des rangs des volontaires en mémoire (rang exact et voisins)
+
+Les classements ne retournaient que les N premiers : connaître la position
+d'un volontaire obligeait à parcourir toute la table. Pour chaque critère
+de classement (tasks_completed, performance_score, total_computation_time
+et le score composite de services.leaderboard), les clés (valeur
+décroissante, id) sont conservées dans une liste triée d'ordre
+statistique :
+
+- la liste est découpée en blocs triés d'au plus 2 * LOAD clés, avec la
+  clé maximale de chaque bloc et un arbre de Fenwick des tailles de bloc
+- insertion et suppression : recherche dichotomique du bloc puis de la
+  position dans le bloc, mise à jour de l'arbre en O(log n)
+- rang d'une clé et clé d'un rang en O(log n)
+
+L'index est chargé à la première lecture, puis tenu à jour par les signaux
+d'écriture de volunteers (rows_committed, rows_updated, rows_deleted) ;
+une instruction UPDATE/DELETE en masse (rows_invalidated) provoque une
+relecture complète à la lecture suivante. Seules les écritures faites par
+ce processus sont suivies.
+
+Le rang est la position dans l'ordre valeur décroissante puis id
+croissant (1 = premier), les valeurs nulles en dernier, comme
+ORDER BY valeur DESC, id dans SQLite.
+"""
+import threading
+from bisect import bisect_left, insort
+from sqlalchemy import select
+from src.models.metrics import db, Volunteer
+from src.services.events import rows_committed, rows_deleted, rows_invalidated, rows_updated
+from src.services.leaderboard import volunteer_leaderboard
+
+RANK_METRICS = ('tasks_completed', 'performance_score', 'total_computation_time', 'composite_score')
+
+# Taille de référence des blocs de la liste triée
+LOAD = 500
+
+# Lignes lues par lot lors du chargement
+LOAD_CHUNK_SIZE = 5000
+
+
+class OrderStatisticList:
+    """Liste triée de clés uniques, avec rang et accès par position en O(log n)"""
+
+    def __init__(self, keys=(), load=LOAD):
+        self._load = load
+        keys = sorted(keys)
+        self._lists = [keys[i:i + load] for i in range(0, len(keys), load)]
+        self._maxes = [block[-1] for block in self._lists]
+        self._len = len(keys)
+        self._build_tree()
+
+    def __len__(self):
+        return self._len
+
+    def _build_tree(self):
+        tree = [len(block) for block in self._lists]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, block, delta):
+        tree = self._tree
+        while block < len(tree):
+            tree[block] += delta
+            block |= block + 1
+
+    def _prefix(self, block):
+        """Nombre de clés des blocs précédant block"""
+        total = 0
+        while block > 0:
+            total += self._tree[block - 1]
+            block &= block - 1
+        return total
+
+    def _locate(self, position):
+        """(bloc, position dans le bloc) de la clé de rang position (0 = première)"""
+        block = 0
+        step = 1 << len(self._tree).bit_length()
+        while step:
+            candidate = block + step
+            if candidate <= len(self._tree) and self._tree[candidate - 1] <= position:
+                block = candidate
+                position -= self._tree[candidate - 1]
+            step >>= 1
+        return block, position
+
+    def add(self, key):
+        if not self._lists:
+            self._lists.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            self._build_tree()
+            return
+        block = bisect_left(self._maxes, key)
+        if block == len(self._maxes):
+            block -= 1
+            self._lists[block].append(key)
+            self._maxes[block] = key
+        else:
+            insort(self._lists[block], key)
+        self._len += 1
+        if len(self._lists[block]) > 2 * self._load:
+            # Scission du bloc : l'arbre est reconstruit
+            keys = self._lists[block]
+            self._lists[block:block + 1] = [keys[:self._load], keys[self._load:]]
+            self._maxes[block:block + 1] = [keys[self._load - 1], keys[-1]]
+            self._build_tree()
+        else:
+            self._tree_add(block, 1)
+
+    def remove(self, key):
+        """Retire une clé ; False si elle est absente"""
+        block = bisect_left(self._maxes, key)
+        if block == len(self._maxes):
+            return False
+        keys = self._lists[block]
+        position = bisect_left(keys, key)
+        if keys[position] != key:
+            return False
+        del keys[position]
+        self._len -= 1
+        if not keys:
+            del self._lists[block]
+            del self._maxes[block]
+            self._build_tree()
+        else:
+            self._maxes[block] = keys[-1]
+            self._tree_add(block, -1)
+        return True
+
+    def rank(self, key):
+        """Nombre de clés strictement inférieures à key"""
+        block = bisect_left(self._maxes, key)
+        if block == len(self._maxes):
+            return self._len
+        return self._prefix(block) + bisect_left(self._lists[block], key)
+
+    def __getitem__(self, position):
+        if not 0 <= position < self._len:
+            raise IndexError(position)
+        block, offset = self._locate(position)
+        return self._lists[block][offset]
+
+    def islice(self, start, stop):
+        """Clés des positions [start, stop)"""
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return
+        block, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            keys = self._lists[block][offset:offset + remaining]
+            yield from keys
+            remaining -= len(keys)
+            block, offset = block + 1, 0
+
+
+def rank_key(value, row_id):
+    """Clé de tri : valeurs décroissantes, nulles en dernier, puis id"""
+    if value is None:
+        return (1, 0.0, row_id)
+    return (0, -value, row_id)
+
+
+class VolunteerRankIndex:
+    """Listes d'ordre statistique des volontaires, une par critère"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._lists = None
+        self._values = {}  # id -> {critère: valeur}
+        self._ids = {}  # volunteer_id -> id
+        self._volunteer_ids = {}  # id -> volunteer_id
+        self._weights = None
+        self.stats = {'loads': 0, 'updates': 0}
+
+    def _metric_values(self, row):
+        values = {metric: row.get(metric) for metric in RANK_METRICS[:-1]}
+        # Même expression, dans le même ordre, que le score SQL du classement
+        score = None
+        for column, weight in self._weights.items():
+            value = row.get(column)
+            if value is None:
+                score = None
+                break
+            term = value * weight
+            score = term if score is None else score + term
+        values['composite_score'] = score
+        return values
+
+    def _ensure_loaded(self):
+        weights = dict(volunteer_leaderboard.weights)
+        if self._lists is not None and weights == self._weights:
+            return
+        self._weights = weights
+        columns = ['id', 'volunteer_id'] + sorted(set(RANK_METRICS[:-1]) | set(weights))
+        table = Volunteer.__table__
+        self._values = {}
+        self._ids = {}
+        self._volunteer_ids = {}
+        result = db.session.execute(
+            select(*[table.c[column] for column in columns]),
+            execution_options={'yield_per': LOAD_CHUNK_SIZE}
+        ).mappings()
+        for row in result:
+            self._values[row['id']] = self._metric_values(row)
+            self._ids[row['volunteer_id']] = row['id']
+            self._volunteer_ids[row['id']] = row['volunteer_id']
+        self._lists = {
+            metric: OrderStatisticList(
+                rank_key(values[metric], row_id) for row_id, values in self._values.items()
+            ) for metric in RANK_METRICS
+        }
+        self.stats['loads'] += 1
+
+    # Mises à jour (signaux d'écriture)
+
+    def upsert(self, rows):
+        """Ajoute ou met à jour des volontaires (dicts de colonnes)"""
+        with self._lock:
+            if self._lists is None:
+                return
+            for row in rows:
+                row_id = row['id']
+                old = self._values.get(row_id)
+                new = self._metric_values(row)
+                for metric in RANK_METRICS:
+                    if old is not None and old[metric] == new[metric]:
+                        continue
+                    if old is not None:
+                        self._lists[metric].remove(rank_key(old[metric], row_id))
+                    self._lists[metric].add(rank_key(new[metric], row_id))
+                self._values[row_id] = new
+                volunteer_id = row.get('volunteer_id')
+                if volunteer_id is not None:
+                    self._ids.pop(self._volunteer_ids.get(row_id), None)
+                    self._ids[volunteer_id] = row_id
+                    self._volunteer_ids[row_id] = volunteer_id
+                self.stats['updates'] += 1
+
+    def delete(self, row_ids):
+        with self._lock:
+            if self._lists is None:
+                return
+            for row_id in row_ids:
+                old = self._values.pop(row_id, None)
+                if old is None:
+                    continue
+                for metric in RANK_METRICS:
+                    self._lists[metric].remove(rank_key(old[metric], row_id))
+                self._ids.pop(self._volunteer_ids.pop(row_id, None), None)
+
+    def invalidate(self):
+        """Relecture complète à la prochaine lecture"""
+        with self._lock:
+            self._lists = None
+
+    # Lectures (dans un contexte d'application)
+
+    def rank_of(self, metric, volunteer_id):
+        """(id, rang, total, valeur) d'un volontaire, ou None s'il est inconnu"""
+        with self._lock:
+            self._ensure_loaded()
+            row_id = self._ids.get(volunteer_id)
+            if row_id is None:
+                return None
+            value = self._values[row_id][metric]
+            ranks = self._lists[metric]
+            return row_id, ranks.rank(rank_key(value, row_id)) + 1, len(ranks), value
+
+    def window(self, metric, first_rank, last_rank):
+        """[(rang, id, valeur)] des rangs first_rank à last_rank inclus, et le total"""
+        with self._lock:
+            self._ensure_loaded()
+            ranks = self._lists[metric]
+            first_rank = max(first_rank, 1)
+            entries = []
+            for rank, key in enumerate(ranks.islice(first_rank - 1, last_rank), first_rank):
+                row_id = key[2]
+                entries.append((rank, row_id, self._values[row_id][metric]))
+            return entries, len(ranks)
+
+    def status(self):
+        with self._lock:
+            return {
+                'loaded': self._lists is not None,
+                'volunteers': len(self._values),
+                'metrics': list(RANK_METRICS),
+                **self.stats
+            }
+
+
+volunteer_ranks = VolunteerRankIndex()
+
+
+@rows_committed.connect_via(Volunteer.__tablename__)
+@rows_updated.connect_via(Volunteer.__tablename__)
+def _on_volunteers_written(sender, rows):
+    volunteer_ranks.upsert(rows)
+
+
+@rows_deleted.connect_via(Volunteer.__tablename__)
+def _on_volunteers_deleted(sender, rows):
+    volunteer_ranks.delete(row['id'] for row in rows)
+
+
+@rows_invalidated.connect_via(Volunteer.__tablename__)
+def _on_volunteers_invalidated(sender):
+    volunteer_ranks.invalidate()
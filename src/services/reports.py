@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Calcul des rapports en arrière-plan
+
+Un rapport de performance sur un mois ou une année lit toutes les
+métriques, tâches et volontaires de la plage : calculé dans le thread de
+la requête, il occupait un worker plusieurs secondes. Les rapports sont
+désormais des travaux persistés dans report_jobs :
+
+- submit() enregistre le travail (pending) et réveille le thread des
+  rapports ; un travail identique (même params_key) en attente, en cours
+  ou terminé depuis moins de REPORT_RESULT_TTL_SECONDS est réutilisé au
+  lieu d'être recalculé
+- le thread réserve le plus ancien travail en attente (running), exécute
+  le constructeur enregistré pour son type dans un contexte d'application,
+  puis persiste le résultat JSON avec son empreinte SHA-256 (done) ou
+  l'erreur (failed)
+- au démarrage, les travaux interrompus (running) sont remis en attente
+- les travaux terminés depuis plus de REPORT_KEEP_DAYS sont supprimés
+
+params_key est calculée sur les paramètres normalisés (plage de dates
+résolue) et sur le filigrane des tables lues (voir services.etags) : de
+nouvelles lignes dans la plage donnent une nouvelle clé. Les mises à jour
+de lignes existantes ne changent pas le filigrane ; elles sont reprises à
+l'expiration du TTL.
+
+Toutes les écritures passent par la file d'écriture (services.writer).
+
+Configuration (app.config) :
+- REPORT_RESULT_TTL_SECONDS : durée de réutilisation d'un résultat
+- REPORT_KEEP_DAYS : conservation des travaux terminés
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, select, update
+from src.models.metrics import db
+from src.models.report import ReportJob
+from src.services.etags import table_watermarks
+from src.services.writer import writer
+
+DEFAULT_RESULT_TTL_SECONDS = 3600
+
+DEFAULT_KEEP_DAYS = 7
+
+# Attente maximale du thread sans nouveau travail (secondes)
+POLL_SECONDS = 5
+
+# Intervalle entre deux purges des travaux anciens (secondes)
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class ReportUnavailable(Exception):
+    """Le rapport ne peut pas être calculé (aucune donnée dans la plage)"""
+
+
+def params_key(kind, params, watermarks):
+    """Empreinte des paramètres normalisés et du filigrane des tables lues"""
+    state = json.dumps([kind, params, list(watermarks)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()
+
+
+class ReportWorker:
+    """Thread unique qui calcule les rapports en attente"""
+
+    def __init__(self):
+        self.stats = {'done': 0, 'failed': 0, 'reused': 0}
+        self._builders = {}
+        self._app = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+
+    def register(self, kind, builder, tables):
+        """
+        Déclare le constructeur d'un type de rapport
+
+        builder(params) retourne le rapport (dict sérialisable) ou lève
+        ReportUnavailable ; tables : tables lues, dont le filigrane entre
+        dans params_key.
+        """
+        self._builders[kind] = (builder, tuple(tables))
+
+    # Cycle de vie
+
+    def start(self, app):
+        """Remet en attente les travaux interrompus et démarre le thread"""
+        if self._thread is not None:
+            return
+        self._app = app
+        with app.app_context():
+            writer.run(self._requeue_interrupted)
+        self._thread = threading.Thread(target=self._loop, name='reports', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    @staticmethod
+    def _requeue_interrupted(session):
+        return session.execute(
+            update(ReportJob).where(ReportJob.status == 'running')
+            .values(status='pending', started_at=None)
+        ).rowcount
+
+    # Soumission et lecture
+
+    def submit(self, kind, params):
+        """
+        Crée un travail de rapport, ou réutilise un travail identique
+
+        Retourne (travail en dict, réutilisé).
+        """
+        tables = self._builders[kind][1]
+        key = params_key(kind, params, table_watermarks(tables))
+        fresh_after = datetime.utcnow() - timedelta(seconds=self._config_value(
+            'REPORT_RESULT_TTL_SECONDS', DEFAULT_RESULT_TTL_SECONDS
+        ))
+
+        def job(session):
+            existing = session.execute(
+                select(ReportJob)
+                .where(
+                    ReportJob.params_key == key,
+                    ReportJob.status != 'failed',
+                    or_(ReportJob.status != 'done', ReportJob.finished_at >= fresh_after)
+                )
+                .order_by(ReportJob.created_at.desc(), ReportJob.id.desc())
+                .limit(1)
+            ).scalar()
+            if existing is not None:
+                return existing.to_dict(), True
+            report_job = ReportJob(
+                kind=kind,
+                params=json.dumps(params, sort_keys=True),
+                params_key=key,
+                status='pending'
+            )
+            session.add(report_job)
+            session.flush()
+            return report_job.to_dict(), False
+
+        # Le thread écrivain sérialise la recherche et la création : deux
+        # demandes identiques simultanées partagent le même travail
+        report_job, reused = writer.run(job)
+        if reused:
+            self.stats['reused'] += 1
+        else:
+            self._wake.set()
+        return report_job, reused
+
+    @staticmethod
+    def get(job_id):
+        """Travail (None s'il n'existe pas)"""
+        return db.session.get(ReportJob, job_id)
+
+    # Thread des rapports
+
+    def _config_value(self, name, default):
+        config = self._app.config if self._app is not None else {}
+        return config.get(name, default)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                with self._app.app_context():
+                    claimed = writer.run(self._claim)
+                    if claimed is not None:
+                        self._run(*claimed)
+                        continue
+                    self._purge()
+            except Exception:
+                # Base momentanément indisponible : nouvel essai au prochain réveil
+                pass
+            self._wake.wait(POLL_SECONDS)
+
+    @staticmethod
+    def _claim(session):
+        report_job = session.execute(
+            select(ReportJob).where(ReportJob.status == 'pending')
+            .order_by(ReportJob.id).limit(1)
+        ).scalar()
+        if report_job is None:
+            return None
+        report_job.status = 'running'
+        report_job.started_at = datetime.utcnow()
+        return report_job.id, report_job.kind, json.loads(report_job.params)
+
+    def _run(self, job_id, kind, params):
+        values = {}
+        try:
+            if kind not in self._builders:
+                raise ReportUnavailable(f'Type de rapport inconnu : {kind}')
+            builder = self._builders[kind][0]
+            result = json.dumps(builder(params), separators=(',', ':'))
+            values.update(
+                status='done',
+                result=result,
+                content_hash=hashlib.sha256(result.encode('utf-8')).hexdigest()
+            )
+        except Exception as e:
+            values.update(status='failed', error=str(e))
+        finally:
+            # Libérer la connexion de lecture avant l'écriture du résultat
+            db.session.remove()
+
+        def job(session):
+            values['finished_at'] = datetime.utcnow()
+            session.execute(update(ReportJob).where(ReportJob.id == job_id).values(**values))
+
+        writer.run(job)
+        self.stats[values['status']] += 1
+
+    def _purge(self):
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        cutoff = datetime.utcnow() - timedelta(days=self._config_value('REPORT_KEEP_DAYS', DEFAULT_KEEP_DAYS))
+        writer.run(lambda session: session.execute(
+            delete(ReportJob).where(
+                ReportJob.status.in_(['done', 'failed']),
+                ReportJob.finished_at < cutoff
+            )
+        ).rowcount)
+        self._last_purge = time.monotonic()
+
+    def status(self):
+        """Compteurs du thread des rapports"""
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'builders': sorted(self._builders),
+            **self.stats
+        }
+
+
+report_worker = ReportWorker()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Rétention des tables de séries temporelles brutes
+
+Les tables sont partitionnées par mois (voir services.partitions) : une
+partition dont tout le mois a dépassé la durée de rétention est supprimée
+par DROP TABLE, sans coût proportionnel au nombre de lignes. Seule la
+partition à cheval sur la date limite voit ses lignes expirées supprimées
+par petits lots (DELETE ... WHERE id IN (SELECT ... LIMIT n)), chaque lot
+étant un travail court de la file d'écriture, avec une pause entre deux
+lots : la base n'est jamais verrouillée longtemps. Les pages libérées sont
+ensuite rendues au système avec PRAGMA incremental_vacuum (la base est
+passée en auto_vacuum=INCREMENTAL par une migration).
+
+Avant la rétention, les mois de system_metrics plus anciens que
+ARCHIVE_AFTER_DAYS sont déplacés dans l'archive en colonnes (voir
+services.archive) ; la rétention de system_metrics retire ensuite de
+l'archive les mois entièrement expirés. Les agrégats historiques restent
+disponibles dans system_metrics_rollups, qui n'est pas concerné par la
+rétention.
+
+Configuration (app.config) :
+- RETENTION_DAYS : {table: jours} ; None conserve la table sans limite
+- RETENTION_INTERVAL_SECONDS : période du nettoyage automatique
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from src.models.metrics import db, SystemMetrics, PerformanceHistory
+from src.services.archive import archive_after_days, archive_cutoff, metrics_archive
+from src.services.events import mark_changed
+from src.services.partitions import expired_partitions, partition_containing
+from src.services.writer import writer
+
+DEFAULT_RETENTION_DAYS = {
+    # Au-delà d'un mois, system_metrics est conservée dans l'archive : un an
+    # et un mois suffisent aux comparaisons d'une année sur l'autre
+    'system_metrics': 400,
+    'performance_history': 365
+}
+
+DEFAULT_INTERVAL_SECONDS = 3600
+
+# Lignes supprimées par transaction
+DEFAULT_CHUNK_SIZE = 1000
+
+# Pause entre deux lots (secondes) pour laisser passer les autres écritures
+DEFAULT_CHUNK_PAUSE = 0.05
+
+# Pages rendues par appel à incremental_vacuum
+VACUUM_PAGES = 2000
+
+_TABLES = {
+    'system_metrics': SystemMetrics,
+    'performance_history': PerformanceHistory
+}
+
+
+def retention_days(app_config, table_name):
+    """Durée de rétention configurée pour une table (None = illimitée)"""
+    configured = dict(DEFAULT_RETENTION_DAYS)
+    configured.update(app_config.get('RETENTION_DAYS') or {})
+    return configured.get(table_name)
+
+
+def retention_cutoff(app_config, table_name, now=None):
+    """Date avant laquelle les lignes d'une table sont expirées, ou None"""
+    days = retention_days(app_config, table_name)
+    if days is None:
+        return None
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def expire_rows(table, column, cutoff, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_CHUNK_PAUSE,
+                table_name=None):
+    """
+    Supprime par lots les lignes dont column < cutoff
+
+    table_name : table notifiée par tables_changed (la table parente pour
+    une partition). Retourne (lignes supprimées, nombre de lots).
+    """
+    expired_ids = select(table.c.id).where(column < cutoff).limit(chunk_size).scalar_subquery()
+    statement = delete(table).where(table.c.id.in_(expired_ids))
+
+    def job(session):
+        count = session.execute(statement).rowcount
+        if count:
+            mark_changed(session, table_name or table.name)
+        return count
+
+    deleted = 0
+    chunks = 0
+    while True:
+        count = writer.run(job)
+        deleted += count
+        chunks += 1
+        if count < chunk_size:
+            break
+        time.sleep(pause)
+    return deleted, chunks
+
+
+def incremental_vacuum(pages=VACUUM_PAGES):
+    """Rend au système les pages libres du fichier ; retourne le nombre de pages libérées"""
+    def job(session):
+        connection = session.connection()
+        before = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        # pysqlite n'exécute qu'un pas de l'instruction, soit une page par appel
+        for _ in range(min(before, pages)):
+            connection.exec_driver_sql('PRAGMA incremental_vacuum(1)')
+        after = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        return before - after
+
+    return writer.run(job)
+
+
+def drop_partitions(table_name, cutoff):
+    """Supprime les partitions entièrement expirées ; retourne leurs noms"""
+    def job(session):
+        connection = session.connection()
+        partitions = expired_partitions(connection, table_name, cutoff)[:1]
+        for partition in partitions:
+            partition.drop(connection)
+            mark_changed(session, table_name)
+        return [partition.name for partition in partitions]
+
+    dropped = []
+    # Une partition par travail, pour ne pas retenir le verrou d'écriture
+    while True:
+        names = writer.run(job)
+        if not names:
+            return dropped
+        dropped.extend(names)
+
+
+def apply_retention(app_config, now=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_CHUNK_PAUSE):
+    """Archive les mois froids, applique la rétention de chaque table puis compacte le fichier"""
+    started = time.monotonic()
+    report = {'tables': {}, 'freed_pages': 0}
+
+    cutoff = archive_cutoff(app_config, now)
+    report['archive'] = {
+        'archive_after_days': archive_after_days(app_config),
+        'archived': metrics_archive.archive_before(cutoff) if cutoff is not None else []
+    }
+
+    for table_name, model in _TABLES.items():
+        cutoff = retention_cutoff(app_config, table_name, now)
+        if cutoff is None:
+            report['tables'][table_name] = {'retention_days': None, 'deleted': 0}
+            continue
+
+        dropped = drop_partitions(table_name, cutoff)
+        with db.engine.connect() as connection:
+            table = partition_containing(connection, table_name, cutoff)
+        if table is None:
+            # Table parente, vide une fois la table partitionnée
+            table = model.__table__
+        deleted, chunks = expire_rows(table, table.c.timestamp, cutoff, chunk_size, pause, table_name)
+        report['tables'][table_name] = {
+            'retention_days': retention_days(app_config, table_name),
+            'cutoff': cutoff.isoformat(),
+            'dropped_partitions': dropped,
+            'deleted': deleted,
+            'chunks': chunks
+        }
+        if table_name == metrics_archive.table.name:
+            report['archive']['expired'] = metrics_archive.expire(cutoff)
+
+    if report['archive']['archived'] or any(
+        entry['deleted'] or entry.get('dropped_partitions') for entry in report['tables'].values()
+    ):
+        report['freed_pages'] = incremental_vacuum()
+
+    report['duration_seconds'] = round(time.monotonic() - started, 3)
+    report['ran_at'] = datetime.utcnow().isoformat()
+    return report
+
+
+class RetentionScheduler:
+    """Thread qui applique la rétention à intervalle régulier"""
+
+    def __init__(self):
+        self.last_report = None
+        self.last_error = None
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        """Démarre le nettoyage périodique pour l'application"""
+        if self._thread is not None:
+            return
+        self._app = app
+        self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_now(self, app=None):
+        """Exécute immédiatement un cycle de rétention et retourne son rapport"""
+        app = app or self._app
+        with self._lock:
+            with app.app_context():
+                try:
+                    self.last_report = apply_retention(app.config)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    raise
+            return self.last_report
+
+    def _loop(self):
+        interval = self._app.config.get('RETENTION_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS)
+        while not self._stop.wait(interval):
+            try:
+                self.run_now()
+            except Exception:
+                # Erreur conservée dans last_error, nouvel essai au prochain cycle
+                pass
+
+    def status(self):
+        """Politiques de rétention et rapport du dernier cycle"""
+        config = self._app.config if self._app is not None else {}
+        return {
+            'policies': {
+                table_name: retention_days(config, table_name) for table_name in _TABLES
+            },
+            'archive_after_days': archive_after_days(config),
+            'interval_seconds': config.get('RETENTION_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS),
+            'last_run': self.last_report,
+            'last_error': self.last_error
+        }
+
+
+retention_scheduler = RetentionScheduler()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Tampon mémoire en colonnes des métriques système récentes
+
+Les N derniers jours de system_metrics sont gardés en mémoire sous forme
+de tableaux contigus par champ (module array), triés par timestamp. Les
+endpoints de dashboard interrogés toutes les quelques secondes répondent
+depuis ce tampon (bisect pour la plage, sum/min/max sur des tranches de
+tableaux) sans relire SQLite ni construire d'objets ORM.
+
+Le tampon se resynchronise à chaque lecture en récupérant, dans les
+partitions des mois de la fenêtre, les lignes dont l'id dépasse le dernier
+id connu (une requête sur la clé primaire), ce qui couvre aussi les
+insertions faites par d'autres processus.
+
+Les valeurs NULL sont stockées sous forme de marqueur (NaN pour les champs
+réels, NULL_INTEGER pour les champs entiers) : comme les agrégats SQL,
+sum/min/max les ignorent et les échantillons les renvoient comme None.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from operator import mul
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from src.models.metrics import db, SystemMetrics, ROLLUP_FIELDS
+from src.services.partitions import last_id, partition_tables
+
+# Fenêtre conservée par défaut (une semaine plus une marge)
+DEFAULT_WINDOW_DAYS = 8
+
+# Compacter les tableaux lorsque la partie expirée dépasse cette taille
+COMPACT_THRESHOLD = 4096
+
+EPOCH = datetime(1970, 1, 1)
+
+# Marqueur NULL des champs entiers (hors des valeurs acceptées à l'ingestion)
+NULL_INTEGER = -2 ** 63
+
+
+def _is_null(value):
+    return value != value or value == NULL_INTEGER
+
+
+def _to_micros(timestamp):
+    delta = timestamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class MetricsRingBuffer:
+    """Fenêtre glissante en colonnes des dernières métriques système"""
+
+    def __init__(self, window_days=DEFAULT_WINDOW_DAYS):
+        self.window = timedelta(days=window_days)
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._loaded = False
+        self._coverage_start = None
+        self._last_id = 0
+        self._start = 0
+        self._ids = array('q')
+        self._timestamps = array('q')
+        self._columns = {
+            field: array('q' if column_type is db.Integer else 'd')
+            for field, column_type in ROLLUP_FIELDS.items()
+        }
+        self._null_markers = {
+            field: NULL_INTEGER if column_type is db.Integer else float('nan')
+            for field, column_type in ROLLUP_FIELDS.items()
+        }
+        # Valeurs NULL insérées depuis le chargement (0 : aucun filtrage)
+        self._null_counts = dict.fromkeys(ROLLUP_FIELDS, 0)
+
+    # Synchronisation
+
+    def reset(self):
+        """Vide le tampon ; il sera rechargé à la prochaine lecture"""
+        with self._lock:
+            self._clear()
+
+    def sync(self):
+        """Charge le tampon ou récupère les lignes insérées depuis la dernière lecture"""
+        with self._lock:
+            cutoff = datetime.utcnow() - self.window
+            connection = db.session.connection()
+            newest_id = last_id(connection, SystemMetrics.__tablename__)
+            if not self._loaded:
+                self._coverage_start = cutoff
+
+            # Seules les partitions des mois de la fenêtre sont lues
+            for source in partition_tables(connection, SystemMetrics.__tablename__, self._coverage_start):
+                columns = [source.c.id, source.c.timestamp] + [source.c[field] for field in ROLLUP_FIELDS]
+                if not self._loaded:
+                    query = (
+                        select(*columns)
+                        .where(source.c.timestamp >= cutoff, source.c.id <= newest_id)
+                        .order_by(source.c.timestamp, source.c.id)
+                    )
+                else:
+                    query = (
+                        select(*columns)
+                        .where(source.c.id > self._last_id, source.c.id <= newest_id)
+                        .order_by(source.c.id)
+                    )
+                for row in connection.execute(query):
+                    self._insert(row)
+
+            self._last_id = max(self._last_id, newest_id)
+            self._loaded = True
+            self._evict(cutoff)
+
+    def _insert(self, row):
+        micros = _to_micros(row.timestamp)
+        if micros < _to_micros(self._coverage_start):
+            return
+
+        if not len(self._timestamps) or micros >= self._timestamps[-1]:
+            self._ids.append(row.id)
+            self._timestamps.append(micros)
+            for field, column in self._columns.items():
+                column.append(self._stored(row, field))
+            return
+
+        # Échantillon arrivé en retard : insertion à sa place chronologique
+        index = bisect_right(self._timestamps, micros, lo=self._start)
+        self._ids.insert(index, row.id)
+        self._timestamps.insert(index, micros)
+        for field, column in self._columns.items():
+            column.insert(index, self._stored(row, field))
+
+    def _stored(self, row, field):
+        value = getattr(row, field)
+        if value is None:
+            self._null_counts[field] += 1
+            return self._null_markers[field]
+        return value
+
+    def _values(self, field, lo, hi, null=None):
+        """Valeurs d'un champ sur [lo, hi) ; les NULL valent null"""
+        values = self._columns[field][lo:hi]
+        if not self._null_counts[field]:
+            return values
+        return [null if _is_null(value) else value for value in values]
+
+    def _evict(self, cutoff):
+        self._start = bisect_left(self._timestamps, _to_micros(cutoff), lo=self._start)
+        self._coverage_start = max(self._coverage_start, cutoff)
+
+        if self._start > COMPACT_THRESHOLD and self._start * 2 > len(self._timestamps):
+            for column in [self._ids, self._timestamps] + list(self._columns.values()):
+                del column[:self._start]
+            self._start = 0
+
+    # Lectures
+
+    def covers(self, date_start):
+        """Synchronise le tampon et indique s'il contient toute la plage demandée"""
+        self.sync()
+        return self._coverage_start <= date_start
+
+    def _range(self, date_start, date_end):
+        lo = bisect_left(self._timestamps, _to_micros(date_start), lo=self._start)
+        hi = (
+            bisect_right(self._timestamps, _to_micros(date_end), lo=lo)
+            if date_end is not None else len(self._timestamps)
+        )
+        return lo, hi
+
+    def _row(self, index):
+        row = {
+            'id': self._ids[index],
+            'timestamp': _from_micros(self._timestamps[index])
+        }
+        for field, column in self._columns.items():
+            row[field] = None if _is_null(column[index]) else column[index]
+        return row
+
+    def latest(self):
+        """Dernière métrique (même format que SystemMetrics.to_dict) ou None"""
+        with self._lock:
+            if len(self._timestamps) <= self._start:
+                return None
+            row = self._row(len(self._timestamps) - 1)
+        row['timestamp'] = row['timestamp'].isoformat()
+        return row
+
+    def summary(self, fields, date_start, date_end=None):
+        """
+        Statistiques count/sum/min/max d'une plage
+
+        Retourne (count, statistiques par champ)
+        """
+        with self._lock:
+            lo, hi = self._range(date_start, date_end)
+            count = hi - lo
+            stats = {}
+            for field in fields:
+                values = self._values(field, lo, hi)
+                if self._null_counts[field]:
+                    values = [value for value in values if value is not None]
+                stats[field] = {
+                    'count': len(values),
+                    'sum': sum(values) if len(values) else None,
+                    'min': min(values) if len(values) else None,
+                    'max': max(values) if len(values) else None
+                }
+        return count, stats
+
+    def regression(self, fields, date_start, date_end=None, origin=None):
+        """
+        Sommes de régression (n, Σx, Σx², Σy, Σxy) de chaque champ, x étant
+        exprimé en heures depuis origin (par défaut date_start)
+        """
+        origin_micros = _to_micros(origin or date_start)
+        with self._lock:
+            lo, hi = self._range(date_start, date_end)
+            xs = [(ts - origin_micros) / 3600000000 for ts in self._timestamps[lo:hi]]
+            # Un échantillon NULL ne compte pas dans Σy ni Σxy
+            columns = {field: self._values(field, lo, hi, null=0) for field in fields}
+
+        base = {
+            'n': len(xs),
+            'sx': sum(xs),
+            'sxx': sum(map(mul, xs, xs)),
+            'x_min': xs[0] if xs else None,
+            'x_max': xs[-1] if xs else None
+        }
+        return {
+            field: dict(base, sy=sum(column), sxy=sum(map(mul, xs, column)))
+            for field, column in columns.items()
+        }
+
+    def samples(self, fields, date_start, date_end=None, where=None):
+        """
+        Échantillons d'une plage sous forme de colonnes
+
+        where=(champ, seuil) ne garde que les échantillons >= seuil.
+        Retourne {'timestamp': [...], champ: [...]} en ordre chronologique.
+        """
+        with self._lock:
+            lo, hi = self._range(date_start, date_end)
+            timestamps = self._timestamps[lo:hi]
+            columns = {field: self._values(field, lo, hi) for field in fields}
+
+            if where is not None:
+                # Les marqueurs NULL ne dépassent aucun seuil
+                field, threshold = where
+                keep = [value >= threshold for value in self._columns[field][lo:hi]]
+                timestamps = compress(timestamps, keep)
+                columns = {name: compress(column, keep) for name, column in columns.items()}
+
+        result = {'timestamp': [_from_micros(ts) for ts in timestamps]}
+        result.update({name: list(column) for name, column in columns.items()})
+        return result
+
+
+metrics_buffer = MetricsRingBuffer()
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+Rollups hiérarchiques (minute/heure/jour) de system_metrics
+
+Chaque bucket conserve count, sum, min, max, première et dernière valeur
+de chaque champ. Les rollups sont mis à jour incrémentalement à chaque
+insertion de métriques brutes, dans la même transaction.
+
+Les requêtes sur de longues périodes lisent le rollup le plus grossier
+qui respecte encore la précision demandée ; seules les bordures de la
+plage (buckets incomplets) sont lues dans la table brute (et dans
+l'archive pour les mois archivés), ce qui garde des agrégations exactes.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects.sqlite import insert
+from src.models.metrics import (
+    db, SystemMetrics, ROLLUP_FIELDS, ROLLUP_RESOLUTIONS, system_metrics_rollups
+)
+from src.services.aggregations import merge_stats
+from src.services.analytics import hours_since, merge_regression, window_aggregates
+from src.services.archive import metrics_archive
+from src.services.events import rows_inserted
+from src.services.partitions import partition_tables, partitioned_source
+
+# Périodes de get_date_range servies depuis les rollups
+ROLLUP_PERIODS = ('week', 'month', 'year', 'custom')
+
+# Nombre de points visé par défaut pour choisir la résolution
+DEFAULT_TARGET_POINTS = 500
+
+# Nombre maximal de plages lues dans la table brute pour un seuil
+MAX_THRESHOLD_RANGES = 200
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def floor_bucket(timestamp, width):
+    """Début du bucket de largeur width (secondes) contenant timestamp"""
+    seconds = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % width)
+
+
+def ceil_bucket(timestamp, width):
+    """Premier début de bucket supérieur ou égal à timestamp"""
+    start = floor_bucket(timestamp, width)
+    return start if start == timestamp else start + timedelta(seconds=width)
+
+
+def select_resolution(date_start, date_end, target_points=DEFAULT_TARGET_POINTS):
+    """
+    Choisit le rollup le plus grossier dont les buckets restent plus fins
+    que l'espacement demandé (plage / target_points)
+
+    Retourne None si seules les données brutes sont assez précises.
+    """
+    span = ((date_end or datetime.utcnow()) - date_start).total_seconds()
+    if span <= 0 or target_points <= 0:
+        return None
+
+    spacing = span / target_points
+    candidates = [
+        (width, name) for name, width in ROLLUP_RESOLUTIONS.items()
+        if width <= spacing
+    ]
+    return max(candidates)[1] if candidates else None
+
+
+def _bucket_partials(samples):
+    """
+    Regroupe des échantillons bruts par (résolution, bucket)
+
+    Comme les agrégats SQL, count/sum/min/max ignorent les valeurs NULL
+    (sum/min/max valent None si toutes le sont) ; first/last sont les
+    valeurs des échantillons.
+    """
+    partials = {}
+    for sample in samples:
+        timestamp = sample['timestamp']
+        for resolution, width in ROLLUP_RESOLUTIONS.items():
+            key = (resolution, floor_bucket(timestamp, width))
+            partial = partials.get(key)
+            if partial is None:
+                partial = {
+                    'resolution': resolution,
+                    'bucket_start': key[1],
+                    'sample_count': 0,
+                    'first_timestamp': timestamp,
+                    'last_timestamp': timestamp
+                }
+                for field in ROLLUP_FIELDS:
+                    value = sample.get(field)
+                    partial.update({
+                        f'{field}_count': 0,
+                        f'{field}_sum': None,
+                        f'{field}_min': None,
+                        f'{field}_max': None,
+                        f'{field}_first': value,
+                        f'{field}_last': value
+                    })
+                partials[key] = partial
+
+            partial['sample_count'] += 1
+            for field in ROLLUP_FIELDS:
+                value = sample.get(field)
+                if value is None:
+                    continue
+                total = partial[f'{field}_sum']
+                minimum = partial[f'{field}_min']
+                maximum = partial[f'{field}_max']
+                partial[f'{field}_count'] += 1
+                partial[f'{field}_sum'] = value if total is None else total + value
+                partial[f'{field}_min'] = value if minimum is None else min(minimum, value)
+                partial[f'{field}_max'] = value if maximum is None else max(maximum, value)
+            if timestamp < partial['first_timestamp']:
+                partial['first_timestamp'] = timestamp
+                for field in ROLLUP_FIELDS:
+                    partial[f'{field}_first'] = sample.get(field)
+            if timestamp >= partial['last_timestamp']:
+                partial['last_timestamp'] = timestamp
+                for field in ROLLUP_FIELDS:
+                    partial[f'{field}_last'] = sample.get(field)
+    return list(partials.values())
+
+
+def _ignoring_null(combined, current, added):
+    """Combinaison de deux valeurs d'agrégat, l'une ou l'autre pouvant être NULL"""
+    return func.coalesce(combined, current, added)
+
+
+def apply_samples(connection, samples):
+    """Intègre des échantillons bruts dans les rollups (upsert par bucket)"""
+    partials = _bucket_partials(samples)
+    if not partials:
+        return
+
+    table = system_metrics_rollups
+    stmt = insert(table)
+    excluded = stmt.excluded
+    earlier = excluded.first_timestamp < table.c.first_timestamp
+    later = excluded.last_timestamp >= table.c.last_timestamp
+
+    updates = {
+        'sample_count': table.c.sample_count + excluded.sample_count,
+        'first_timestamp': func.min(table.c.first_timestamp, excluded.first_timestamp),
+        'last_timestamp': func.max(table.c.last_timestamp, excluded.last_timestamp)
+    }
+    for field in ROLLUP_FIELDS:
+        updates.update({
+            f'{field}_count': table.c[f'{field}_count'] + excluded[f'{field}_count'],
+            f'{field}_sum': _ignoring_null(
+                table.c[f'{field}_sum'] + excluded[f'{field}_sum'],
+                table.c[f'{field}_sum'], excluded[f'{field}_sum']
+            ),
+            f'{field}_min': _ignoring_null(
+                func.min(table.c[f'{field}_min'], excluded[f'{field}_min']),
+                table.c[f'{field}_min'], excluded[f'{field}_min']
+            ),
+            f'{field}_max': _ignoring_null(
+                func.max(table.c[f'{field}_max'], excluded[f'{field}_max']),
+                table.c[f'{field}_max'], excluded[f'{field}_max']
+            ),
+            f'{field}_first': case(
+                (earlier, excluded[f'{field}_first']), else_=table.c[f'{field}_first']
+            ),
+            f'{field}_last': case(
+                (later, excluded[f'{field}_last']), else_=table.c[f'{field}_last']
+            )
+        })
+
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['resolution', 'bucket_start'],
+            set_=updates
+        ),
+        partials
+    )
+
+
+@rows_inserted.connect_via(SystemMetrics.__tablename__)
+def _on_metrics_inserted(sender, connection, rows):
+    apply_samples(connection, rows)
+
+
+def rebuild_rollups(connection, chunk_size=5000):
+    """Reconstruit tous les rollups à partir de l'archive et de la table brute"""
+    connection.execute(system_metrics_rollups.delete())
+
+    for chunk in metrics_archive.row_chunks(connection=connection):
+        apply_samples(connection, chunk)
+
+    # Partitions lues dans l'ordre chronologique
+    for raw in partition_tables(connection, SystemMetrics.__tablename__):
+        columns = [raw.c.timestamp] + [raw.c[field] for field in ROLLUP_FIELDS]
+        result = connection.execution_options(yield_per=chunk_size).execute(
+            select(*columns).order_by(raw.c.timestamp)
+        )
+        for chunk in result.mappings().partitions():
+            apply_samples(connection, [dict(row) for row in chunk])
+
+
+def _interior_bounds(resolution, date_start, date_end):
+    """Plage [début, fin) des buckets entièrement contenus dans la période"""
+    width = ROLLUP_RESOLUTIONS[resolution]
+    return (
+        ceil_bucket(date_start, width),
+        floor_bucket(date_end or datetime.utcnow(), width)
+    )
+
+
+def threshold_ranges(field, threshold, date_start, date_end, resolution=None, limit=None):
+    """
+    Plages [début, fin) de la table brute pouvant contenir des échantillons
+    de field strictement au-dessus de threshold, en ordre chronologique
+
+    Un bucket complet dont le maximum ne dépasse pas le seuil ne contient
+    aucun tel échantillon : seuls les buckets dont le maximum le dépasse
+    et les bordures de la plage (buckets incomplets) sont à lire. Les
+    buckets consécutifs sont regroupés et les plages les plus proches
+    fusionnées au-delà de MAX_THRESHOLD_RANGES. Avec limit, la lecture
+    s'arrête au limit-ième bucket (chacun contient au moins un
+    échantillon au-dessus du seuil). Une fin None est non bornée.
+    """
+    resolution = resolution or select_resolution(date_start, date_end) or 'minute'
+    width = timedelta(seconds=ROLLUP_RESOLUTIONS[resolution])
+    inner_start, inner_end = _interior_bounds(resolution, date_start, date_end)
+    tail_end = date_end + timedelta(microseconds=1) if date_end is not None else None
+    if inner_start >= inner_end:
+        return [(date_start, tail_end)]
+
+    table = system_metrics_rollups
+    query = select(table.c.bucket_start).where(
+        table.c.resolution == resolution,
+        table.c.bucket_start >= inner_start,
+        table.c.bucket_start < inner_end,
+        table.c.sample_count > 0,
+        table.c[f'{field}_max'] > threshold
+    ).order_by(table.c.bucket_start)
+    if limit is not None:
+        query = query.limit(limit)
+    buckets = db.session.execute(query).scalars().all()
+
+    ranges = [[date_start, inner_start]] if date_start < inner_start else []
+    for bucket_start in buckets:
+        if ranges and ranges[-1][1] == bucket_start:
+            ranges[-1][1] = bucket_start + width
+        else:
+            ranges.append([bucket_start, bucket_start + width])
+    if limit is None or len(buckets) < limit:
+        if ranges and ranges[-1][1] == inner_end:
+            ranges[-1][1] = tail_end
+        else:
+            ranges.append([inner_end, tail_end])
+
+    if len(ranges) > MAX_THRESHOLD_RANGES:
+        # Fusion des plages séparées par les plus petits intervalles
+        gaps = sorted(range(1, len(ranges)), key=lambda index: ranges[index][0] - ranges[index - 1][1])
+        merged = set(gaps[:len(ranges) - MAX_THRESHOLD_RANGES])
+        combined = []
+        for index, current in enumerate(ranges):
+            if index in merged:
+                combined[-1][1] = current[1]
+            else:
+                combined.append(current)
+        ranges = combined
+    return [tuple(bounds) for bounds in ranges]
+
+
+def _edge_criteria(raw, date_start, date_end, inner_start, inner_end):
+    """Critères des échantillons bruts hors des buckets complets"""
+    right = [raw.c.timestamp >= inner_end]
+    if date_end is not None:
+        right.append(raw.c.timestamp <= date_end)
+    return or_(
+        and_(raw.c.timestamp >= date_start, raw.c.timestamp < inner_start),
+        and_(*right)
+    )
+
+
+def rollup_windows(windows, fields, trend_fields=(), origin=None):
+    """
+    Agrège plusieurs périodes depuis les rollups (buckets complets) et la
+    table brute (bordures)
+
+    windows est une liste de (résolution, début, fin). Les buckets complets
+    de toutes les périodes sont lus en une requête et leurs bordures en une
+    autre (une colonne CASE par période). Pour les tendances, chaque bucket
+    compte pour sample_count points placés au milieu du bucket.
+
+    Retourne, dans l'ordre, (count, statistiques par champ, sommes de
+    régression par champ), ou None pour une période sans bucket complet.
+    """
+    table = system_metrics_rollups
+    if origin is None and windows:
+        origin = min(date_start for _, date_start, _ in windows)
+
+    bounds = {}
+    for index, (resolution, date_start, date_end) in enumerate(windows):
+        inner_start, inner_end = _interior_bounds(resolution, date_start, date_end)
+        if inner_start < inner_end:
+            bounds[index] = (inner_start, inner_end)
+    if not bounds:
+        return [None] * len(windows)
+
+    columns = []
+    interiors = []
+    for index, (inner_start, inner_end) in bounds.items():
+        resolution = windows[index][0]
+        condition = and_(
+            table.c.resolution == resolution,
+            table.c.bucket_start >= inner_start,
+            table.c.bucket_start < inner_end,
+            table.c.sample_count > 0
+        )
+        interiors.append(condition)
+        prefix = f'w{index}'
+        columns.append(func.sum(case((condition, table.c.sample_count))).label(f'{prefix}__count'))
+        for field in fields:
+            columns.extend([
+                func.sum(case((condition, table.c[f'{field}_count']))).label(f'{prefix}__{field}__count'),
+                func.sum(case((condition, table.c[f'{field}_sum']))).label(f'{prefix}__{field}__sum'),
+                func.min(case((condition, table.c[f'{field}_min']))).label(f'{prefix}__{field}__min'),
+                func.max(case((condition, table.c[f'{field}_max']))).label(f'{prefix}__{field}__max')
+            ])
+        if trend_fields:
+            x = hours_since(table.c.bucket_start, origin) + ROLLUP_RESOLUTIONS[resolution] / 7200
+            n = table.c.sample_count
+            columns.extend([
+                func.sum(case((condition, n * x))).label(f'{prefix}__sx'),
+                func.sum(case((condition, n * x * x))).label(f'{prefix}__sxx'),
+                func.min(case((condition, hours_since(table.c.first_timestamp, origin)))).label(f'{prefix}__x_min'),
+                func.max(case((condition, hours_since(table.c.last_timestamp, origin)))).label(f'{prefix}__x_max')
+            ])
+            for field in trend_fields:
+                columns.extend([
+                    func.sum(case((condition, table.c[f'{field}_sum']))).label(f'{prefix}__{field}__sy'),
+                    func.sum(case((condition, x * table.c[f'{field}_sum']))).label(f'{prefix}__{field}__sxy')
+                ])
+    row = db.session.execute(select(*columns).where(or_(*interiors))).one()._mapping
+
+    ends = [windows[index][2] for index in bounds]
+    raw = partitioned_source(
+        SystemMetrics.__tablename__,
+        min(windows[index][1] for index in bounds),
+        None if None in ends else max(ends)
+    )
+    edges = window_aggregates(
+        raw,
+        [
+            _edge_criteria(raw, windows[index][1], windows[index][2], inner_start, inner_end)
+            for index, (inner_start, inner_end) in bounds.items()
+        ],
+        fields,
+        hours_since(raw.c.timestamp, origin),
+        trend_fields
+    )
+    # Bordures tombant dans des mois archivés (fins de plage incluses)
+    archived = metrics_archive.window_aggregates(
+        [
+            [
+                (windows[index][1], inner_start - timedelta(microseconds=1)),
+                (inner_end, windows[index][2])
+            ] for index, (inner_start, inner_end) in bounds.items()
+        ],
+        fields, origin, trend_fields
+    )
+
+    results = [None] * len(windows)
+    for (index, _), (edge_stats, edge_regressions), (archived_stats, archived_regressions) in zip(
+        bounds.items(), edges, archived
+    ):
+        prefix = f'w{index}'
+        count = row[f'{prefix}__count'] or 0
+        stats = {
+            field: merge_stats(
+                {
+                    'count': row[f'{prefix}__{field}__count'] or 0,
+                    'sum': row[f'{prefix}__{field}__sum'],
+                    'min': row[f'{prefix}__{field}__min'],
+                    'max': row[f'{prefix}__{field}__max']
+                },
+                edge_stats[field],
+                archived_stats[field]
+            ) for field in fields
+        }
+        regressions = {
+            field: merge_regression(
+                {
+                    'n': count,
+                    'sx': row[f'{prefix}__sx'] or 0.0,
+                    'sxx': row[f'{prefix}__sxx'] or 0.0,
+                    'sy': row[f'{prefix}__{field}__sy'] or 0.0,
+                    'sxy': row[f'{prefix}__{field}__sxy'] or 0.0,
+                    'x_min': row[f'{prefix}__x_min'],
+                    'x_max': row[f'{prefix}__x_max']
+                },
+                edge_regressions[field],
+                archived_regressions[field]
+            ) for field in trend_fields
+        }
+        total = stats[fields[0]]['count'] if fields else 0
+        results[index] = (total, stats, regressions)
+    return results
+
+
+def rollup_series(resolution, date_start, date_end, field):
+    """
+    Série temporelle d'un champ, un point par bucket de la résolution donnée
+
+    Chaque point contient la moyenne, le min et le max du bucket.
+    """
+    width = ROLLUP_RESOLUTIONS[resolution]
+    table = system_metrics_rollups
+    criteria = [
+        table.c.resolution == resolution,
+        table.c.bucket_start >= floor_bucket(date_start, width),
+        table.c.sample_count > 0
+    ]
+    if date_end is not None:
+        criteria.append(table.c.bucket_start <= date_end)
+
+    rows = db.session.execute(
+        select(
+            table.c.bucket_start,
+            table.c[f'{field}_count'],
+            table.c[f'{field}_sum'],
+            table.c[f'{field}_min'],
+            table.c[f'{field}_max']
+        ).where(*criteria).order_by(table.c.bucket_start)
+    ).all()
+
+    return [
+        {
+            'bucket_start': bucket_start,
+            'count': count,
+            'average': total / count if total is not None else None,
+            'min': minimum,
+            'max': maximum
+        } for bucket_start, count, total, minimum, maximum in rows
+    ]
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Sketches de quantiles mergeables (p50/p95/p99)
+
+Chaque sketch suit le principe de DDSketch : une valeur x > 0 est comptée
+dans le bin ceil(log(x) / log(gamma)), avec gamma = (1 + a) / (1 - a). Tout
+quantile est alors restitué avec une erreur relative d'au plus a (1 %), et
+deux sketches se fusionnent en additionnant leurs bins.
+
+Un sketch est conservé par métrique, résolution (heure, jour), bucket et
+groupe (workflow_id pour les tâches, volunteer_id pour l'historique de
+performance). Les sketches sont mis à jour dans la transaction d'insertion
+des lignes brutes ; un quantile sur une plage ne fait que fusionner les
+sketches des buckets concernés, sans trier les données brutes.
+
+Les mises à jour de lignes existantes (changement de statut d'une tâche)
+ne sont pas suivies : rebuild_sketches() reconstruit tout depuis les
+tables brutes (et l'archive de system_metrics).
+"""
+import json
+import math
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from src.models.metrics import (
+    db, SystemMetrics, Task, PerformanceHistory, SKETCH_RESOLUTIONS, quantile_sketches
+)
+from src.services.archive import metrics_archive
+from src.services.events import rows_inserted
+from src.services.partitions import PARTITIONED_TABLES, partition_tables
+from src.services.rollups import floor_bucket
+
+# Erreur relative maximale sur les quantiles
+RELATIVE_ACCURACY = 0.01
+
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# En dessous, les valeurs sont comptées comme nulles
+MIN_INDEXABLE_VALUE = 1e-9
+
+# Plage la plus longue servie depuis les sketches horaires
+HOURLY_MAX_SPAN_DAYS = 31
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """Sketch DDSketch à erreur relative bornée"""
+
+    def __init__(self, bins=None, zero_count=0, count=0, total=0.0, minimum=None, maximum=None):
+        self.bins = bins if bins is not None else {}
+        self.zero_count = zero_count
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, value):
+        if value is None:
+            return
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += 1
+        else:
+            key = math.ceil(math.log(value) / LOG_GAMMA)
+            self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.minimum is not None:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        if other.maximum is not None:
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        return self
+
+    def quantile(self, q):
+        """Valeur approchée du quantile q (0..1), ou None si le sketch est vide"""
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        cumulative = self.zero_count
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                value = 2 * GAMMA ** key / (GAMMA + 1)
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    def to_row(self):
+        return {
+            'count': self.count,
+            'zero_count': self.zero_count,
+            'total': self.total,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'bins': json.dumps(self.bins, separators=(',', ':'))
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            bins={int(key): count for key, count in json.loads(row['bins']).items()},
+            zero_count=row['zero_count'],
+            count=row['count'],
+            total=row['total'],
+            minimum=row['minimum'],
+            maximum=row['maximum']
+        )
+
+
+def _task_sample(row):
+    """Les durées d'exécution ne sont significatives que pour les tâches terminées"""
+    if row.get('status') != 'completed':
+        return None
+    return row.get('completed_date') or row.get('created_date'), row.get('workflow_id') or ''
+
+
+# Sources suivies : métrique -> (table, colonne de valeur, extraction (timestamp, groupe))
+SKETCH_SOURCES = {
+    'cpu_usage': (SystemMetrics.__tablename__, 'cpu_usage',
+                  lambda row: (row.get('timestamp'), '')),
+    'memory_usage': (SystemMetrics.__tablename__, 'memory_usage',
+                     lambda row: (row.get('timestamp'), '')),
+    'task_execution_time': (Task.__tablename__, 'execution_time', _task_sample),
+    'performance_execution_time': (PerformanceHistory.__tablename__, 'execution_time',
+                                   lambda row: (row.get('timestamp'), row.get('volunteer_id') or ''))
+}
+
+
+def _bucket_sketches(table_name, rows, sketches=None):
+    """Construit les sketches partiels (métrique, résolution, bucket, groupe) de lignes brutes"""
+    sketches = {} if sketches is None else sketches
+    for metric, (source, field, locate) in SKETCH_SOURCES.items():
+        if source != table_name:
+            continue
+        for row in rows:
+            located = locate(row)
+            if located is None or located[0] is None or row.get(field) is None:
+                continue
+            timestamp, group_key = located
+            for resolution, width in SKETCH_RESOLUTIONS.items():
+                key = (metric, resolution, floor_bucket(timestamp, width), group_key)
+                sketch = sketches.get(key)
+                if sketch is None:
+                    sketch = sketches[key] = QuantileSketch()
+                sketch.add(row[field])
+    return sketches
+
+
+def _store(connection, sketches, merge_existing=True):
+    """Fusionne des sketches partiels avec ceux déjà en base (upsert)"""
+    if not sketches:
+        return
+
+    table = quantile_sketches
+    existing = {}
+    if merge_existing:
+        for metric, resolution in {(key[0], key[1]) for key in sketches}:
+            buckets = sorted({
+                key[2] for key in sketches if key[0] == metric and key[1] == resolution
+            })
+            # Limite du nombre de paramètres SQLite par requête
+            for offset in range(0, len(buckets), 500):
+                rows = connection.execute(
+                    select(table).where(
+                        table.c.metric == metric,
+                        table.c.resolution == resolution,
+                        table.c.bucket_start.in_(buckets[offset:offset + 500])
+                    )
+                ).mappings()
+                for row in rows:
+                    key = (row['metric'], row['resolution'], row['bucket_start'], row['group_key'])
+                    if key in sketches:
+                        existing[key] = QuantileSketch.from_row(row)
+
+    values = []
+    for key, sketch in sketches.items():
+        if key in existing:
+            sketch = existing[key].merge(sketch)
+        metric, resolution, bucket_start, group_key = key
+        values.append(dict(
+            sketch.to_row(),
+            metric=metric,
+            resolution=resolution,
+            bucket_start=bucket_start,
+            group_key=group_key
+        ))
+
+    stmt = insert(table)
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['metric', 'resolution', 'bucket_start', 'group_key'],
+            set_={
+                column: stmt.excluded[column]
+                for column in ('count', 'zero_count', 'total', 'minimum', 'maximum', 'bins')
+            }
+        ),
+        values
+    )
+
+
+def _on_rows_inserted(sender, connection, rows):
+    _store(connection, _bucket_sketches(sender, rows))
+
+
+for _table_name in {source for source, _, _ in SKETCH_SOURCES.values()}:
+    rows_inserted.connect(_on_rows_inserted, sender=_table_name, weak=False)
+
+
+def rebuild_sketches(connection, chunk_size=5000):
+    """Reconstruit tous les sketches à partir des tables brutes"""
+    connection.execute(quantile_sketches.delete())
+
+    for model in (SystemMetrics, Task, PerformanceHistory):
+        table_name = model.__tablename__
+        if table_name in PARTITIONED_TABLES:
+            tables = partition_tables(connection, table_name)
+        else:
+            tables = [model.__table__]
+        sketches = {}
+        if table_name == metrics_archive.table.name:
+            for chunk in metrics_archive.row_chunks(connection=connection):
+                _bucket_sketches(table_name, chunk, sketches)
+        for table in tables:
+            result = connection.execution_options(yield_per=chunk_size).execute(select(table))
+            for chunk in result.mappings().partitions():
+                _bucket_sketches(table_name, [dict(row) for row in chunk], sketches)
+        _store(connection, sketches, merge_existing=False)
+
+
+def sketch_resolution(date_start, date_end):
+    """Sketches horaires pour les plages courtes, journaliers au-delà"""
+    span = (date_end or datetime.utcnow()) - date_start
+    return 'hour' if span.days < HOURLY_MAX_SPAN_DAYS else 'day'
+
+
+def merged_sketch(metric, date_start, date_end=None, group_key=None):
+    """
+    Fusionne les sketches d'une métrique sur une plage
+
+    La plage est arrondie aux buckets qui la recouvrent. group_key limite
+    la fusion à un workflow / volontaire ; sans lui tous les groupes sont
+    fusionnés. Retourne (résolution, sketch).
+    """
+    if metric not in SKETCH_SOURCES:
+        raise ValueError(f'Métrique inconnue: {metric}')
+
+    resolution = sketch_resolution(date_start, date_end)
+    table = quantile_sketches
+    criteria = [
+        table.c.metric == metric,
+        table.c.resolution == resolution,
+        table.c.bucket_start >= floor_bucket(date_start, SKETCH_RESOLUTIONS[resolution])
+    ]
+    if date_end is not None:
+        criteria.append(table.c.bucket_start <= date_end)
+    if group_key is not None:
+        criteria.append(table.c.group_key == group_key)
+
+    sketch = QuantileSketch()
+    rows = db.session.execute(
+        select(
+            table.c.bins, table.c.zero_count, table.c.count,
+            table.c.total, table.c.minimum, table.c.maximum
+        ).where(*criteria)
+    ).mappings()
+    for row in rows:
+        sketch.merge(QuantileSketch.from_row(row))
+    return resolution, sketch
+
+
+def group_averages(metric, date_start, date_end=None):
+    """Moyenne par groupe (volontaire, workflow) calculée depuis les sketches"""
+    resolution = sketch_resolution(date_start, date_end)
+    table = quantile_sketches
+    criteria = [
+        table.c.metric == metric,
+        table.c.resolution == resolution,
+        table.c.bucket_start >= floor_bucket(date_start, SKETCH_RESOLUTIONS[resolution]),
+        table.c.group_key != ''
+    ]
+    if date_end is not None:
+        criteria.append(table.c.bucket_start <= date_end)
+
+    rows = db.session.execute(
+        select(table.c.group_key, func.sum(table.c.total), func.sum(table.c.count))
+        .where(*criteria)
+        .group_by(table.c.group_key)
+    ).all()
+    return {group_key: total / count for group_key, total, count in rows if count}
+
+
+def speedster_volunteers(percentile, date_start, date_end=None):
+    """
+    Volontaires dont le temps d'exécution moyen fait partie des plus rapides
+
+    Critère avg_execution_time du badge speedster : percentile=90 retient
+    les volontaires dont la moyenne (lue dans les sketches de l'historique
+    de performance) est inférieure ou égale au 10e centile des moyennes.
+    Retourne (seuil, {volunteer_id: moyenne}).
+    """
+    averages = group_averages('performance_execution_time', date_start, date_end)
+    distribution = QuantileSketch()
+    for average in averages.values():
+        distribution.add(average)
+
+    threshold = distribution.quantile(1 - percentile / 100)
+    if threshold is None:
+        return None, {}
+    return threshold, {
+        volunteer_id: average
+        for volunteer_id, average in averages.items() if average <= threshold
+    }
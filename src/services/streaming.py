@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Diffusion en direct des métriques système (Server-Sent Events)
+
+Chaque tableau de bord ouvert interrogeait GET /system-metrics toutes les
+quelques secondes (ORDER BY timestamp DESC LIMIT 1). Les nouvelles
+métriques sont désormais poussées aux abonnés du flux SSE :
+
+- le signal rows_committed de system_metrics dépose les lignes validées
+  dans une file bornée, sans bloquer le thread écrivain
+- un unique thread de diffusion sérialise chaque échantillon une seule fois
+  et le remet à tous les abonnés, avec l'état de santé dérivé (cpu,
+  mémoire) lorsqu'il change
+- chaque abonné possède un tampon borné : un client lent perd les
+  messages les plus anciens (drop-oldest) au lieu de ralentir les autres
+
+Seules les insertions faites par ce processus sont diffusées.
+"""
+import json
+import queue
+import threading
+from collections import deque
+from src.models.metrics import SystemMetrics
+from src.services.events import rows_committed
+
+# Messages conservés au plus par abonné
+DEFAULT_SUBSCRIBER_BUFFER = 100
+
+DEFAULT_QUEUE_SIZE = 1000
+
+# Intervalle des commentaires keep-alive envoyés sans nouvelle métrique
+HEARTBEAT_SECONDS = 15
+
+# Délai de reconnexion conseillé aux clients (champ retry, en millisecondes)
+RECONNECT_MILLISECONDS = 3000
+
+# Seuils (en %) des états de santé warning et critical
+HEALTH_THRESHOLDS = (70, 85)
+
+
+def health_level(value):
+    """good / warning / critical selon HEALTH_THRESHOLDS"""
+    warning, critical = HEALTH_THRESHOLDS
+    value = value or 0
+    return 'good' if value < warning else 'warning' if value < critical else 'critical'
+
+
+def health_state(sample):
+    """État de santé d'un échantillon de métriques"""
+    return {
+        'cpu': health_level(sample.get('cpu_usage')),
+        'memory': health_level(sample.get('memory_usage'))
+    }
+
+
+def sample_dict(row, fields=None):
+    """Ligne brute de system_metrics au format de SystemMetrics.to_dict(fields)"""
+    if fields is None:
+        fields = [column.key for column in SystemMetrics.__table__.columns]
+    sample = {name: row.get(name) for name in fields}
+    if sample.get('timestamp') is not None:
+        sample['timestamp'] = sample['timestamp'].isoformat()
+    return sample
+
+
+def format_event(event, data, event_id=None):
+    """Message SSE (id, event, data JSON sur une ligne)"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscriber:
+    """Tampon borné des messages d'un client du flux"""
+
+    def __init__(self, include_health=True, buffer_size=DEFAULT_SUBSCRIBER_BUFFER):
+        self.include_health = include_health
+        self.dropped = 0
+        self._messages = deque(maxlen=buffer_size)
+        self._ready = threading.Condition()
+
+    def push(self, message):
+        with self._ready:
+            if len(self._messages) == self._messages.maxlen:
+                self.dropped += 1
+            self._messages.append(message)
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Messages en attente, après au plus timeout secondes d'attente"""
+        with self._ready:
+            if not self._messages:
+                self._ready.wait(timeout)
+            messages = list(self._messages)
+            self._messages.clear()
+            return messages
+
+
+class MetricsBroadcaster:
+    """Boucle unique de diffusion des nouvelles métriques vers les abonnés"""
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._health = None
+        self.stats = {'published': 0, 'queue_overflows': 0, 'dropped': 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='metrics-broadcast', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def subscribe(self, include_health=True, buffer_size=DEFAULT_SUBSCRIBER_BUFFER):
+        subscriber = Subscriber(include_health, buffer_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            self.stats['dropped'] += subscriber.dropped
+
+    def publish(self, rows):
+        """Dépose des lignes validées dans la file de diffusion (sans bloquer)"""
+        if not self._subscribers:
+            return
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.stats['queue_overflows'] += 1
+
+    def _loop(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                return
+            self._broadcast(sample_dict(row))
+
+    def _broadcast(self, sample):
+        message = format_event('metrics', sample, sample['id'])
+        health = health_state(sample)
+        health_message = None
+        if health != self._health:
+            self._health = health
+            health_message = format_event('health', dict(health, timestamp=sample['timestamp']))
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(message)
+            if health_message is not None and subscriber.include_health:
+                subscriber.push(health_message)
+        self.stats['published'] += 1
+
+    def status(self):
+        """Abonnés et compteurs pour l'administration"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return dict(
+            self.stats,
+            running=self._thread is not None and self._thread.is_alive(),
+            subscribers=len(subscribers),
+            queued=self._queue.qsize(),
+            dropped=self.stats['dropped'] + sum(subscriber.dropped for subscriber in subscribers)
+        )
+
+
+metrics_broadcaster = MetricsBroadcaster()
+
+
+@rows_committed.connect_via(SystemMetrics.__tablename__)
+def _on_metrics_committed(sender, rows):
+    metrics_broadcaster.publish(rows)
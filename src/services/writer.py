@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+File d'écriture unique vers SQLite (group commit)
+
+SQLite n'accepte qu'un écrivain à la fois : plusieurs threads de requête
+qui valident chacun leur transaction se bloquent mutuellement ("database is
+locked"). Toutes les écritures passent donc par un thread dédié qui lit une
+file bornée et regroupe les travaux arrivés pendant une courte fenêtre dans
+une seule transaction.
+
+Chaque travail est une fonction job(session) exécutée dans son propre
+SAVEPOINT : un travail en erreur est annulé sans affecter les autres du
+même lot.
+
+pysqlite n'émet BEGIN qu'avant la première instruction de modification et
+jamais avant un SAVEPOINT : le SAVEPOINT du premier travail ouvrait alors
+la transaction et son RELEASE la validait, soit un commit (et un fsync)
+par travail. Les travaux s'exécutent donc sur un moteur dédié
+(writer_engine) où la gestion des transactions du pilote est désactivée
+et où la transaction est ouverte explicitement par BEGIN IMMEDIATE : le
+verrou d'écriture est pris dès le début du lot, si bien que les
+vérifications d'un travail restent valides jusqu'au commit, même face à
+un écrivain d'un autre processus. Le moteur de l'application n'est pas
+modifié (VACUUM, par exemple, ne peut pas s'exécuter dans une
+transaction). Le résultat (ou l'exception) est renvoyé à l'appelant une fois
+la transaction validée. Les travaux doivent retourner des données simples
+(dict, id, ...) et non des objets ORM.
+
+Les bases SQLite sont ouvertes en mode WAL (enable_wal) : en mode
+rollback journal, une lecture longue (export ou historique diffusé en
+flux, dont le curseur reste ouvert pendant tout le téléchargement) garde
+un verrou SHARED qui empêche le commit de l'écrivain ("database is
+locked"). En WAL, les lectures voient un instantané de la base et ne
+bloquent plus l'écrivain.
+
+Quand la file est pleine, submit() lève WriterBusy (contre-pression) : les
+routes répondent alors 503. run() lève WriterTimeout (un WriterBusy) quand
+le résultat n'arrive pas à temps ; le travail peut encore être validé plus
+tard.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.services.events import restore_pending, snapshot_pending
+
+DEFAULT_QUEUE_SIZE = 1000
+
+# Durée maximale de regroupement des travaux dans une transaction (secondes)
+DEFAULT_FLUSH_WINDOW = 0.005
+
+DEFAULT_MAX_BATCH = 200
+
+# Attente maximale d'une place dans la file avant de refuser l'écriture
+DEFAULT_SUBMIT_TIMEOUT = 0.5
+
+DEFAULT_RESULT_TIMEOUT = 30
+
+
+class WriterBusy(Exception):
+    """File d'écriture pleine"""
+
+
+class WriterTimeout(WriterBusy):
+    """Résultat d'un travail non reçu à temps (il peut encore être validé)"""
+
+
+@event.listens_for(Engine, 'connect')
+def enable_wal(dbapi_connection, connection_record):
+    """Passe chaque base SQLite en mode WAL (ignoré pour une base en mémoire)"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+
+_writer_engines = {}
+_writer_engines_lock = threading.Lock()
+
+
+def _begin_immediate(connection):
+    connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def writer_engine(engine):
+    """
+    Moteur des travaux d'écriture, sur la même base que engine, dont les
+    transactions sont ouvertes par BEGIN IMMEDIATE
+    """
+    if engine.url.database in (None, '', ':memory:'):
+        # Une base en mémoire n'est visible que par les connexions de son moteur
+        return engine
+    key = str(engine.url)
+    with _writer_engines_lock:
+        dedicated = _writer_engines.get(key)
+        if dedicated is None:
+            dedicated = create_engine(engine.url)
+
+            @event.listens_for(dedicated, 'connect')
+            def _disable_driver_transactions(dbapi_connection, connection_record):
+                dbapi_connection.isolation_level = None
+
+            event.listen(dedicated, 'begin', _begin_immediate)
+            _writer_engines[key] = dedicated
+        return dedicated
+
+
+class GroupCommitWriter:
+    """Thread écrivain unique avec file bornée et commits groupés"""
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, flush_window=DEFAULT_FLUSH_WINDOW,
+                 max_batch=DEFAULT_MAX_BATCH):
+        self.flush_window = flush_window
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._engine = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'failed_jobs': 0, 'transactions': 0, 'rejected': 0, 'timeouts': 0}
+
+    # Cycle de vie
+
+    def start(self, app):
+        """Démarre le thread écrivain sur le moteur de l'application"""
+        with self._lock:
+            if self.running:
+                return
+            with app.app_context():
+                self._engine = writer_engine(db.engine)
+            self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Traite les travaux en attente puis arrête le thread"""
+        with self._lock:
+            if not self.running:
+                return
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Soumission
+
+    def submit(self, job, timeout=DEFAULT_SUBMIT_TIMEOUT):
+        """
+        Ajoute un travail job(session) à la file et retourne un Future
+
+        Lève WriterBusy si la file reste pleine pendant timeout secondes.
+        """
+        future = Future()
+        try:
+            self._queue.put((job, future), timeout=timeout)
+        except queue.Full:
+            self.stats['rejected'] += 1
+            raise WriterBusy('File d\'écriture pleine, réessayer plus tard')
+        return future
+
+    def run(self, job, timeout=DEFAULT_RESULT_TIMEOUT):
+        """
+        Exécute un travail et attend son résultat
+
+        Sans thread démarré (scripts, migrations), le travail est exécuté
+        immédiatement dans sa propre transaction.
+        """
+        if not self.running:
+            with Session(writer_engine(db.engine), expire_on_commit=False) as session:
+                result = job(session)
+                session.commit()
+            return result
+        future = self.submit(job)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.stats['timeouts'] += 1
+            raise WriterTimeout('Écriture toujours en attente, réessayer plus tard')
+
+    # Thread écrivain
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Arrêt demandé : terminer ce lot puis sortir
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        results = []
+        with Session(self._engine, expire_on_commit=False) as session:
+            try:
+                for job, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    pending = snapshot_pending(session)
+                    try:
+                        with session.begin_nested():
+                            result = job(session)
+                        results.append((future, result, None))
+                    except Exception as e:
+                        # Le SAVEPOINT est annulé : oublier aussi ses notifications
+                        restore_pending(session, pending)
+                        results.append((future, None, e))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                for _, future in batch:
+                    if future.running():
+                        future.set_exception(e)
+                        self.stats['failed_jobs'] += 1
+                return
+
+        self.stats['transactions'] += 1
+        for future, result, error in results:
+            self.stats['jobs'] += 1
+            if error is not None:
+                self.stats['failed_jobs'] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def status(self):
+        """État de la file pour l'administration"""
+        return dict(self.stats, running=self.running, queued=self._queue.qsize())
+
+
+writer = GroupCommitWriter()
+
+
+def add_objects(objects):
+    """Travail qui insère des objets ORM et retourne leurs to_dict()"""
+    def job(session):
+        session.add_all(objects)
+        session.flush()
+        return [obj.to_dict() for obj in objects]
+    return job
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask import Flask
+from src.models.user import db
+from src.models.metrics import SystemMetrics, Volunteer, Task, PerformanceHistory
+from src.models.badge import Badge, VolunteerBadge
+from src.models.alert import AlertRule, AlertIncident
+from src.models.report import ReportJob
+from src.services.migrations import run_migrations
+from src.services.partitions import partition_registry
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Application sur une base SQLite temporaire, migrations appliquées"""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        ARCHIVE_DIR=str(tmp_path / 'archive')
+    )
+    db.init_app(app)
+    # Le registre des partitions est propre au processus, pas à la base
+    partition_registry._schema_version = None
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import pytest
+from src.routes import alerts
+from src.routes.alerts import alerts_bp
+from src.services.writer import WriterBusy
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(alerts_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_update_of_missing_rule_is_a_json_404(client):
+    response = client.put('/api/alerts/rules/999', json={'threshold': 90})
+    assert response.status_code == 404
+    assert response.get_json()['success'] is False
+
+
+def test_database_error_is_a_json_500(client, monkeypatch):
+    def failing_run(job):
+        raise RuntimeError('disk I/O error')
+
+    monkeypatch.setattr(alerts.writer, 'run', failing_run)
+    response = client.put('/api/alerts/rules/1', json={'threshold': 90})
+    assert response.status_code == 500
+    assert response.get_json() == {'success': False, 'error': 'disk I/O error'}
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('post', '/api/alerts/rules', {'metric': 'cpu_usage', 'threshold': 90}),
+    ('put', '/api/alerts/rules/1', {'threshold': 90}),
+    ('delete', '/api/alerts/rules/1', None)
+])
+def test_writer_busy_reaches_the_application_handler(client, monkeypatch, method, path, body):
+    def busy_run(job):
+        raise WriterBusy("File d'écriture pleine")
+
+    monkeypatch.setattr(alerts.writer, 'run', busy_run)
+    with pytest.raises(WriterBusy):
+        getattr(client, method)(path, json=body)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select
+from src.models.alert import AlertIncident
+from src.models.metrics import db
+from src.services import archive
+from src.services.alerts import replay_rule
+from src.services.archive import ArchiveSegment, EPOCH, archive_segments, metrics_archive, write_segment
+from src.services.partitions import insert_rows, partition_registry
+
+
+def metrics_rows(start, count, step=timedelta(minutes=1)):
+    return [{
+        'timestamp': start + step * i,
+        'total_volunteers': 100 + i % 7,
+        'active_volunteers': None if i % 11 == 0 else 40 + i % 5,
+        'total_tasks': 1000 + i,
+        'completed_tasks': 900 + i // 2,
+        'pending_tasks': i % 13,
+        'cpu_usage': 50.0 + (i % 17) * 0.25,
+        'memory_usage': None if i % 9 == 0 else 60.5,
+        'network_throughput': 1e3 * (i % 3),
+        'cost_savings': -1.5 * i
+    } for i in range(count)]
+
+
+@pytest.fixture
+def archive_app(app):
+    metrics_archive.init_app(app)
+    os.makedirs(metrics_archive.directory, exist_ok=True)
+    return app
+
+
+def test_segment_round_trip(tmp_path):
+    rows = metrics_rows(datetime(2026, 7, 1), 10000)
+    for offset, row in enumerate(rows, 1):
+        row['id'] = offset
+    path = str(tmp_path / 'segment.col')
+    info = write_segment(path, metrics_archive.table, rows)
+    assert info['row_count'] == len(rows)
+    segment = ArchiveSegment(path)
+    decoded = []
+    for index in range(len(segment.blocks)):
+        columns = {name: segment.read(index, name) for name in segment.kinds}
+        columns['timestamp'] = [EPOCH + timedelta(microseconds=value) for value in columns['timestamp']]
+        decoded.extend(dict(zip(columns, values)) for values in zip(*columns.values()))
+    assert len(segment.blocks) == 3
+    assert decoded == rows
+
+
+def test_concurrent_archive_of_same_month_keeps_one_file(archive_app, monkeypatch):
+    month = datetime(2026, 7, 1)
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', metrics_rows(month, 5000))
+
+    # Les deux tentatives encodent le mois avant que l'une ou l'autre n'écrive
+    barrier = threading.Barrier(2)
+    run = archive.writer.run
+
+    def synchronized_run(job, *args, **kwargs):
+        barrier.wait(timeout=10)
+        return run(job, *args, **kwargs)
+
+    monkeypatch.setattr(archive.writer, 'run', synchronized_run)
+    results = {}
+
+    def attempt(name):
+        with archive_app.app_context():
+            results[name] = metrics_archive.archive_month(month)
+
+    threads = [threading.Thread(target=attempt, args=(name,)) for name in 'AB']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results.values(), key=lambda value: value is None) == [5000, None]
+    with db.engine.connect() as connection:
+        segments = connection.execute(select(archive_segments)).mappings().all()
+        assert month not in partition_registry.months(connection, 'system_metrics')
+    assert len(segments) == 1
+    assert os.listdir(metrics_archive.directory) == [segments[0]['file_name']]
+    archived = [row for chunk in metrics_archive.row_chunks() for row in chunk]
+    assert [row['id'] for row in archived] == list(range(1, 5001))
+
+
+def test_remove_orphans_keeps_recent_files(archive_app):
+    directory = metrics_archive.directory
+    in_progress = os.path.join(directory, 'system_metrics_p202607.10.abc.col')
+    stale = os.path.join(directory, 'system_metrics_p202606.5.def.col')
+    for path in (in_progress, stale):
+        open(path, 'wb').close()
+    old = datetime.now().timestamp() - 2 * archive.ORPHAN_GRACE_SECONDS
+    os.utime(stale, (old, old))
+
+    assert metrics_archive.remove_orphans() == ['system_metrics_p202606.5.def.col']
+    assert os.path.exists(in_progress)
+
+
+def test_replaced_and_expired_files_are_removed(archive_app):
+    month = datetime(2026, 7, 1)
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', metrics_rows(month, 100))
+    assert metrics_archive.archive_month(month) == 100
+    first = os.listdir(metrics_archive.directory)
+
+    # Lignes tardives du mois : fusionnées dans un nouveau fichier
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', metrics_rows(month + timedelta(days=20), 10))
+    assert metrics_archive.archive_month(month) == 110
+    second = os.listdir(metrics_archive.directory)
+    assert len(second) == 1 and second != first
+
+    assert metrics_archive.expire(datetime(2026, 8, 1)) == ['2026-07']
+    assert os.listdir(metrics_archive.directory) == []
+
+
+def test_replayed_rule_keeps_incidents_of_archived_months(archive_app):
+    month = datetime(2026, 7, 1)
+    rows = metrics_rows(month, 40)
+    for i, row in enumerate(rows):
+        row['cpu_usage'] = 90.0 if i % 2 == 0 else 50.0
+    incidents = AlertIncident.__table__
+
+    def cpu_incidents(connection):
+        # Règle par défaut « CPU élevé » (seuil 80, hystérésis 5)
+        return connection.execute(
+            select(func.count()).select_from(incidents).where(incidents.c.rule_id == 1)
+        ).scalar()
+
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', rows)
+        replay_rule(connection, 1)
+        assert cpu_incidents(connection) == 20
+    assert metrics_archive.archive_month(month) == 40
+
+    with db.engine.begin() as connection:
+        assert cpu_incidents(connection) == 20
+        replay_rule(connection, 1)
+        assert cpu_incidents(connection) == 20
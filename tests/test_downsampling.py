@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+import pytest
+from src.services.downsampling import choose_step, grid_cell_count, grid_start
+
+
+@pytest.mark.parametrize('span, max_points', [
+    (timedelta(days=1), 24),
+    (timedelta(weeks=1), 7),
+    (timedelta(days=30), 1),
+    (timedelta(days=365), 500),
+    (timedelta(hours=1, seconds=7), 60)
+])
+def test_max_points_bounds_the_cell_count(span, max_points):
+    date_end = datetime(2026, 10, 18, 8, 45, 29, 485320)
+    date_start = date_end - span
+    step = choose_step(date_start, date_end, max_points=max_points)
+    assert grid_cell_count(date_start, date_end, step) <= max_points
+
+
+def test_week_cells_start_on_monday():
+    # Dimanche 18 octobre 2026
+    start = grid_start(datetime(2026, 10, 18, 8, 45), 604800)
+    assert start == datetime(2026, 10, 12)
+    assert grid_start(datetime(2026, 10, 18, 8, 45), 2 * 604800).weekday() == 0
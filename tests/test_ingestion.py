@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import pytest
+from src.services.ingestion import ingest_samples, parse_timestamp, validate_sample
+
+
+@pytest.mark.parametrize('raw', [
+    {'cpu_usage': float('nan')},
+    {'network_throughput': float('inf')},
+    {'total_tasks': 1e999},
+    {'total_tasks': 10 ** 400},
+    {'timestamp': 1e20},
+    {'timestamp': float('nan')}
+])
+def test_out_of_range_values_are_rejected(raw):
+    with pytest.raises(ValueError):
+        validate_sample(raw)
+
+
+def test_epoch_timestamp():
+    assert parse_timestamp(0).isoformat() == '1970-01-01T00:00:00'
+
+
+def test_invalid_sample_only_rejects_itself():
+    samples = [{'total_tasks': 1}, {'total_tasks': 1e999}, {'timestamp': 1e20}, {'total_tasks': 2}]
+    report = ingest_samples(samples, insert=len)
+    assert report['inserted'] == 2
+    assert report['rejected'] == 2
+    assert [error['index'] for error in report['errors']] == [1, 2]
+    assert report['chunks'][0]['status'] == 'committed'
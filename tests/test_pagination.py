@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import base64
+import json
+from datetime import datetime, timedelta
+import pytest
+from src.models.metrics import db, Task
+from src.routes.metrics import metrics_bp
+from src.services.pagination import decode_cursor, encode_cursor, keyset_page
+
+FILTERS = {'status': 'pending'}
+
+
+def payload(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+
+def forge(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip():
+    created = datetime(2026, 10, 18, 8, 45, 29, 485320)
+    cursor = encode_cursor('tasks', FILTERS, created, 42)
+    assert decode_cursor(cursor, 'tasks', FILTERS, Task.created_date) == (created, 42)
+    assert decode_cursor(encode_cursor('volunteers', {}, None, 7), 'volunteers', {}) == (None, 7)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    '%%%',
+    forge(['k', 'i']),
+    forge({'k': '2026-10-18T08:45:29', 'i': 42}),
+    forge({'f': 'x', 'k': '2026-10-18T08:45:29', 'i': 'abc'})
+])
+def test_garbage_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'tasks', FILTERS, Task.created_date)
+
+
+def test_tampered_cursor_is_rejected():
+    values = payload(encode_cursor('tasks', FILTERS, datetime(2026, 10, 18), 42))
+    values['f'] = '0' * len(values['f'])
+    with pytest.raises(ValueError):
+        decode_cursor(forge(values), 'tasks', FILTERS, Task.created_date)
+
+
+def test_cursor_is_bound_to_its_list_and_filters():
+    cursor = encode_cursor('tasks', FILTERS, datetime(2026, 10, 18), 42)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'tasks', {'status': 'failed'}, Task.created_date)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'badges', FILTERS, Task.created_date)
+
+
+def test_keyset_page_walks_every_row_once(app):
+    start = datetime(2026, 10, 1)
+    # Dates en double : l'id départage les lignes de même date
+    db.session.add_all([
+        Task(
+            task_id=f'task_{index:03d}', workflow_id='wf',
+            status='pending' if index % 4 else 'failed',
+            created_date=start + timedelta(hours=index // 3)
+        ) for index in range(40)
+    ])
+    db.session.commit()
+    expected = [
+        task.id for task in sorted(
+            Task.query.filter_by(**FILTERS).all(), key=lambda task: (task.created_date, task.id), reverse=True
+        )
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        page = keyset_page(
+            Task.query.filter_by(**FILTERS), 'tasks', Task.id, sort_column=Task.created_date,
+            cursor=cursor, limit=7, filters=FILTERS, total='exact'
+        )
+        assert page.total == len(expected)
+        seen.extend(task.id for task in page.items)
+        if not page.has_more:
+            break
+        cursor = page.next_cursor
+    assert seen == expected
+
+
+def test_route_answers_400_for_a_tampered_cursor(app):
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    response = app.test_client().get('/api/volunteers', query_string={'cursor': forge({'f': 'x', 'k': None, 'i': 1})})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
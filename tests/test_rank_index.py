@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import random
+from bisect import bisect_left
+import pytest
+from src.services.rank_index import OrderStatisticList, rank_key
+
+
+def check(index, reference):
+    assert len(index) == len(reference)
+    assert list(index.islice(0, len(index))) == reference
+    for position, key in enumerate(reference):
+        assert index[position] == key
+        assert index.rank(key) == position
+
+
+def test_matches_a_sorted_list_through_splits_and_removals():
+    randomizer = random.Random(7)
+    keys = randomizer.sample(range(10000), 300)
+    # Petits blocs : scissions et blocs vidés dès quelques dizaines de clés
+    index = OrderStatisticList(keys[:50], load=4)
+    reference = sorted(keys[:50])
+    check(index, reference)
+
+    for key in keys[50:]:
+        index.add(key)
+        reference.insert(bisect_left(reference, key), key)
+    check(index, reference)
+
+    for key in randomizer.sample(reference, 250):
+        assert index.remove(key)
+        reference.remove(key)
+        absent = randomizer.randrange(10000)
+        assert index.rank(absent) == bisect_left(reference, absent)
+    check(index, reference)
+
+    assert not index.remove(-1)
+    assert not index.remove(10 ** 6)
+
+
+def test_islice_and_bounds():
+    index = OrderStatisticList(range(0, 100, 2), load=3)
+    assert list(index.islice(10, 15)) == [20, 22, 24, 26, 28]
+    assert list(index.islice(-5, 2)) == [0, 2]
+    assert list(index.islice(48, 80)) == [96, 98]
+    assert list(index.islice(30, 10)) == []
+    with pytest.raises(IndexError):
+        index[50]
+
+
+def test_empty_list_grows_from_first_key():
+    index = OrderStatisticList(load=2)
+    assert index.rank(5) == 0
+    for key in (5, 1, 3, 4, 2):
+        index.add(key)
+    check(index, [1, 2, 3, 4, 5])
+    for key in (1, 2, 3, 4, 5):
+        index.remove(key)
+    check(index, [])
+
+
+def test_rank_key_orders_by_value_descending_then_id_nulls_last():
+    keys = [rank_key(None, 1), rank_key(5.0, 3), rank_key(7.5, 2), rank_key(5.0, 1)]
+    assert sorted(keys) == [rank_key(7.5, 2), rank_key(5.0, 1), rank_key(5.0, 3), rank_key(None, 1)]
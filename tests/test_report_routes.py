@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import pytest
+from src.routes.metrics import metrics_bp
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    return app.test_client()
+
+
+@pytest.mark.parametrize('body', [[1], 'week', 3])
+def test_report_job_body_must_be_an_object(client, body):
+    response = client.post('/api/performance/reports', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': 'Objet JSON attendu'}
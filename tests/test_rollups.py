@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from src.models.metrics import db, system_metrics_rollups
+from src.services.partitions import insert_rows
+from src.services.ring_buffer import MetricsRingBuffer
+from src.services.rollups import apply_samples
+
+
+def sample(timestamp, cpu_usage, total_tasks=10):
+    return {'timestamp': timestamp, 'cpu_usage': cpu_usage, 'total_tasks': total_tasks}
+
+
+def test_rollups_ignore_null_values(app):
+    bucket = datetime(2026, 10, 1, 12)
+    table = system_metrics_rollups
+    with db.engine.begin() as connection:
+        apply_samples(connection, [sample(bucket, None, None), sample(bucket + timedelta(seconds=10), 40.0)])
+        apply_samples(connection, [sample(bucket + timedelta(seconds=20), None, None)])
+        apply_samples(connection, [sample(bucket + timedelta(seconds=30), 60.0)])
+        row = connection.execute(
+            select(table).where(table.c.resolution == 'minute', table.c.bucket_start == bucket)
+        ).mappings().one()
+
+    assert (row['sample_count'], row['cpu_usage_count']) == (4, 2)
+    assert (row['cpu_usage_sum'], row['cpu_usage_min'], row['cpu_usage_max']) == (100.0, 40.0, 60.0)
+    assert (row['total_tasks_min'], row['total_tasks_max']) == (10, 10)
+    assert row['cpu_usage_first'] is None
+    assert row['cpu_usage_last'] == 60.0
+
+
+def test_ring_buffer_ignores_null_values(app):
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', [
+            sample(now - timedelta(minutes=3), 20.0),
+            sample(now - timedelta(minutes=2), None, None),
+            sample(now - timedelta(minutes=1), 90.0)
+        ])
+
+    buffer = MetricsRingBuffer()
+    start = now - timedelta(hours=1)
+    assert buffer.covers(start)
+    count, stats = buffer.summary(['cpu_usage', 'total_tasks'], start)
+    assert count == 3
+    assert stats['cpu_usage'] == {'count': 2, 'sum': 110.0, 'min': 20.0, 'max': 90.0}
+    assert (stats['total_tasks']['min'], stats['total_tasks']['max']) == (10, 10)
+    assert buffer.samples(['cpu_usage'], start)['cpu_usage'] == [20.0, None, 90.0]
+    assert buffer.samples(['cpu_usage'], start, where=('cpu_usage', 50))['cpu_usage'] == [90.0]
+    assert buffer.regression(['cpu_usage'], start)['cpu_usage']['sy'] == 110.0
+
+
+def test_all_null_field_aggregates_as_empty(app):
+    from src.routes.metrics import metrics_bp, summarize_metrics
+
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=3)
+    rows = [
+        {'timestamp': start + timedelta(minutes=5 * index), 'cpu_usage': 50.0, 'network_throughput': None}
+        for index in range(48)
+    ]
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', rows)
+
+    end = start + timedelta(hours=4)
+    for period in (None, 'week'):
+        count, aggregations, _ = summarize_metrics(
+            start, end, ['cpu_usage', 'network_throughput'], trend_fields=['network_throughput'], period=period
+        )
+        assert count == 48
+        assert aggregations['cpu_usage']['average'] == 50.0
+        assert aggregations['network_throughput'] == {
+            'average': 0, 'min': 0, 'max': 0, 'total': 0, 'count': 0
+        }
+
+    client = app.test_client()
+    for path in ('/api/performance/summary', '/api/performance/global?period=week'):
+        assert client.get(path).status_code == 200
+    # Sans aucune valeur réseau, la route répond « pas de données » au lieu d'une 500
+    assert client.get('/api/performance/network?period=week').status_code == 404
+
+    # Série brute (sans max_points) mêlant valeurs et NULL
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'system_metrics', [
+            {
+                'timestamp': now - timedelta(minutes=30 - index),
+                'cpu_usage': 50.0,
+                'network_throughput': None if index % 2 else 100.0 + index
+            } for index in range(10)
+        ])
+    for period in ('day', 'hour'):
+        response = client.get(f'/api/performance/network?period={period}')
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert data['period']['resolution'] == 'raw'
+        assert data['throughput']['count'] == 5
+        assert data['throughput']['average'] == 104.0
+        assert len(data['data_points']) == 10
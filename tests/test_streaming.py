@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from src.routes.metrics import stream_system_metrics
+from src.services.streaming import metrics_broadcaster
+
+
+def test_stream_subscribes_only_while_iterated(app):
+    with app.test_request_context('/api/system-metrics/stream'):
+        # Réponse jamais lue (client parti avant le premier chunk)
+        response = stream_system_metrics()
+        assert not metrics_broadcaster._subscribers
+        response.close()
+
+        response = stream_system_metrics()
+        assert next(response.response).startswith('retry:')
+        assert len(metrics_broadcaster._subscribers) == 1
+        response.close()
+        assert not metrics_broadcaster._subscribers
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import threading
+import pytest
+from sqlalchemy import func, select, update
+from src.models.metrics import db, Volunteer, Task
+from src.services.events import rows_committed, rows_invalidated, rows_updated, tables_changed
+from src.services.writer import GroupCommitWriter, WriterBusy, WriterTimeout
+
+
+@pytest.fixture
+def group_writer(app):
+    # Fenêtre large : les travaux soumis ensemble forment un seul lot
+    writer = GroupCommitWriter(flush_window=0.5)
+    writer.start(app)
+    yield writer
+    writer.stop()
+
+
+def add_volunteer(volunteer_id):
+    def job(session):
+        session.add(Volunteer(volunteer_id=volunteer_id, name=volunteer_id))
+        session.flush()
+        return volunteer_id
+    return job
+
+
+def count_volunteers(engine):
+    """Nombre de volontaires vus par une autre connexion"""
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(Volunteer.__table__)).scalar()
+
+
+def test_batch_is_a_single_transaction(group_writer):
+    engine = db.engine
+    visible_at_signal = []
+
+    def on_committed(sender, rows):
+        visible_at_signal.append(count_volunteers(engine))
+
+    rows_committed.connect(on_committed, sender='volunteers')
+    try:
+        futures = [
+            group_writer.submit(add_volunteer('vol_001')),
+            group_writer.submit(add_volunteer('vol_002')),
+            group_writer.submit(lambda session: count_volunteers(engine))
+        ]
+        results = [future.result(5) for future in futures]
+    finally:
+        rows_committed.disconnect(on_committed, sender='volunteers')
+
+    # Les travaux précédents du lot ne sont pas visibles avant le commit du lot
+    assert results == ['vol_001', 'vol_002', 0]
+    assert group_writer.stats['transactions'] == 1
+    assert count_volunteers(db.engine) == 2
+    # rows_committed n'est émis qu'une fois le lot validé
+    assert visible_at_signal == [2]
+
+
+def test_failed_job_keeps_notifications_of_the_batch(group_writer):
+    volunteer_id = GroupCommitWriter().run(lambda session: add_volunteer('vol_001')(session))
+    received = []
+
+    def record(kind):
+        def receiver(sender, **kwargs):
+            received.append((kind, sender))
+        return receiver
+
+    signals = {'updated': rows_updated, 'invalidated': rows_invalidated, 'changed': tables_changed}
+    receivers = {kind: record(kind) for kind in signals}
+    for kind, signal in signals.items():
+        signal.connect(receivers[kind])
+
+    def rename(session):
+        volunteer = session.execute(select(Volunteer).filter_by(volunteer_id=volunteer_id)).scalar_one()
+        volunteer.name = 'Renommé'
+        session.flush()
+
+    def failing_job(session):
+        session.execute(update(Task).values(status='failed'))
+        raise ValueError('annulé')
+
+    try:
+        renamed = group_writer.submit(rename)
+        failed = group_writer.submit(failing_job)
+        renamed.result(5)
+        with pytest.raises(ValueError):
+            failed.result(5)
+    finally:
+        for kind, signal in signals.items():
+            signal.disconnect(receivers[kind])
+
+    assert group_writer.stats['transactions'] == 1
+    # Notifications du travail validé conservées, celles du travail annulé oubliées
+    assert ('updated', 'volunteers') in received
+    assert ('changed', 'volunteers') in received
+    assert not [entry for entry in received if entry[1] == 'tasks']
+
+
+def test_run_without_thread_commits_immediately(app):
+    writer = GroupCommitWriter()
+    assert writer.run(add_volunteer('vol_001')) == 'vol_001'
+    assert count_volunteers(db.engine) == 1
+
+
+def test_result_timeout_is_a_writer_busy(group_writer):
+    release = threading.Event()
+
+    def slow_job(session):
+        release.wait(5)
+        return add_volunteer('vol_slow')(session)
+
+    with pytest.raises(WriterTimeout) as raised:
+        group_writer.run(slow_job, timeout=0.05)
+    assert isinstance(raised.value, WriterBusy)
+    assert group_writer.stats['timeouts'] == 1
+
+    # Le travail en attente est tout de même validé
+    release.set()
+    assert group_writer.run(add_volunteer('vol_next'), timeout=5) == 'vol_next'
+    assert count_volunteers(db.engine) == 2
+
+
+def test_write_commits_while_a_read_cursor_is_open(group_writer):
+    engine = db.engine
+    with engine.begin() as connection:
+        connection.execute(Volunteer.__table__.insert(), [
+            {'volunteer_id': f'vol_{index:03d}', 'name': f'vol_{index:03d}'} for index in range(200)
+        ])
+
+    # Curseur d'un export diffusé en flux, ouvert pendant l'écriture
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=10).execute(select(Volunteer.__table__))
+        first = result.fetchmany(10)
+        assert group_writer.submit(add_volunteer('vol_new')).result(10) == 'vol_new'
+        remaining = result.fetchall()
+
+    # La lecture voit l'état de la base à son ouverture
+    assert len(first) + len(remaining) == 200
+    assert count_volunteers(engine) == 201